@@ -0,0 +1,197 @@
+"""
+Incremental recommendations for a stream of inventory movements.
+
+A pipeline run recomputes every component, but a stock movement only changes
+``current_stock`` — safety stock, reorder point and EOQ depend on demand and
+lead time. ``IncrementalRecommender`` keeps the safety-stock rows, their
+recommendations and the KPI aggregates in memory; each batch of deltas
+recomputes status, risk, weeks of cover, order quantity and message for the
+touched components only. KPIs are running sums adjusted by each component's
+old and new contribution, and the dashboard order is a sorted list of
+priority keys kept with ``bisect``, so a movement costs a binary search and
+one list shift rather than a re-sort.
+
+Output follows the same rule: ``publish`` writes kpis.json and changefeed
+entries for the components touched since the last publish only, while
+recommendations.json and safety_stock.json are rewritten in full only at an
+explicit ``checkpoint``. Between checkpoints the changefeed carries the
+difference. The changefeed is loaded once per book, which assumes no other
+process publishes to it meanwhile.
+
+Usage: python -m agent.incremental movements.csv [--checkpoint]   # columns: component_id, quantity (signed)
+"""
+import argparse
+import json
+import time
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+from collections.abc import Mapping
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from agent.recommender import (
+    AT_RISK, CHANGES_DIR, OUTPUT_DIR, kpi_payload, priority_key, publish_changes, recommendation, summarize_forecasts,
+)
+from models.safety_stock import stock_position
+from pipeline.changefeed import ChangeFeed
+from pipeline.metrics import span
+
+MODEL_DIR = Path(__file__).parent.parent / "models" / "artifacts"
+
+
+class IncrementalRecommender:
+    """Safety-stock rows, recommendations and KPIs that follow inventory deltas."""
+
+    def __init__(self, safety_stock_df: pd.DataFrame, forecast_df: pd.DataFrame = None):
+        if safety_stock_df["component_id"].duplicated().any():
+            raise ValueError("safety_stock_df has duplicate component_id values")
+        self.forecast_summary = summarize_forecasts(forecast_df)
+        self.rows = {row["component_id"]: row for row in safety_stock_df.to_dict("records")}
+        self.ids = list(self.rows)
+        # Ties on (priority, risk) keep table order, as the stable sort in generate_recommendations does
+        self.positions = {cid: i for i, cid in enumerate(self.ids)}
+        self.recs = {}
+        self.order = []
+        self.status_counts = Counter()
+        self.at_risk_cents = 0  # unit costs are whole cents, so integer sums do not drift
+        self.cover_tenths = 0  # weeks_of_cover is rounded to 0.1, so its sum is exact in tenths
+        self.avg_service_level = safety_stock_df["service_level"].mean()  # movements do not change it
+        self.touched = set()  # components changed since the last publish or checkpoint
+        self.feed = None
+        for cid, row in self.rows.items():
+            self.recs[cid] = recommendation(row, self.forecast_summary)
+            self._count(cid, 1)
+        self.order = sorted(self._key(cid) for cid in self.ids)
+
+    def _key(self, cid) -> tuple:
+        return (*priority_key(self.recs[cid]), self.positions[cid])
+
+    def _count(self, cid, sign: int):
+        """Add (``sign=1``) or remove (``sign=-1``) one component's share of the KPIs."""
+        row = self.rows[cid]
+        self.status_counts[row["status"]] += sign
+        if row["status"] in AT_RISK:
+            self.at_risk_cents += sign * round(row["current_stock"] * row["unit_cost"] * 100)
+        self.cover_tenths += sign * round(row["weeks_of_cover"] * 10)
+
+    def apply(self, deltas) -> list:
+        """Apply stock movements and return the recommendations that changed.
+
+        ``deltas`` maps component_id to a signed quantity, or is an iterable of
+        (component_id, quantity) pairs; movements of one component are summed.
+        Unknown components raise KeyError before anything is applied.
+        """
+        totals = defaultdict(int)
+        for cid, quantity in (deltas.items() if isinstance(deltas, Mapping) else deltas):
+            totals[cid] += quantity
+        unknown = [cid for cid in totals if cid not in self.rows]
+        if unknown:
+            raise KeyError(f"unknown component_id {unknown[0]!r}" + (f" and {len(unknown) - 1} more" if len(unknown) > 1 else ""))
+        if not totals:
+            return []
+
+        ids = list(totals)
+        rows = [self.rows[cid] for cid in ids]
+        column = lambda name: np.array([row[name] for row in rows])
+        current = column("current_stock") + np.array([totals[cid] for cid in ids])
+        position = stock_position(current, column("safety_stock"), column("reorder_point"),
+                                  column("eoq"), column("weekly_demand"))
+
+        updated = []
+        for i, (cid, row) in enumerate(zip(ids, rows)):
+            del self.order[bisect_left(self.order, self._key(cid))]
+            self._count(cid, -1)
+            row["current_stock"] = current[i].item()
+            for name, values in position.items():
+                row[name] = values[i].item()
+            self.recs[cid] = recommendation(row, self.forecast_summary)
+            self._count(cid, 1)
+            insort(self.order, self._key(cid))
+            updated.append(self.recs[cid])
+        self.touched.update(ids)
+        return updated
+
+    def recommendations(self) -> list:
+        """All recommendations in dashboard order (priority, then risk)."""
+        return [self.recs[self.ids[key[-1]]] for key in self.order]
+
+    def kpis(self) -> dict:
+        return kpi_payload(
+            self.status_counts, self.at_risk_cents / 100,
+            self.cover_tenths / 10 / len(self.ids) if self.ids else float("nan"),
+            self.avg_service_level,
+        )
+
+    def safety_stock_df(self) -> pd.DataFrame:
+        return pd.DataFrame(list(self.rows.values()))
+
+    def _feed(self, output_dir: Path) -> ChangeFeed:
+        directory = output_dir / CHANGES_DIR
+        if self.feed is None or self.feed.directory != directory:
+            self.feed = ChangeFeed(directory)
+        return self.feed
+
+    def _write_kpis(self, output_dir: Path):
+        output_dir.mkdir(parents=True, exist_ok=True)
+        with open(output_dir / "kpis.json", "w") as f:
+            json.dump(self.kpis(), f, indent=2)
+
+    def publish(self, output_dir: Path = OUTPUT_DIR) -> dict:
+        """Write kpis.json and append the recommendations touched since the last publish to the changefeed."""
+        output_dir = Path(output_dir)
+        self._write_kpis(output_dir)
+        touched = sorted(self.touched, key=self.positions.get)
+        with span("changefeed", rows=len(touched)):
+            changes = self._feed(output_dir).update([self.recs[cid] for cid in touched])
+        self.touched.clear()
+        return changes
+
+    def checkpoint(self, output_dir: Path = OUTPUT_DIR) -> dict:
+        """Rewrite safety_stock.json, recommendations.json and kpis.json and publish the full diff."""
+        output_dir = Path(output_dir)
+        self._write_kpis(output_dir)
+        recs = self.recommendations()
+        self.safety_stock_df().to_json(output_dir / "safety_stock.json", orient="records")
+        with open(output_dir / "recommendations.json", "w") as f:
+            json.dump(recs, f, indent=2, default=str)
+        self.feed = None  # publish_changes reloads the feed from disk
+        changes = publish_changes(recs, output_dir)
+        self.touched.clear()
+        return changes
+
+
+def load(output_dir: Path = OUTPUT_DIR, model_dir: Path = MODEL_DIR) -> IncrementalRecommender:
+    """State from the last pipeline run: its safety_stock.json and saved forecast."""
+    from models.forecaster import load_forecasts
+
+    safety_stock_df = pd.read_json(Path(output_dir) / "safety_stock.json", dtype={"variant": str}, precise_float=True)
+    try:
+        forecast_df = load_forecasts(model_dir)
+    except FileNotFoundError:
+        forecast_df = None
+    return IncrementalRecommender(safety_stock_df, forecast_df)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply stock movements to the dashboard outputs without a full rerun.")
+    parser.add_argument("movements", type=Path, help="CSV with component_id and signed quantity columns")
+    parser.add_argument("--output-dir", type=Path, default=OUTPUT_DIR)
+    parser.add_argument("--checkpoint", action="store_true",
+                        help="also rewrite recommendations.json and safety_stock.json in full")
+    args = parser.parse_args()
+
+    book = load(args.output_dir)
+    movements = pd.read_csv(args.movements, dtype={"component_id": str})
+    start = time.perf_counter()
+    updated = book.apply(zip(movements["component_id"], movements["quantity"].tolist()))
+    elapsed = time.perf_counter() - start
+    if args.checkpoint:
+        book.checkpoint(args.output_dir)
+    else:
+        changes = book.publish(args.output_dir)
+        print(f"  → changefeed seq {changes['seq']}: {changes['added']} added, {changes['changed']} changed")
+    kpis = book.kpis()
+    print(f"Applied {len(movements):,} movements to {len(updated):,} components in {elapsed * 1e3:.2f} ms "
+          f"({kpis['critical_items']} critical, {kpis['warning_items']} warnings)")
@@ -4,102 +4,153 @@ Generates natural language recommendations prioritised by risk.
 """
 import pandas as pd
 import numpy as np
+from collections import Counter
 from pathlib import Path
 from datetime import datetime, timedelta
 import json
 
+from pipeline.changefeed import ChangeFeed
+from pipeline.metrics import span
+
 OUTPUT_DIR = Path(__file__).parent.parent / "dashboard" / "public" / "data"
+TODAY = datetime(2026, 2, 18)
+AT_RISK = ("critical", "warning")  # statuses counted in total_at_risk_value
+CHANGES_DIR = Path("changes") / "recommendations"
 
 
-def generate_recommendations(safety_stock_df: pd.DataFrame, forecast_df: pd.DataFrame = None) -> list:
-    """Generate prioritised natural language recommendations."""
-    recommendations = []
-    today = datetime(2026, 2, 18)
+def summarize_forecasts(forecast_df: pd.DataFrame) -> dict:
+    """Map (category, variant) to (max, mean, peak month) of its forecast, from one groupby."""
+    if forecast_df is None or "predicted" not in forecast_df.columns or forecast_df.empty:
+        return {}
+    summary = forecast_df.groupby(["category", "variant"], sort=False)["predicted"].agg(["max", "mean", "idxmax"])
+    if "year_month" in forecast_df.columns:
+        peak_months = [str(m) for m in forecast_df.loc[summary["idxmax"], "year_month"]]
+    else:
+        peak_months = ["Q3"] * len(summary)
+    return dict(zip(summary.index, zip(summary["max"], summary["mean"], peak_months)))
+
+
+def recommendation(row: dict, forecast_summary: dict, today: datetime = TODAY) -> dict:
+    """Recommendation for one safety-stock row; ``forecast_summary`` comes from ``summarize_forecasts``."""
+    rec = {
+        "component_id": row["component_id"],
+        "category": row["category"],
+        "variant": row["variant"],
+        "status": row["status"],
+        "stockout_risk": row["stockout_risk"],
+        "current_stock": row["current_stock"],
+        "safety_stock": row["safety_stock"],
+        "reorder_point": row["reorder_point"],
+        "weeks_of_cover": row["weeks_of_cover"],
+        "lead_time_weeks": row["lead_time_weeks"],
+        "supplier_name": row["supplier_name"],
+    }
     
-    for _, row in safety_stock_df.iterrows():
-        rec = {
-            "component_id": row["component_id"],
-            "category": row["category"],
-            "variant": row["variant"],
-            "status": row["status"],
-            "stockout_risk": row["stockout_risk"],
-            "current_stock": row["current_stock"],
-            "safety_stock": row["safety_stock"],
-            "reorder_point": row["reorder_point"],
-            "weeks_of_cover": row["weeks_of_cover"],
-            "lead_time_weeks": row["lead_time_weeks"],
-            "supplier_name": row["supplier_name"],
-        }
-        
-        weekly = row["weekly_demand"]
-        lead = row["lead_time_weeks"]
-        cover = row["weeks_of_cover"]
-        
-        if row["status"] == "critical":
-            if cover < lead:
-                stockout_date = today + timedelta(weeks=cover)
-                order_deadline = today - timedelta(weeks=(lead - cover))
-                rec["message"] = (
-                    f"🔴 CRITICAL: {row['variant']} ({row['category']}) — current stock of {row['current_stock']} units "
-                    f"covers only {cover:.1f} weeks, but supplier lead time is {lead} weeks. "
-                    f"Estimated stockout by {stockout_date.strftime('%b %d')}. "
-                    f"Order deadline was {order_deadline.strftime('%b %d')} — IMMEDIATE action required. "
-                    f"Recommend ordering {row['recommended_order_qty']} units from {row['supplier_name']} NOW."
-                )
-            else:
-                rec["message"] = (
-                    f"🔴 CRITICAL: {row['variant']} ({row['category']}) — stock at {row['current_stock']} units, "
-                    f"well below safety stock of {row['safety_stock']}. "
-                    f"Recommend ordering {row['recommended_order_qty']} units immediately."
-                )
-            rec["priority"] = 1
-            
-        elif row["status"] == "warning":
-            order_by = today + timedelta(weeks=max(0, cover - lead))
+    weekly = row["weekly_demand"]
+    lead = row["lead_time_weeks"]
+    cover = row["weeks_of_cover"]
+    
+    if row["status"] == "critical":
+        if cover < lead:
+            stockout_date = today + timedelta(weeks=cover)
+            order_deadline = today - timedelta(weeks=(lead - cover))
             rec["message"] = (
-                f"🟡 WARNING: {row['variant']} ({row['category']}) — {row['current_stock']} units in stock "
-                f"({cover:.1f} weeks coverage). Reorder point is {row['reorder_point']}. "
-                f"Place order of {row['recommended_order_qty']} units with {row['supplier_name']} "
-                f"by {order_by.strftime('%b %d')} to avoid disruption."
+                f"🔴 CRITICAL: {row['variant']} ({row['category']}) — current stock of {row['current_stock']} units "
+                f"covers only {cover:.1f} weeks, but supplier lead time is {lead} weeks. "
+                f"Estimated stockout by {stockout_date.strftime('%b %d')}. "
+                f"Order deadline was {order_deadline.strftime('%b %d')} — IMMEDIATE action required. "
+                f"Recommend ordering {row['recommended_order_qty']} units from {row['supplier_name']} NOW."
             )
-            rec["priority"] = 2
-            
         else:
             rec["message"] = (
-                f"🟢 OK: {row['variant']} ({row['category']}) — {row['current_stock']} units in stock "
-                f"({cover:.1f} weeks coverage). Safety stock: {row['safety_stock']}. No action needed."
+                f"🔴 CRITICAL: {row['variant']} ({row['category']}) — stock at {row['current_stock']} units, "
+                f"well below safety stock of {row['safety_stock']}. "
+                f"Recommend ordering {row['recommended_order_qty']} units immediately."
             )
-            rec["priority"] = 3
+        rec["priority"] = 1
         
-        # Check for forecast spikes
-        if forecast_df is not None:
-            comp_forecast = forecast_df[
-                (forecast_df["category"] == row["category"]) &
-                (forecast_df["variant"] == row["variant"])
-            ]
-            if len(comp_forecast) > 0 and "predicted" in comp_forecast.columns:
-                max_forecast = comp_forecast["predicted"].max()
-                avg_forecast = comp_forecast["predicted"].mean()
-                if max_forecast > avg_forecast * 1.3:
-                    peak_month = comp_forecast.loc[comp_forecast["predicted"].idxmax()]
-                    month_str = str(peak_month.get("year_month", "Q3"))
-                    spike_pct = round((max_forecast / avg_forecast - 1) * 100)
-                    rec["forecast_alert"] = (
-                        f"📈 Demand forecasted to spike {spike_pct}% around {month_str}. "
-                        f"Plan additional inventory of ~{round(max_forecast - avg_forecast)} units ahead of peak."
-                    )
+    elif row["status"] == "warning":
+        order_by = today + timedelta(weeks=max(0, cover - lead))
+        rec["message"] = (
+            f"🟡 WARNING: {row['variant']} ({row['category']}) — {row['current_stock']} units in stock "
+            f"({cover:.1f} weeks coverage). Reorder point is {row['reorder_point']}. "
+            f"Place order of {row['recommended_order_qty']} units with {row['supplier_name']} "
+            f"by {order_by.strftime('%b %d')} to avoid disruption."
+        )
+        rec["priority"] = 2
         
-        recommendations.append(rec)
+    else:
+        rec["message"] = (
+            f"🟢 OK: {row['variant']} ({row['category']}) — {row['current_stock']} units in stock "
+            f"({cover:.1f} weeks coverage). Safety stock: {row['safety_stock']}. No action needed."
+        )
+        rec["priority"] = 3
+    
+    # Check for forecast spikes
+    peak = forecast_summary.get((row["category"], row["variant"]))
+    if peak is not None:
+        max_forecast, avg_forecast, month_str = peak
+        if max_forecast > avg_forecast * 1.3:
+            spike_pct = round((max_forecast / avg_forecast - 1) * 100)
+            rec["forecast_alert"] = (
+                f"📈 Demand forecasted to spike {spike_pct}% around {month_str}. "
+                f"Plan additional inventory of ~{round(max_forecast - avg_forecast)} units ahead of peak."
+            )
+    
+    return rec
+
+
+def generate_recommendations(safety_stock_df: pd.DataFrame, forecast_df: pd.DataFrame = None) -> list:
+    """Generate prioritised natural language recommendations."""
+    forecast_summary = summarize_forecasts(forecast_df)
+    recommendations = [recommendation(row, forecast_summary) for row in safety_stock_df.to_dict("records")]
     
     # Sort by priority then risk
-    recommendations.sort(key=lambda r: (r["priority"], -r["stockout_risk"]))
+    recommendations.sort(key=priority_key)
     return recommendations
 
 
+def priority_key(rec: dict) -> tuple:
+    """Dashboard order: priority, then highest stockout risk first."""
+    return rec["priority"], -rec["stockout_risk"]
+
+
+def summarize_kpis(recs: list, safety_stock_df: pd.DataFrame) -> dict:
+    """Roll recommendations up into dashboard KPIs using an ID-indexed cost lookup."""
+    costs = safety_stock_df.drop_duplicates("component_id")
+    unit_cost = dict(zip(costs["component_id"], costs["unit_cost"]))
+    return kpi_payload(
+        Counter(r["status"] for r in recs),
+        sum(
+            r["current_stock"] * unit_cost[r["component_id"]]
+            for r in recs if r["status"] in AT_RISK
+            if r["component_id"] in unit_cost
+        ),
+        np.mean([r["weeks_of_cover"] for r in recs]),
+        costs["service_level"].mean(),
+    )
+
+
+def kpi_payload(status_counts: Counter, total_at_risk_value: float, avg_weeks_of_cover: float,
+                avg_service_level: float) -> dict:
+    """Dashboard KPI record from per-status counts and the value and service-level aggregates."""
+    return {
+        "total_skus": sum(status_counts.values()),
+        "critical_items": status_counts["critical"],
+        "warning_items": status_counts["warning"],
+        "ok_items": status_counts["ok"],
+        "avg_service_level": round(float(avg_service_level), 4),
+        "total_at_risk_value": round(total_at_risk_value, 2),
+        "avg_weeks_of_cover": round(avg_weeks_of_cover, 1),
+        "generated_at": "2026-02-18T10:37:00",
+    }
+
+
 def run(safety_stock_df: pd.DataFrame, forecast_df: pd.DataFrame = None):
     """Generate and export recommendations."""
     print("Generating AI recommendations...")
-    recs = generate_recommendations(safety_stock_df, forecast_df)
+    with span("generate_recommendations", rows=len(safety_stock_df)):
+        recs = generate_recommendations(safety_stock_df, forecast_df)
     
     critical = sum(1 for r in recs if r["status"] == "critical")
     warning = sum(1 for r in recs if r["status"] == "warning")
@@ -108,24 +159,11 @@ def run(safety_stock_df: pd.DataFrame, forecast_df: pd.DataFrame = None):
     
     # Export
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-    with open(OUTPUT_DIR / "recommendations.json", "w") as f:
+    with span("write_json", rows=len(recs)), open(OUTPUT_DIR / "recommendations.json", "w") as f:
         json.dump(recs, f, indent=2, default=str)
     
     # Summary KPIs
-    kpis = {
-        "total_skus": len(recs),
-        "critical_items": critical,
-        "warning_items": warning,
-        "ok_items": sum(1 for r in recs if r["status"] == "ok"),
-        "avg_service_level": 0.95,
-        "total_at_risk_value": round(sum(
-            r["current_stock"] * safety_stock_df[safety_stock_df["component_id"] == r["component_id"]]["unit_cost"].values[0]
-            for r in recs if r["status"] in ("critical", "warning")
-            if len(safety_stock_df[safety_stock_df["component_id"] == r["component_id"]]["unit_cost"].values) > 0
-        ), 2),
-        "avg_weeks_of_cover": round(np.mean([r["weeks_of_cover"] for r in recs]), 1),
-        "generated_at": "2026-02-18T10:37:00",
-    }
+    kpis = summarize_kpis(recs, safety_stock_df)
     
     with open(OUTPUT_DIR / "kpis.json", "w") as f:
         json.dump(kpis, f, indent=2)
@@ -134,7 +172,16 @@ def run(safety_stock_df: pd.DataFrame, forecast_df: pd.DataFrame = None):
     return recs
 
 
+def publish_changes(recs: list, output_dir: Path = OUTPUT_DIR) -> dict:
+    """Append the recommendations added, changed or resolved since the last publish to the changefeed."""
+    with span("changefeed", rows=len(recs)):
+        changes = ChangeFeed(Path(output_dir) / CHANGES_DIR).publish(recs)
+    print(f"  → changefeed seq {changes['seq']}: {changes['added']} added, {changes['changed']} changed, "
+          f"{changes['resolved']} resolved" + (" (snapshot compacted)" if changes["compacted"] else ""))
+    return changes
+
+
 if __name__ == "__main__":
     from models.safety_stock import run as ss_run
     ss_df = ss_run()
-    run(ss_df)
+    publish_changes(run(ss_df))
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Timing comparison: batched vs row-wise 6-month recursive forecast.
+
+Usage: python benchmarks/bench_forecast.py [--series 61 1000 10000] [--max-rowwise 1000]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from catboost import CatBoostRegressor
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from models.forecaster import add_features, forecast_future, _forecast_future_rowwise
+
+
+def synthetic_demand(n_series: int, n_months: int = 36, seed: int = 0) -> pd.DataFrame:
+    """Seasonal Poisson demand in the shape produced by build_monthly_demand."""
+    rng = np.random.default_rng(seed)
+    months = pd.date_range("2023-01-01", periods=n_months, freq="MS")
+    n_categories = max(1, n_series // 4)
+    category = np.array([f"Category {i % n_categories:04d}" for i in range(n_series)], dtype=object)
+    variant = np.array([f"Variant {i:05d}" for i in range(n_series)], dtype=object)
+    base = rng.uniform(5, 400, n_series)
+    season = 1 + 0.5 * np.sin(2 * np.pi * (months.month.to_numpy() - 3) / 12)
+    demand = rng.poisson(base[:, None] * season[None, :])
+    return pd.DataFrame({
+        "year_month": np.tile(months, n_series),
+        "variant": np.repeat(variant, n_months),
+        "demand": demand.ravel(),
+        "category": np.repeat(category, n_months),
+        "year": np.tile(months.year, n_series),
+        "month": np.tile(months.month, n_series),
+        "quarter": np.tile(months.quarter, n_series),
+    }).sort_values(["category", "variant", "year_month"]).reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--series", type=int, nargs="+", default=[61, 1000, 10000])
+    parser.add_argument("--max-rowwise", type=int, default=1000,
+                        help="skip the row-wise loop above this many series (it is quadratic)")
+    parser.add_argument("--iterations", type=int, default=100)
+    args = parser.parse_args()
+    
+    print(f"{'series':>8} {'rows':>9} {'row-wise (s)':>13} {'batched (s)':>12} {'speed-up':>9}")
+    for n_series in args.series:
+        demand_df = add_features(synthetic_demand(n_series)).dropna(subset=["lag_1"])
+        features = ["category", "variant", "month", "quarter", "lag_1", "lag_3", "lag_6", "lag_12",
+                    "rolling_mean_3", "rolling_std_3", "rolling_mean_6", "month_sin", "month_cos"]
+        demand_df[features[2:]] = demand_df[features[2:]].fillna(0)
+        model = CatBoostRegressor(iterations=args.iterations, depth=6, random_seed=42, verbose=0, cat_features=[0, 1])
+        model.fit(demand_df[features], demand_df["demand"])
+        
+        start = time.perf_counter()
+        batched = forecast_future(model, demand_df, features)
+        batched_s = time.perf_counter() - start
+        
+        if n_series <= args.max_rowwise:
+            start = time.perf_counter()
+            rowwise = _forecast_future_rowwise(model, demand_df, features)
+            rowwise_s = time.perf_counter() - start
+            pd.testing.assert_frame_equal(batched, rowwise)
+            print(f"{n_series:>8,} {len(demand_df):>9,} {rowwise_s:>13.2f} {batched_s:>12.3f} {rowwise_s / batched_s:>8.0f}x")
+        else:
+            print(f"{n_series:>8,} {len(demand_df):>9,} {'skipped':>13} {batched_s:>12.3f} {'-':>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Latency of applying stock movements incrementally versus regenerating every
+recommendation and KPI, 61 to 100k components.
+
+Usage: python benchmarks/bench_incremental.py [--components 61 10000 100000] [--movements 5000] [--batch 1 50]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from agent.incremental import IncrementalRecommender
+from agent.recommender import generate_recommendations, summarize_kpis
+from bench_recommender import synthetic_inputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--components", type=int, nargs="+", default=[61, 10000, 100000])
+    parser.add_argument("--movements", type=int, default=5000)
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 50], help="movements per apply() call")
+    args = parser.parse_args()
+
+    print(f"{'components':>10} {'full (ms)':>10} {'batch':>6} {'per movement (µs)':>18} {'p99 batch (ms)':>15}")
+    for n_components in args.components:
+        safety_stock_df, forecast_df = synthetic_inputs(n_components)
+        start = time.perf_counter()
+        recs = generate_recommendations(safety_stock_df, forecast_df)
+        summarize_kpis(recs, safety_stock_df)
+        full = time.perf_counter() - start
+
+        book = IncrementalRecommender(safety_stock_df, forecast_df)
+        rng = np.random.default_rng(0)
+        ids = rng.choice(safety_stock_df["component_id"].to_numpy(), args.movements)
+        quantities = rng.integers(-40, 30, args.movements).tolist()
+        for batch in args.batch:
+            latencies = []
+            for i in range(0, args.movements, batch):
+                start = time.perf_counter()
+                book.apply(zip(ids[i:i + batch], quantities[i:i + batch]))
+                book.kpis()
+                latencies.append(time.perf_counter() - start)
+            print(f"{n_components:>10,} {full * 1e3:>10.1f} {batch:>6} {sum(latencies) / args.movements * 1e6:>18.1f} "
+                  f"{np.percentile(latencies, 99) * 1e3:>15.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Peak memory and throughput of building monthly demand from stored orders:
+loading the whole table versus streaming it in batches.
+
+Each variant runs in a fresh interpreter so its peak RSS is its own. Generate
+a large dataset first, e.g. ``python data/generate_data.py --scale 400``.
+
+Usage: python benchmarks/bench_ingest.py [--data-dir data/generated/scale] [--batch-rows 1000000 250000]
+"""
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+WORKER = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+from data.storage import read_table
+from models.demand_cube import build_demand_cube, stream_demand
+from pipeline.metrics import peak_rss_mb
+
+start = time.perf_counter()
+if {batch_rows} == 0:
+    orders = read_table({path!r})
+    rows, cube = len(orders), build_demand_cube(orders)
+else:
+    accumulator = stream_demand({path!r}, batch_rows={batch_rows}, recent_days=90)
+    rows, cube = accumulator.rows, accumulator.cube()
+seconds = time.perf_counter() - start
+print(json.dumps({{"rows": rows, "seconds": seconds, "series": cube.n_series,
+                  "peak_rss_mb": peak_rss_mb()}}))
+"""
+
+
+def measure(path: Path, batch_rows: int) -> dict:
+    """Rows, seconds and peak RSS of one build (``batch_rows=0`` loads the whole table)."""
+    code = WORKER.format(root=str(ROOT), path=str(path), batch_rows=batch_rows)
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--data-dir", type=Path, default=ROOT / "data" / "generated" / "scale")
+    parser.add_argument("--batch-rows", type=int, nargs="+", default=[1_000_000, 250_000])
+    args = parser.parse_args()
+
+    path = args.data_dir / "orders"
+    print(f"{'mode':<18} {'rows':>12} {'seconds':>8} {'Mrows/s':>8} {'peak RSS (MB)':>14}")
+    for batch_rows in [0] + args.batch_rows:
+        r = measure(path, batch_rows)
+        mode = "load whole table" if batch_rows == 0 else f"stream {batch_rows:,}"
+        rss = f"{r['peak_rss_mb']:>14.0f}" if r["peak_rss_mb"] is not None else f"{'n/a':>14}"
+        print(f"{mode:<18} {r['rows']:>12,} {r['seconds']:>8.2f} {r['rows'] / r['seconds'] / 1e6:>8.2f} {rss}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Replenishment optimizer (LP bound + MILP repair) vs the greedy baseline, 61 to 50k components.
+
+Usage: python benchmarks/bench_optimizer.py [--components 1000 10000 50000] [--suppliers 9]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from agent.optimizer import optimize
+
+
+def synthetic_inputs(n_components: int, n_suppliers: int = 9, seed: int = 0) -> pd.DataFrame:
+    """Safety-stock rows with the columns the optimizer reads."""
+    rng = np.random.default_rng(seed)
+    weekly = rng.uniform(1, 80, n_components)
+    lead = rng.integers(2, 11, n_components)
+    ss = np.rint(weekly * np.sqrt(lead) * 1.65 * 0.4).astype(int)
+    rop = np.rint(weekly * lead).astype(int) + ss
+    return pd.DataFrame({
+        "component_id": [f"CMP-{i:06d}" for i in range(n_components)],
+        "category": [f"Category {i % 50:02d}" for i in range(n_components)],
+        "variant": [f"Variant {i:06d}" for i in range(n_components)],
+        "current_stock": rng.integers(0, 2 * rop + 1),
+        "safety_stock": ss,
+        "reorder_point": rop,
+        "eoq": np.maximum(np.rint(weekly * rng.uniform(2, 6, n_components)), 1).astype(int),
+        "unit_cost": rng.uniform(10, 5000, n_components).round(2),
+        "supplier_id": [f"SUP-{s:03d}" for s in rng.integers(1, n_suppliers + 1, n_components)],
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--components", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--suppliers", type=int, default=9)
+    args = parser.parse_args()
+    
+    print(f"{'components':>10} {'options':>8} {'solve (s)':>9} {'greedy (s)':>10} {'total (s)':>9} {'gap vs greedy':>14} {'vs LP bound':>12}")
+    for n_components in args.components:
+        df = synthetic_inputs(n_components, args.suppliers)
+        # A quarter of the unconstrained order value, with binding supplier capacity and minimums
+        budget = float((df["eoq"] * df["unit_cost"]).sum() / 4)
+        capacity = float(df["eoq"].sum() * 2 / args.suppliers)
+        start = time.perf_counter()
+        summary = optimize(df, budget, supplier_capacity=capacity, min_order_value=budget / args.suppliers / 4)["summary"]
+        elapsed = time.perf_counter() - start
+        print(f"{n_components:>10,} {summary['options']:>8,} {summary['solve_seconds']:>9.2f} "
+              f"{summary['greedy_seconds']:>10.2f} {elapsed:>9.2f} {summary['gap_vs_greedy_pct']:>13.2f}% {summary['optimality_gap_pct']:>11.4f}%")
+
+
+if __name__ == "__main__":
+    main()
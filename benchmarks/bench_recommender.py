@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Per-SKU cost of recommendation generation plus KPI rollup, 61 to 100k components.
+
+Usage: python benchmarks/bench_recommender.py [--components 61 1000 10000 100000]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from agent.recommender import generate_recommendations, summarize_kpis
+
+
+def synthetic_inputs(n_components: int, horizon: int = 6, seed: int = 0):
+    """Safety-stock and forecast frames with the columns the recommender reads."""
+    rng = np.random.default_rng(seed)
+    category = np.array([f"Category {i % max(1, n_components // 4):05d}" for i in range(n_components)], dtype=object)
+    variant = np.array([f"Variant {i:06d}" for i in range(n_components)], dtype=object)
+    weekly = rng.uniform(1, 80, n_components).round(1)
+    lead = rng.integers(2, 11, n_components)
+    rop = np.rint(weekly * lead * 1.3).astype(int)
+    current = rng.integers(0, 3 * rop.max(), n_components) % (2 * rop + 1)
+    status = np.where(current <= rop * 0.25, "critical", np.where(current <= rop, "warning", "ok"))
+    safety_stock_df = pd.DataFrame({
+        "component_id": [f"CMP-{i:06d}" for i in range(n_components)],
+        "category": category,
+        "variant": variant,
+        "current_stock": current,
+        "safety_stock": np.rint(rop * 0.3).astype(int),
+        "reorder_point": rop,
+        "eoq": np.maximum(np.rint(weekly * 4.33), 1).astype(int),
+        "weekly_demand": weekly,
+        "lead_time_weeks": lead,
+        "weeks_of_cover": (current / weekly).round(1),
+        "unit_cost": rng.uniform(10, 5000, n_components).round(2),
+        "supplier_name": "Benchmark Supplier",
+        "status": status,
+        "stockout_risk": rng.uniform(0, 0.95, n_components).round(3),
+        "service_level": 0.95,
+        "recommended_order_qty": np.where(current < rop, rop - current, 0),
+    })
+    months = pd.date_range("2026-02-01", periods=horizon, freq="MS")
+    forecast_df = pd.DataFrame({
+        "category": np.tile(category, horizon),
+        "variant": np.tile(variant, horizon),
+        "year_month": np.repeat(months, n_components),
+        "predicted": rng.poisson(np.tile(weekly * 4.33, horizon)),
+    })
+    return safety_stock_df, forecast_df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--components", type=int, nargs="+", default=[61, 1000, 10000, 100000])
+    args = parser.parse_args()
+    
+    print(f"{'components':>10} {'total (s)':>10} {'per SKU (µs)':>13}")
+    for n_components in args.components:
+        safety_stock_df, forecast_df = synthetic_inputs(n_components)
+        start = time.perf_counter()
+        recs = generate_recommendations(safety_stock_df, forecast_df)
+        summarize_kpis(recs, safety_stock_df)
+        elapsed = time.perf_counter() - start
+        print(f"{n_components:>10,} {elapsed:>10.3f} {elapsed / n_components * 1e6:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Load test for the local service: p50/p99 latency and requests per second.
+
+Concurrent clients, each with its own keep-alive connection, send a mix of
+forecast, safety-stock, recommendation and what-if requests for random
+components and parameters. Without ``--url`` the service is started in this
+process on a free port, so client and server share the interpreter.
+
+Usage: python benchmarks/bench_service.py [--requests 5000] [--clients 8] [--url http://127.0.0.1:8000]
+"""
+import argparse
+import http.client
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from data.storage import read_table
+from models.forecaster import DATA_DIR
+from models.scenarios import DEMAND_CHANGES, LEAD_TIME_SHIFTS, SERVICE_LEVELS
+
+ENDPOINTS = ["forecast", "safety-stock", "recommendation", "what-if"]
+
+
+def request_mix(n_requests: int, component_ids: list, seed: int = 0) -> list:
+    """(endpoint, path) pairs; parameters come from the simulator's grid, so repeats hit the cache."""
+    rng = np.random.default_rng(seed)
+    requests = []
+    for endpoint in rng.choice(ENDPOINTS, n_requests).tolist():
+        query = f"component_id={rng.choice(component_ids)}"
+        if endpoint in ("safety-stock", "recommendation", "what-if"):
+            query += f"&service_level={rng.choice(SERVICE_LEVELS)}"
+        if endpoint == "what-if":
+            query += f"&demand_change={rng.choice(DEMAND_CHANGES)}&lead_time_shift={rng.choice(LEAD_TIME_SHIFTS)}"
+        requests.append((endpoint, f"/{endpoint}?{query}"))
+    return requests
+
+
+def _client(host: str, port: int, requests: list, latencies: list, errors: list):
+    connection = http.client.HTTPConnection(host, port)
+    for endpoint, path in requests:
+        start = time.perf_counter()
+        connection.request("GET", path)
+        response = connection.getresponse()
+        response.read()
+        latencies.append((endpoint, time.perf_counter() - start))
+        if response.status != 200:
+            errors.append((path, response.status))
+    connection.close()
+
+
+def load_test(host: str, port: int, requests: list, clients: int) -> dict:
+    """Run ``requests`` split across ``clients`` threads; latency percentiles per endpoint and overall."""
+    latencies, errors = [], []
+    threads = [threading.Thread(target=_client, args=(host, port, requests[i::clients], latencies, errors))
+               for i in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    def percentiles(values):
+        ms = np.array(values) * 1000
+        return {"n": len(ms), "p50_ms": round(float(np.percentile(ms, 50)), 2),
+                "p99_ms": round(float(np.percentile(ms, 99)), 2)}
+
+    by_endpoint = {e: percentiles([s for name, s in latencies if name == e]) for e in ENDPOINTS}
+    return {"overall": percentiles([s for _, s in latencies]), "endpoints": by_endpoint,
+            "rps": round(len(latencies) / wall, 1), "wall_seconds": round(wall, 2), "errors": len(errors)}
+
+
+def _health(host: str, port: int) -> dict:
+    connection = http.client.HTTPConnection(host, port)
+    connection.request("GET", "/health")
+    health = json.loads(connection.getresponse().read())
+    connection.close()
+    return health
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--url", help="test a running service instead of starting one in-process")
+    args = parser.parse_args()
+
+    if args.url:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+    else:
+        from service.server import make_server
+        server = make_server(port=0)
+        server.service.state()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        host, port = server.server_address[:2]
+
+    component_ids = read_table(DATA_DIR / "inventory_levels", columns=["component_id"])["component_id"].tolist()
+    requests = request_mix(args.requests, component_ids)
+
+    print(f"{'pass':<6} {'endpoint':<15} {'requests':>8} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+    # The first pass fills the cache, the second repeats the same requests against it
+    for label in ("cold", "warm"):
+        result = load_test(host, port, requests, args.clients)
+        for endpoint, stats in [*result["endpoints"].items(), ("all", result["overall"])]:
+            print(f"{label:<6} {endpoint:<15} {stats['n']:>8,} {stats['p50_ms']:>9.2f} {stats['p99_ms']:>9.2f}")
+        print(f"{label:<6} {result['rps']:,.0f} requests/s over {args.clients} clients, {result['errors']} errors")
+    print(f"cache: {_health(host, port)['cache']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Wall time of the Monte Carlo stockout simulator, up to 100k SKUs × 10k paths.
+
+Usage: python benchmarks/bench_simulation.py [--skus 1000 10000 100000] [--paths 10000] [--workers 8]
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from models.simulation import simulate
+
+
+def synthetic_inputs(n_skus: int, seed: int = 0) -> pd.DataFrame:
+    """Simulation inputs with low-volume variants and long, noisy lead times mixed in."""
+    rng = np.random.default_rng(seed)
+    weekly = rng.gamma(1.5, 10, n_skus)
+    lead = rng.integers(2, 15, n_skus).astype(float)
+    lead_std = lead * rng.uniform(0.05, 0.3, n_skus)
+    return pd.DataFrame({
+        "weekly_mean": weekly,
+        "weekly_std": weekly * rng.uniform(0.2, 1.0, n_skus),
+        "lead_time_weeks": lead,
+        "lead_time_std_weeks": lead_std,
+        "reorder_point": np.rint(weekly * lead * 1.2),
+        "order_qty": np.maximum(np.rint(weekly * 4), 1),
+        "current_stock": rng.integers(0, 500, n_skus),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--skus", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--paths", type=int, default=10_000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    
+    print(f"{'SKUs':>8} {'paths':>7} {'workers':>7} {'total (s)':>10} {'ns/path':>8}")
+    for n_skus in args.skus:
+        inputs = synthetic_inputs(n_skus)
+        start = time.perf_counter()
+        simulate(inputs, args.paths, args.workers)
+        elapsed = time.perf_counter() - start
+        print(f"{n_skus:>8,} {args.paths:>7,} {args.workers:>7} {elapsed:>10.2f} {elapsed / (n_skus * args.paths) * 1e9:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
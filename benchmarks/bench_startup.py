@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Startup cost of the pipeline CLI: wall time and import time per subcommand.
+
+Each command runs in a fresh interpreter under ``python -X importtime``; the
+report lists total wall time, time spent importing, the heaviest top-level
+imports and whether CatBoost, SciPy or scikit-learn were loaded at all.
+
+Usage: python benchmarks/bench_startup.py [--commands "safety-stock" "recommend"] [--repeat 3]
+"""
+import argparse
+import re
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+HEAVY = ["catboost", "scipy", "sklearn"]
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)")
+
+
+def profile(command: list) -> dict:
+    """Wall seconds, import seconds and top-level import times (μs) of one run of ``command``."""
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", str(ROOT / "run_pipeline.py"), *command],
+                          capture_output=True, text=True, cwd=ROOT)
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"{' '.join(command)} failed:\n{proc.stderr[-2000:]}")
+
+    top_level, loaded = {}, set()
+    for line in proc.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        _, cumulative, indent, name = match.groups()
+        loaded.add(name.split(".")[0])
+        if not indent:
+            top_level[name] = top_level.get(name, 0) + int(cumulative)
+    return {"wall": wall, "imports": sum(top_level.values()) / 1e6, "top_level": top_level,
+            "heavy": [m for m in HEAVY if m in loaded]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--commands", nargs="+", default=["safety-stock", "recommend"],
+                        help='subcommands with their options, each quoted, e.g. "safety-stock --service-level 0.97"')
+    parser.add_argument("--repeat", type=int, default=3, help="runs per command; the fastest is reported")
+    args = parser.parse_args()
+
+    print(f"{'command':<36} {'wall (s)':>9} {'imports (s)':>12}  heavy modules / top imports")
+    for command in args.commands:
+        runs = [profile(command.split()) for _ in range(args.repeat)]
+        best = min(runs, key=lambda r: r["wall"])
+        heaviest = sorted(best["top_level"].items(), key=lambda kv: -kv[1])[:3]
+        top = ", ".join(f"{name} {us / 1e3:.0f}ms" for name, us in heaviest)
+        print(f"{command:<36} {best['wall']:>9.2f} {best['imports']:>12.2f}  "
+              f"{'+'.join(best['heavy']) or 'none'} / {top}")
+
+
+if __name__ == "__main__":
+    main()
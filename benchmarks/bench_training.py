@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Wall time of training versus worker count: one global model against one model
+per category, fitted in a process pool that shares a fixed thread budget.
+
+Each worker count gets ``--cores // workers`` CatBoost threads, so every row
+uses the same cores and the speed-up comes from running segments side by side.
+
+Usage: python benchmarks/bench_training.py [--series 2000] [--categories 32] [--workers 1 2 4 8 16] [--cores 16]
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from bench_forecast import synthetic_demand
+from models.forecaster import FEATURES, MODEL_PARAMS, fit_model, predict_quantiles, prepare_features
+
+
+def _categories(demand, n_categories: int):
+    """Regroup the synthetic series into ``n_categories`` categories."""
+    codes = demand["variant"].str.slice(-5).astype(int) % n_categories
+    return demand.assign(category=[f"Category {c:03d}" for c in codes])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--series", type=int, default=2000)
+    parser.add_argument("--categories", type=int, default=32)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--cores", type=int, default=os.cpu_count() or 1, help="total thread budget")
+    parser.add_argument("--iterations", type=int, default=MODEL_PARAMS["iterations"])
+    args = parser.parse_args()
+    MODEL_PARAMS["iterations"] = args.iterations
+
+    demand = prepare_features(_categories(synthetic_demand(args.series), args.categories))
+    cutoff = demand["year_month"].max()
+    train, test = demand[demand["year_month"] < cutoff], demand[demand["year_month"] == cutoff]
+    print(f"{len(train):,} training rows, {args.categories} categories, {args.cores} cores")
+
+    print(f"{'model':<12} {'workers':>7} {'threads':>7} {'fit (s)':>8} {'speed-up':>8} {'WMAPE':>6}")
+    baseline = None
+    runs = [(None, 1)] + [("category", w) for w in args.workers]
+    for segment_by, workers in runs:
+        threads = max(1, args.cores // workers)
+        start = time.perf_counter()
+        model = fit_model(train, FEATURES, segment_by, workers, threads)
+        seconds = time.perf_counter() - start
+        baseline = baseline or seconds
+        pred = predict_quantiles(model, test[FEATURES])["p50"].to_numpy()
+        wmape = np.abs(test["demand"].to_numpy() - pred).sum() / test["demand"].sum() * 100
+        print(f"{segment_by or 'global':<12} {workers:>7} {threads:>7} {seconds:>8.2f} {baseline / seconds:>7.2f}x {wmape:>5.1f}%")
+
+
+if __name__ == "__main__":
+    main()
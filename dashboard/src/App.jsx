@@ -9,6 +9,7 @@ import ComponentDetail from './pages/ComponentDetail'
 import ChatCopilot from './components/ChatCopilot'
 import WhatIfSimulator from './components/WhatIfSimulator'
 import AgentHub from './pages/AgentHub'
+import { loadData } from './utils/data'
 
 const NAV = [
   { id: 'overview', label: 'Overview', icon: LayoutDashboard },
@@ -27,34 +28,14 @@ export default function App() {
   const [error, setError] = useState(null)
 
   useEffect(() => {
-    const base = window.location.origin
-    const files = [
-      ['kpis', 'kpis.json'],
-      ['historical', 'historical_demand.json'],
-      ['forecasts', 'forecasts.json'],
-      ['safetyStock', 'safety_stock.json'],
-      ['recommendations', 'recommendations.json'],
-      ['metrics', 'model_metrics.json'],
-    ]
-
-    async function loadAll() {
-      try {
-        const results = {}
-        for (const [key, file] of files) {
-          const url = base + '/data/' + file
-          const res = await fetch(url)
-          if (!res.ok) throw new Error(file + ': HTTP ' + res.status)
-          results[key] = await res.json()
-        }
-        setData(results)
-      } catch (err) {
+    // Only the small, catalogue-independent files; pages fetch their own payloads
+    loadData(['kpis', 'seriesManifest'])
+      .then(setData)
+      .catch(err => {
         console.error('Data load error:', err)
         setError(String(err))
-      } finally {
-        setLoading(false)
-      }
-    }
-    loadAll()
+      })
+      .finally(() => setLoading(false))
   }, [])
 
   if (loading) return (
@@ -1,6 +1,9 @@
 import React, { useState, useRef, useEffect } from 'react'
 import { MessageSquare, X, Send, Sparkles, Bot, User } from 'lucide-react'
 import { processQuestion } from '../utils/insights'
+import { loadData } from '../utils/data'
+
+const CHAT_DATA = ['safetyStock', 'recommendations', 'forecasts', 'metrics']
 
 function TypingIndicator() {
   return (
@@ -70,7 +73,9 @@ export default function ChatCopilot({ data }) {
   }, [messages, typing])
 
   useEffect(() => {
-    if (open) inputRef.current?.focus()
+    if (!open) return
+    inputRef.current?.focus()
+    loadData(CHAT_DATA).catch(err => console.error('Data load error:', err))  // warm the cache
   }, [open])
 
   const sendMessage = (text) => {
@@ -82,11 +87,14 @@ export default function ChatCopilot({ data }) {
     setTyping(true)
 
     // Simulate AI thinking delay
-    setTimeout(() => {
-      const response = processQuestion(msg, data)
-      setMessages(prev => [...prev, { role: 'assistant', content: response }])
-      setTyping(false)
-    }, 600 + Math.random() * 800)
+    const delay = new Promise(resolve => setTimeout(resolve, 600 + Math.random() * 800))
+    Promise.all([loadData(CHAT_DATA), delay])
+      .then(([loaded]) => processQuestion(msg, { ...data, ...loaded }))
+      .catch(err => `Sorry, I couldn't load the inventory data (${err.message}).`)
+      .then(response => {
+        setMessages(prev => [...prev, { role: 'assistant', content: response }])
+        setTyping(false)
+      })
   }
 
   return (
@@ -0,0 +1,19 @@
+import React from 'react'
+import { useData } from '../utils/data'
+
+// Renders `Page` once the payloads under `keys` have loaded (see utils/data.js)
+export function withData(keys, Page) {
+  return function PageData(props) {
+    const data = useData(props.data, keys)
+    if (!data) return (
+      <div className="flex items-center justify-center py-24 text-sm text-gray-400 animate-pulse">Loading…</div>
+    )
+    if (data.error) return (
+      <div className="max-w-lg mx-auto mt-12 p-6 bg-white rounded-xl shadow border">
+        <div className="text-red-600 font-bold mb-2">Failed to load data</div>
+        <pre className="text-xs bg-red-50 text-red-700 p-4 rounded-lg overflow-auto">{data.error}</pre>
+      </div>
+    )
+    return <Page {...props} data={data} />
+  }
+}
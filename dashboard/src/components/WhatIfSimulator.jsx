@@ -1,67 +1,112 @@
 import React, { useState, useMemo } from 'react'
 import { Sliders, RotateCcw, Sparkles, TrendingUp, TrendingDown } from 'lucide-react'
+import { withData } from './PageData'
+import { usePartition } from '../utils/data'
 
-// Safety stock formula: Z * σ_demand * √(lead_time)
-// Reorder point: (avg_weekly_demand * lead_time) + safety_stock
-const Z_SCORES = { 0.90: 1.28, 0.95: 1.65, 0.97: 1.88, 0.99: 2.33 }
-
-function computeMetrics(item, params) {
-  const demandMultiplier = params.demandChange / 100
-  const adjWeeklyDemand = item.weekly_demand * (1 + demandMultiplier)
-  const adjLeadTime = item.lead_time_weeks + params.leadTimeChange
-  const zScore = Z_SCORES[params.serviceLevel] || 1.65
+// Scenario cube exported by models/scenarios.py, computed with the pipeline's
+// safety stock formula: scenarios/manifest.json holds the axes and portfolio
+// totals, and each category's slice holds flat arrays in (demand change,
+// lead-time shift, service level, component) order. Slices are fetched when
+// their category is shown; safety stock and cycle stock are delta-encoded
+// along the demand-change axis and decoded once per slice.
+function decodeSlice(manifest, slice) {
+  const { lead_time_shift, service_level } = manifest.axes
+  const nComponents = slice.component_id.length
+  const stride = lead_time_shift.length * service_level.length * nComponents
+  const undelta = values => {
+    const out = Int32Array.from(values)
+    for (let i = stride; i < out.length; i++) out[i] += out[i - stride]
+    return out
+  }
+  return {
+    ...slice,
+    statuses: manifest.statuses,
+    nComponents,
+    safetyStock: undelta(slice.safety_stock),
+    cycleStock: undelta(slice.cycle_stock),
+    componentIndex: Object.fromEntries(slice.component_id.map((id, i) => [id, i])),
+  }
+}
 
-  // Estimate demand std dev from weekly demand (approx 25% CV)
-  const demandStd = adjWeeklyDemand * 0.25
-  const newSafetyStock = Math.ceil(zScore * demandStd * Math.sqrt(Math.max(adjLeadTime, 0.5)))
-  const newReorderPoint = Math.ceil(adjWeeklyDemand * Math.max(adjLeadTime, 0.5) + newSafetyStock)
-  const newWeeksOfCover = adjWeeklyDemand > 0 ? +(item.current_stock / adjWeeklyDemand).toFixed(1) : 999
-  const newOrderQty = Math.max(0, newReorderPoint - item.current_stock)
+function scenarioIndex(manifest, params) {
+  const { demand_change, lead_time_shift, service_level } = manifest.axes
+  const d = demand_change.indexOf(params.demandChange)
+  const l = lead_time_shift.indexOf(params.leadTimeChange)
+  const s = service_level.findIndex(v => v === params.serviceLevel || Math.abs(v - params.serviceLevel) < 1e-9)
+  return { demand: d, scenario: (d * lead_time_shift.length + l) * service_level.length + s }
+}
 
-  const newStatus = newWeeksOfCover <= 1 ? 'critical' : newWeeksOfCover <= adjLeadTime ? 'warning' : 'ok'
+function lookupMetrics(item, cube, { demand, scenario }) {
+  const c = cube.componentIndex[item.component_id]
+  const cell = scenario * cube.nComponents + c
+  const safetyStock = cube.safetyStock[cell]
+  const reorderPoint = safetyStock + cube.cycleStock[cell]
+  const eoq = cube.eoq[demand * cube.nComponents + c]
+  const orderQty = item.current_stock < reorderPoint ? Math.max(0, reorderPoint - item.current_stock + eoq) : 0
 
   return {
-    safety_stock: newSafetyStock,
-    reorder_point: newReorderPoint,
-    weeks_of_cover: newWeeksOfCover,
-    recommended_order_qty: newOrderQty,
-    weekly_demand: +adjWeeklyDemand.toFixed(1),
-    lead_time_weeks: Math.max(adjLeadTime, 0.5),
-    status: newStatus,
-    order_cost: newOrderQty * item.unit_cost,
+    safety_stock: safetyStock,
+    reorder_point: reorderPoint,
+    recommended_order_qty: orderQty,
+    status: cube.statuses[cube.status[cell]],
+    order_cost: orderQty * item.unit_cost,
   }
 }
 
+// Category with the most critical items today, shown first
+function defaultCategory(safetyStock) {
+  const critical = {}
+  safetyStock.forEach(r => { critical[r.category] = (critical[r.category] || 0) + (r.status === 'critical') })
+  return Object.keys(critical).sort((a, b) => critical[b] - critical[a] || a.localeCompare(b))[0]
+}
+
+// Service-level axis entries; "planned" is the per-component levels safety stock was optimised at
+const LEVEL_NAMES = { 0.9: 'Cost-optimized', 0.95: 'Standard', 0.97: 'High availability', 0.99: 'Premium SLA' }
+
+function levelLabel(level) {
+  return level === 'planned' ? 'Planned' : `${(level * 100).toFixed(0)}%`
+}
+
 const STATUS_BADGE = {
   critical: 'bg-red-100 text-red-700',
   warning: 'bg-amber-100 text-amber-700',
   ok: 'bg-green-100 text-green-700',
 }
 
-export default function WhatIfSimulator({ data }) {
-  const { safetyStock } = data
-  const defaults = { demandChange: 0, leadTimeChange: 0, serviceLevel: 0.95 }
+function WhatIfSimulator({ data }) {
+  const { safetyStock, scenarioManifest: manifest } = data
+  const baselineLevel = manifest.axes.service_level[manifest.baseline.service_level]
+  const defaults = { demandChange: 0, leadTimeChange: 0, serviceLevel: baselineLevel }
   const [params, setParams] = useState(defaults)
-  const isModified = params.demandChange !== 0 || params.leadTimeChange !== 0 || params.serviceLevel !== 0.95
+  const [category, setCategory] = useState(() => defaultCategory(safetyStock))
+  const isModified = params.demandChange !== 0 || params.leadTimeChange !== 0 || params.serviceLevel !== baselineLevel
+
+  const slice = usePartition(manifest, category)
+  const cube = useMemo(() => slice && decodeSlice(manifest, slice), [manifest, slice])
+  const index = useMemo(() => scenarioIndex(manifest, params), [manifest, params])
 
   const results = useMemo(() => {
-    return safetyStock.map(item => ({
+    if (!cube) return []
+    return safetyStock.filter(item => item.component_id in cube.componentIndex).map(item => ({
       ...item,
-      sim: computeMetrics(item, params),
+      sim: lookupMetrics(item, cube, index),
     })).sort((a, b) => b.sim.recommended_order_qty * b.unit_cost - a.sim.recommended_order_qty * a.unit_cost)
-  }, [safetyStock, params])
+  }, [safetyStock, cube, index])
 
   const totals = useMemo(() => {
     const baseline = { critical: 0, warning: 0, ok: 0, totalCost: 0 }
-    const simulated = { critical: 0, warning: 0, ok: 0, totalCost: 0 }
-    results.forEach(r => {
+    safetyStock.forEach(r => {
       baseline[r.status]++
       baseline.totalCost += r.recommended_order_qty * r.unit_cost
-      simulated[r.sim.status]++
-      simulated.totalCost += r.sim.order_cost
     })
+    const simulated = {
+      critical: manifest.totals.critical[index.scenario],
+      warning: manifest.totals.warning[index.scenario],
+      ok: manifest.totals.ok[index.scenario],
+      totalCost: manifest.totals.order_cost[index.scenario],
+    }
     return { baseline, simulated }
-  }, [results])
+  }, [safetyStock, manifest, index])
 
   const topImpacted = results.filter(r => r.sim.status !== r.status).slice(0, 8)
 
@@ -124,17 +169,19 @@ export default function WhatIfSimulator({ data }) {
           <div>
             <label className="flex items-center justify-between text-xs font-semibold text-gray-600 mb-2">
               <span>Target Service Level</span>
-              <span className="font-mono font-bold text-bluebird-blue">{(params.serviceLevel * 100).toFixed(0)}%</span>
+              <span className="font-mono font-bold text-bluebird-blue">{levelLabel(params.serviceLevel)}</span>
             </label>
             <select
               value={params.serviceLevel}
-              onChange={e => setParams(p => ({ ...p, serviceLevel: +e.target.value }))}
+              onChange={e => setParams(p => ({ ...p, serviceLevel: e.target.value === 'planned' ? 'planned' : +e.target.value }))}
               className="w-full border border-gray-200 rounded-lg px-3 py-2 text-sm bg-white"
             >
-              <option value={0.90}>90% — Cost-optimized</option>
-              <option value={0.95}>95% — Standard (current)</option>
-              <option value={0.97}>97% — High availability</option>
-              <option value={0.99}>99% — Premium SLA</option>
+              {manifest.axes.service_level.map(level => (
+                <option key={level} value={level}>
+                  {level === 'planned' ? 'Optimised per component' : `${levelLabel(level)} — ${LEVEL_NAMES[level] ?? 'Custom'}`}
+                  {level === baselineLevel ? ' (current)' : ''}
+                </option>
+              ))}
             </select>
           </div>
         </div>
@@ -197,8 +244,8 @@ export default function WhatIfSimulator({ data }) {
               ? `A ${params.demandChange}% demand surge would push ${totals.simulated.critical} items to critical status. Pre-positioning inventory 4-6 weeks ahead of the demand spike is recommended. Total procurement cost increases to $${(totals.simulated.totalCost / 1e6).toFixed(1)}M.`
               : params.leadTimeChange >= 3
               ? `Adding ${params.leadTimeChange} weeks to lead times significantly increases safety stock requirements. ${totals.simulated.critical - totals.baseline.critical > 0 ? `${totals.simulated.critical - totals.baseline.critical} additional items become critical.` : ''} Consider dual-sourcing or expedited shipping for long-lead components.`
-              : params.serviceLevel > 0.95
-              ? `Raising the service level to ${(params.serviceLevel * 100).toFixed(0)}% increases safety buffers, adding $${(Math.max(0, totals.simulated.totalCost - totals.baseline.totalCost) / 1e6).toFixed(1)}M to procurement costs. The trade-off is lower stockout probability across all SKUs.`
+              : params.serviceLevel > baselineLevel
+              ? `Raising the service level to ${levelLabel(params.serviceLevel)} increases safety buffers, adding $${(Math.max(0, totals.simulated.totalCost - totals.baseline.totalCost) / 1e6).toFixed(1)}M to procurement costs. The trade-off is lower stockout probability across all SKUs.`
               : `Under this scenario, ${totals.simulated.critical} items require critical attention with a total procurement budget of $${(totals.simulated.totalCost / 1e6).toFixed(1)}M.`
             }
           </div>
@@ -206,9 +253,24 @@ export default function WhatIfSimulator({ data }) {
       )}
 
       {/* Status Change Table */}
-      {topImpacted.length > 0 && (
-        <div className="bg-white rounded-xl shadow-sm border border-gray-100 p-5">
-          <h3 className="text-xs font-bold text-gray-500 uppercase tracking-wider mb-4">Status Changes ({topImpacted.length} items impacted)</h3>
+      <div className="bg-white rounded-xl shadow-sm border border-gray-100 p-5">
+        <div className="flex items-center justify-between mb-4">
+          <h3 className="text-xs font-bold text-gray-500 uppercase tracking-wider">
+            Status Changes {cube && `(${topImpacted.length} items impacted)`}
+          </h3>
+          <select
+            value={category}
+            onChange={e => setCategory(e.target.value)}
+            className="border border-gray-200 rounded-lg px-2 py-1 text-xs bg-white"
+          >
+            {Object.keys(manifest.categories).map(c => <option key={c} value={c}>{c}</option>)}
+          </select>
+        </div>
+        {!cube ? (
+          <div className="text-xs text-gray-400 py-4 text-center">Loading {category} scenarios...</div>
+        ) : topImpacted.length === 0 ? (
+          <div className="text-xs text-gray-400 py-4 text-center">No {category} components change status in this scenario.</div>
+        ) : (
           <div className="overflow-x-auto">
             <table className="w-full text-sm">
               <thead>
@@ -242,8 +304,10 @@ export default function WhatIfSimulator({ data }) {
               </tbody>
             </table>
           </div>
-        </div>
-      )}
+        )}
+      </div>
     </div>
   )
 }
+
+export default withData(['safetyStock', 'scenarioManifest'], WhatIfSimulator)
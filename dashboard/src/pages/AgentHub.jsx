@@ -1,6 +1,7 @@
 import React, { useState, useEffect, useRef, useMemo } from 'react'
 import { generateProcurementSteps, generateProactiveAlerts, runGoalOptimizer } from '../utils/agent'
 import { IconFromId, FontAwesomeIcon, faRobot, faBell, faBullseye, faCircleCheck, faBoxesStacked, faSackDollar, faArrowTrendDown, faTriangleExclamation } from '../utils/icons'
+import { withData } from '../components/PageData'
 
 // ─── Autonomous Procurement Agent ───────────────────────────────────────────
 
@@ -415,7 +416,7 @@ const TABS = [
   { id: 'optimizer', label: 'Goal Optimizer', icon: faBullseye },
 ]
 
-export default function AgentHub({ data }) {
+function AgentHub({ data }) {
   const [activeTab, setActiveTab] = useState('procurement')
 
   return (
@@ -447,3 +448,5 @@ export default function AgentHub({ data }) {
     </div>
   )
 }
+
+export default withData(['safetyStock', 'recommendations', 'forecasts'], AgentHub)
@@ -1,6 +1,8 @@
 import React, { useMemo } from 'react'
 import { LineChart, Line, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer, ReferenceLine, Area, ComposedChart, Legend } from 'recharts'
 import { ArrowLeft } from 'lucide-react'
+import { useCategorySeries, variantChartRows } from '../utils/series'
+import { withData } from '../components/PageData'
 
 const STATUS_MAP = {
   critical: {
@@ -34,18 +36,11 @@ const CUSTOM_TOOLTIP = ({ active, payload, label }) => {
   )
 }
 
-export default function ComponentDetail({ component, data, onBack }) {
-  const { historical, forecasts } = data
+function ComponentDetail({ component, data, onBack }) {
   const c = component
 
-  const chartData = useMemo(() => {
-    const hist = historical.filter(h => h.category === c.category && h.variant === c.variant)
-    const fore = forecasts.filter(f => f.category === c.category && f.variant === c.variant)
-    const map = {}
-    hist.forEach(h => { map[h.year_month] = { ...map[h.year_month], month: h.year_month, actual: h.demand } })
-    fore.forEach(f => { map[f.year_month] = { ...map[f.year_month], month: f.year_month, forecast: f.predicted, ci_lower: f.ci_lower, ci_upper: f.ci_upper } })
-    return Object.values(map).sort((a, b) => a.month.localeCompare(b.month))
-  }, [historical, forecasts, c])
+  const series = useCategorySeries(data.seriesManifest, c.category)
+  const chartData = useMemo(() => variantChartRows(series, String(c.variant)), [series, c])
 
   const styles = STATUS_MAP[c.status] || STATUS_MAP.ok
 
@@ -175,3 +170,5 @@ export default function ComponentDetail({ component, data, onBack }) {
     </div>
   )
 }
+
+export default withData(['recommendations'], ComponentDetail)
@@ -2,6 +2,8 @@ import React, { useState, useMemo } from 'react'
 import { LineChart, Line, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer, Area, ComposedChart, Legend } from 'recharts'
 import { InsightPanel } from '../components/InsightCard'
 import { generateForecastInsights } from '../utils/insights'
+import { useCategorySeries, variantChartRows, categoryChartRows } from '../utils/series'
+import { withData } from '../components/PageData'
 
 const CUSTOM_TOOLTIP = ({ active, payload, label }) => {
   if (!active || !payload?.length) return null
@@ -17,49 +19,27 @@ const CUSTOM_TOOLTIP = ({ active, payload, label }) => {
   )
 }
 
-export default function DemandForecast({ data }) {
-  const { historical, forecasts, metrics } = data
-  const categories = useMemo(() => [...new Set(historical.map(h => h.category))].sort(), [historical])
+function DemandForecast({ data }) {
+  const { seriesManifest, metrics } = data
+  const categories = useMemo(() => Object.keys(seriesManifest.categories).sort(), [seriesManifest])
   const [selectedCategory, setSelectedCategory] = useState(categories[0])
 
   const variants = useMemo(() => {
-    return [...new Set(historical.filter(h => h.category === selectedCategory).map(h => h.variant))].sort()
-  }, [historical, selectedCategory])
+    return [...(seriesManifest.categories[selectedCategory]?.variants || [])].sort()
+  }, [seriesManifest, selectedCategory])
   const [selectedVariant, setSelectedVariant] = useState(variants[0])
 
   React.useEffect(() => { setSelectedVariant(variants[0]) }, [variants])
 
-  const chartData = useMemo(() => {
-    const hist = historical.filter(h => h.category === selectedCategory && h.variant === selectedVariant)
-    const fore = forecasts.filter(f => f.category === selectedCategory && f.variant === selectedVariant)
-
-    const map = {}
-    hist.forEach(h => { map[h.year_month] = { ...map[h.year_month], month: h.year_month, actual: h.demand } })
-    fore.forEach(f => { map[f.year_month] = { ...map[f.year_month], month: f.year_month, forecast: f.predicted, ci_lower: f.ci_lower, ci_upper: f.ci_upper } })
-
-    return Object.values(map).sort((a, b) => a.month.localeCompare(b.month))
-  }, [historical, forecasts, selectedCategory, selectedVariant])
+  // Only the selected category's payload is fetched
+  const series = useCategorySeries(seriesManifest, selectedCategory)
+  const chartData = useMemo(() => variantChartRows(series, selectedVariant), [series, selectedVariant])
 
   const catMetrics = metrics[selectedCategory]
-  const forecastInsights = useMemo(() => generateForecastInsights(data, selectedCategory), [data, selectedCategory])
+  const forecastInsights = useMemo(() => generateForecastInsights(data, selectedCategory, series), [data, selectedCategory, series])
 
   // Aggregate category-level chart data
-  const categoryChartData = useMemo(() => {
-    const hist = historical.filter(h => h.category === selectedCategory)
-    const fore = forecasts.filter(f => f.category === selectedCategory)
-
-    const monthMap = {}
-    hist.forEach(h => {
-      if (!monthMap[h.year_month]) monthMap[h.year_month] = { month: h.year_month, actual: 0 }
-      monthMap[h.year_month].actual += h.demand
-    })
-    fore.forEach(f => {
-      if (!monthMap[f.year_month]) monthMap[f.year_month] = { month: f.year_month }
-      monthMap[f.year_month].forecast = (monthMap[f.year_month].forecast || 0) + f.predicted
-    })
-
-    return Object.values(monthMap).sort((a, b) => a.month.localeCompare(b.month))
-  }, [historical, forecasts, selectedCategory])
+  const categoryChartData = useMemo(() => categoryChartRows(series), [series])
 
   return (
     <div className="space-y-6">
@@ -185,3 +165,5 @@ export default function DemandForecast({ data }) {
     </div>
   )
 }
+
+export default withData(['metrics'], DemandForecast)
@@ -2,6 +2,7 @@ import React, { useState, useMemo } from 'react'
 import { Search } from 'lucide-react'
 import { InsightPanel } from '../components/InsightCard'
 import { generateInventoryInsights } from '../utils/insights'
+import { withData } from '../components/PageData'
 
 const STATUS_STYLES = {
   critical: { bg: 'bg-red-100', text: 'text-red-700', dot: 'bg-red-500', ring: 'ring-red-200' },
@@ -9,7 +10,7 @@ const STATUS_STYLES = {
   ok: { bg: 'bg-green-100', text: 'text-green-700', dot: 'bg-green-500', ring: 'ring-green-200' },
 }
 
-export default function InventoryHealth({ data, onSelect }) {
+function InventoryHealth({ data, onSelect }) {
   const { safetyStock } = data
   const inventoryInsights = useMemo(() => generateInventoryInsights(data), [data])
   const [filter, setFilter] = useState('all')
@@ -178,3 +179,5 @@ export default function InventoryHealth({ data, onSelect }) {
     </div>
   )
 }
+
+export default withData(['safetyStock'], InventoryHealth)
@@ -3,6 +3,7 @@ import { BarChart, Bar, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContaine
 import { AlertTriangle, Package, TrendingUp, Shield, DollarSign, Clock } from 'lucide-react'
 import { InsightPanel } from '../components/InsightCard'
 import { generateOverviewInsights } from '../utils/insights'
+import { withData } from '../components/PageData'
 
 function KPICard({ icon: Icon, label, value, sub, accent = false, warn = false }) {
   return (
@@ -37,7 +38,7 @@ const CUSTOM_TOOLTIP = ({ active, payload, label }) => {
   )
 }
 
-export default function Overview({ data, onSelect }) {
+function Overview({ data, onSelect }) {
   const { kpis, safetyStock } = data
   const insights = useMemo(() => generateOverviewInsights(data), [data])
 
@@ -163,3 +164,5 @@ export default function Overview({ data, onSelect }) {
     </div>
   )
 }
+
+export default withData(['safetyStock', 'recommendations'], Overview)
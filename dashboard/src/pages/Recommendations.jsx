@@ -1,5 +1,6 @@
 import React, { useState } from 'react'
 import { ChevronDown, ChevronRight, AlertCircle, AlertTriangle } from 'lucide-react'
+import { withData } from '../components/PageData'
 
 const URGENCY = {
   critical: {
@@ -18,7 +19,7 @@ const URGENCY = {
   },
 }
 
-export default function Recommendations({ data }) {
+function Recommendations({ data }) {
   const { recommendations } = data
   const [expandedId, setExpandedId] = useState(null)
 
@@ -138,3 +139,5 @@ export default function Recommendations({ data }) {
     </div>
   )
 }
+
+export default withData(['recommendations', 'safetyStock'], Recommendations)
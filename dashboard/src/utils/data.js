@@ -0,0 +1,76 @@
+// Dashboard payloads, fetched when a page first needs them.
+// App loads only kpis.json and series/manifest.json before the first render;
+// every page asks for its own payloads with useData, so first paint does not
+// grow with the number of SKUs. Responses are cached for the rest of the session.
+
+import { useEffect, useMemo, useState } from 'react'
+
+export const FILES = {
+  kpis: 'kpis.json',
+  seriesManifest: 'series/manifest.json',
+  forecasts: 'forecasts.json',
+  safetyStock: 'safety_stock.json',
+  recommendations: 'recommendations.json',
+  metrics: 'model_metrics.json',
+  scenarioManifest: 'scenarios/manifest.json',
+}
+
+const cache = {}
+
+function fetchJson(file) {
+  return fetch(window.location.origin + '/data/' + file).then(res => {
+    if (!res.ok) throw new Error(file + ': HTTP ' + res.status)
+    return res.json()
+  })
+}
+
+// Cached fetch of a data file by path; a failed request is retried next time
+export function loadFile(file) {
+  if (!cache[file]) {
+    cache[file] = fetchJson(file).catch(err => {
+      delete cache[file]
+      throw err
+    })
+  }
+  return cache[file]
+}
+
+export function loadData(keys) {
+  return Promise.all(keys.map(key => loadFile(FILES[key])))
+    .then(values => Object.fromEntries(keys.map((key, i) => [key, values[i]])))
+}
+
+// `data` merged with the payloads under `keys`, or null while they load
+export function useData(data, keys) {
+  const [loaded, setLoaded] = useState(null)
+  const [error, setError] = useState(null)
+  const id = keys.join(',')
+  useEffect(() => {
+    let active = true
+    loadData(keys)
+      .then(values => { if (active) setLoaded(values) })
+      .catch(err => {
+        console.error('Data load error:', err)
+        if (active) setError(String(err))
+      })
+    return () => { active = false }
+  }, [id])
+  return useMemo(() => (error ? { error } : loaded ? { ...data, ...loaded } : null), [data, loaded, error])
+}
+
+// One partition of a manifest-indexed export (series/, scenarios/), null while it loads
+export function usePartition(manifest, key) {
+  const [payload, setPayload] = useState(null)
+  useEffect(() => {
+    let active = true
+    setPayload(null)
+    const entry = manifest?.categories?.[key]
+    if (entry) {
+      loadFile(entry.file)
+        .then(value => { if (active) setPayload(value) })
+        .catch(err => console.error('Partition load error:', err))
+    }
+    return () => { active = false }
+  }, [manifest, key])
+  return payload
+}
@@ -50,8 +50,9 @@ export function generateOverviewInsights(data) {
   return insights
 }
 
-export function generateForecastInsights(data, category) {
-  const { forecasts, metrics, historical } = data
+// `series` is the category's payload from utils/series.js (null while it loads)
+export function generateForecastInsights(data, category, series) {
+  const { metrics } = data
   const insights = []
   const catMetrics = metrics[category]
 
@@ -65,12 +66,12 @@ export function generateForecastInsights(data, category) {
   }
 
   // Detect demand trend
-  const catForecasts = forecasts.filter(f => f.category === category)
-  if (catForecasts.length > 0) {
-    const months = [...new Set(catForecasts.map(f => f.year_month))].sort()
+  if (series) {
+    const months = series.forecast.months
+    const total = t => series.forecast.predicted.reduce((s, row) => s + (row[t] ?? 0), 0)
     if (months.length >= 2) {
-      const firstMonth = catForecasts.filter(f => f.year_month === months[0]).reduce((s, f) => s + f.predicted, 0)
-      const lastMonth = catForecasts.filter(f => f.year_month === months[months.length - 1]).reduce((s, f) => s + f.predicted, 0)
+      const firstMonth = total(0)
+      const lastMonth = total(months.length - 1)
       const growth = ((lastMonth - firstMonth) / firstMonth * 100).toFixed(0)
       if (Math.abs(growth) > 20) {
         insights.push({
@@ -0,0 +1,41 @@
+// Per-category demand history and forecasts, fetched on demand.
+// The pipeline writes one column-oriented payload per category plus
+// series/manifest.json (see pipeline/export.py); payloads are cached here
+// for the rest of the session.
+
+import { loadFile, usePartition } from './data'
+
+export function loadCategorySeries(manifest, category) {
+  const entry = manifest?.categories?.[category]
+  if (!entry) return Promise.resolve(null)
+  return loadFile(entry.file)
+}
+
+export function useCategorySeries(manifest, category) {
+  return usePartition(manifest, category)
+}
+
+// Chart rows for one variant: actual demand, then forecast with its P10–P90 band
+export function variantChartRows(series, variant) {
+  if (!series) return []
+  const i = series.variants.indexOf(variant)
+  if (i < 0) return []
+  const { history, forecast } = series
+  const rows = history.months.map((month, t) => ({ month, actual: history.demand[i][t] ?? undefined }))
+  forecast.months.forEach((month, t) => {
+    if (forecast.predicted[i][t] == null) return
+    rows.push({ month, forecast: forecast.predicted[i][t], ci_lower: forecast.ci_lower[i][t], ci_upper: forecast.ci_upper[i][t] })
+  })
+  return rows
+}
+
+// Chart rows for the category total across its variants
+export function categoryChartRows(series) {
+  if (!series) return []
+  const sum = (matrix, t) => matrix.reduce((s, row) => s + (row[t] ?? 0), 0)
+  const { history, forecast } = series
+  return [
+    ...history.months.map((month, t) => ({ month, actual: sum(history.demand, t) })),
+    ...forecast.months.map((month, t) => ({ month, forecast: sum(forecast.predicted, t) })),
+  ]
+}
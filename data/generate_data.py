@@ -5,10 +5,20 @@ Generates realistic order, component, inventory, and supplier data.
 import pandas as pd
 import numpy as np
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+import argparse
 import itertools
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from data.storage import write_table
+from models.demand_cube import DemandAccumulator
+from pipeline.metrics import span
 
 RANDOM_SEED = 42
 OUTPUT_DIR = Path(__file__).parent / "generated"
+RECENT_DAYS = 90
 
 BUS_MODELS = {
     "Vision": 0.35,
@@ -94,19 +104,21 @@ SUPPLIERS = [
 ]
 
 
+# Monthly seasonality multipliers (1-indexed month). Peak May-Jul for Aug/Sep delivery.
+SEASONALITY = {
+    1: 0.55, 2: 0.60, 3: 0.75, 4: 0.90, 5: 1.50, 6: 1.70,
+    7: 1.60, 8: 1.10, 9: 0.80, 10: 0.65, 11: 0.50, 12: 0.45,
+}
+ANNUAL_TARGET = 9000
+
+
 def generate_orders(rng: np.random.Generator, start_year: int = 2023, n_years: int = 3) -> pd.DataFrame:
     """Generate 3 years of order data with seasonal patterns."""
     records = []
     order_id = 1
     
-    # Monthly seasonality multipliers (1-indexed month). Peak May-Jul for Aug/Sep delivery.
-    seasonality = {
-        1: 0.55, 2: 0.60, 3: 0.75, 4: 0.90, 5: 1.50, 6: 1.70,
-        7: 1.60, 8: 1.10, 9: 0.80, 10: 0.65, 11: 0.50, 12: 0.45,
-    }
-    
-    annual_target = 9000
-    monthly_base = annual_target / 12
+    seasonality = SEASONALITY
+    monthly_base = ANNUAL_TARGET / 12
     
     for year in range(start_year, start_year + n_years):
         growth = 1 + 0.04 * (year - start_year)  # 4% YoY growth
@@ -141,11 +153,11 @@ def generate_orders(rng: np.random.Generator, start_year: int = 2023, n_years: i
     return pd.DataFrame(records)
 
 
-def generate_components() -> pd.DataFrame:
+def generate_components(categories: dict = None) -> pd.DataFrame:
     """Generate component catalog."""
     records = []
     comp_id = 1
-    for cat, info in COMPONENT_CATEGORIES.items():
+    for cat, info in (categories or COMPONENT_CATEGORIES).items():
         for variant, popularity in info["variants"].items():
             cost = info["base_cost"] * (0.8 + 0.4 * popularity) if info["base_cost"] > 0 else 0
             cost = max(cost, 10) if info["base_cost"] > 0 else 0
@@ -167,8 +179,10 @@ def generate_suppliers() -> pd.DataFrame:
 
 def generate_inventory(components_df: pd.DataFrame, orders_df: pd.DataFrame, rng: np.random.Generator) -> pd.DataFrame:
     """Generate current inventory levels based on recent demand patterns."""
-    # Calculate recent monthly demand per component
-    recent = orders_df[orders_df["order_date"] >= orders_df["order_date"].max() - pd.Timedelta(days=90)]
+    # Orders per component in the last 90 days, from one pass over the orders
+    accumulator = DemandAccumulator(recent_days=RECENT_DAYS)
+    accumulator.add(orders_df)
+    recent = accumulator.recent_counts()
     
     records = []
     for _, comp in components_df.iterrows():
@@ -176,7 +190,7 @@ def generate_inventory(components_df: pd.DataFrame, orders_df: pd.DataFrame, rng
         variant = comp["variant"]
         
         # Count demand from recent orders
-        monthly_demand = len(recent[recent[cat] == variant]) / 3  # 3 months
+        monthly_demand = recent.get((cat, variant), 0) / 3  # 3 months
         monthly_demand = max(monthly_demand, 1)
         
         # Find supplier
@@ -212,32 +226,295 @@ def generate_inventory(components_df: pd.DataFrame, orders_df: pd.DataFrame, rng
     return pd.DataFrame(records)
 
 
+# ---------------------------------------------------------------------------
+# Scale mode: batched, chunked generation for load testing
+# ---------------------------------------------------------------------------
+
+
+def scale_catalog(extra_variants: int = 0, extra_categories: int = 0, seed: int = RANDOM_SEED) -> dict:
+    """Extend COMPONENT_CATEGORIES with synthetic option variants and categories."""
+    rng = np.random.default_rng([seed, 1])
+    categories = {}
+    for cat, info in COMPONENT_CATEGORIES.items():
+        variants = dict(info["variants"])
+        if extra_variants:
+            share = min(variants.values()) / 2
+            variants.update({f"Option {j + 1:03d}": share for j in range(extra_variants)})
+            total = sum(variants.values())
+            variants = {v: w / total for v, w in variants.items()}
+        categories[cat] = {"variants": variants, "base_cost": info["base_cost"]}
+    
+    for i in range(extra_categories):
+        n_variants = 4 + extra_variants
+        weights = rng.dirichlet(np.full(n_variants, 2.0))
+        categories[f"Option Pack {i + 1:03d}"] = {
+            "variants": {f"Option {j + 1:03d}": float(w) for j, w in enumerate(weights)},
+            "base_cost": int(rng.integers(50, 2000)),
+        }
+    return categories
+
+
+def scale_suppliers(categories: dict) -> list:
+    """SUPPLIERS with any extra categories assigned round-robin."""
+    suppliers = [{**sup, "categories": list(sup["categories"])} for sup in SUPPLIERS]
+    known = {cat for sup in SUPPLIERS for cat in sup["categories"]}
+    for i, cat in enumerate(c for c in categories if c not in known):
+        suppliers[i % len(suppliers)]["categories"].append(cat)
+    return suppliers
+
+
+def plan_monthly_orders(scale: float, seed: int = RANDOM_SEED, start_year: int = 2023, n_years: int = 3) -> pd.DataFrame:
+    """Order count, first order number and chunk layout for every month."""
+    rng = np.random.default_rng([seed, 0])
+    months = pd.date_range(f"{start_year}-01-01", periods=12 * n_years, freq="MS")
+    growth = 1 + 0.04 * (months.year.to_numpy() - start_year)
+    season = np.array([SEASONALITY[m] for m in months.month])
+    noise = rng.normal(0, 15 * scale, len(months))
+    n_orders = np.maximum((ANNUAL_TARGET / 12 * scale * season * growth + noise).astype(np.int64), int(50 * scale))
+    return pd.DataFrame({
+        "month_start": months,
+        "n_orders": n_orders,
+        "first_order": np.concatenate([[1], 1 + np.cumsum(n_orders)[:-1]]),
+    })
+
+
+def generate_order_chunk(
+    month_start: pd.Timestamp,
+    n_orders: int,
+    first_order: int,
+    seed_key: tuple,
+    categories: dict,
+    plants: list,
+) -> pd.DataFrame:
+    """Draw one chunk of orders with batched NumPy sampling.
+
+    The generator is seeded from ``seed_key`` alone, so a chunk is identical
+    whichever process produces it.
+    """
+    rng = np.random.default_rng(seed_key)
+    models = list(BUS_MODELS)
+    model_codes = rng.choice(len(models), size=n_orders, p=list(BUS_MODELS.values()))
+    days = rng.integers(0, 28, size=n_orders)
+    
+    chunk = {
+        "order_id": np.char.add("ORD-", np.char.zfill(np.arange(first_order, first_order + n_orders).astype(str), 9)),
+        "order_date": np.datetime64(month_start, "D") + days,
+        "bus_model": pd.Categorical.from_codes(model_codes, models),
+    }
+    if len(plants) > 1:
+        chunk["plant"] = pd.Categorical.from_codes(rng.integers(0, len(plants), size=n_orders), plants)
+    
+    is_ev = model_codes == models.index("EV")
+    for cat, info in categories.items():
+        variants = list(info["variants"])
+        weights = np.array(list(info["variants"].values()))
+        codes = rng.choice(len(variants), size=n_orders, p=weights / weights.sum())
+        if cat == "Fuel Type":
+            codes[is_ev] = variants.index("Electric")
+        chunk[cat] = pd.Categorical.from_codes(codes, variants)
+    return pd.DataFrame(chunk)
+
+
+def _write_order_chunk(task: dict) -> dict:
+    """Worker: generate a chunk, write it, and return its recent-demand counts."""
+    chunk = generate_order_chunk(
+        task["month_start"], task["n_orders"], task["first_order"],
+        task["seed_key"], task["categories"], task["plants"],
+    )
+    write_table(chunk, task["path"], csv=task["csv"], schema="orders")
+    
+    recent = None
+    if task["track_recent"]:
+        # (component, plant, day-of-month) counts, enough to rebuild a trailing window
+        days = (chunk["order_date"].to_numpy().astype("datetime64[D]") - np.datetime64(task["month_start"], "D")).astype(np.int64)
+        plant_codes = chunk["plant"].cat.codes.to_numpy() if "plant" in chunk else np.zeros(len(chunk), dtype=np.int64)
+        n_plants = len(task["plants"])
+        blocks = []
+        for cat in task["categories"]:
+            codes = chunk[cat].cat.codes.to_numpy().astype(np.int64)
+            n_variants = len(task["categories"][cat]["variants"])
+            flat = (codes * n_plants + plant_codes) * 28 + days
+            blocks.append(np.bincount(flat, minlength=n_variants * n_plants * 28).reshape(n_variants, n_plants, 28))
+        recent = np.concatenate(blocks)
+    return {"path": task["path"], "rows": len(chunk), "month_start": task["month_start"], "recent": recent}
+
+
+def generate_inventory_scaled(
+    components_df: pd.DataFrame,
+    suppliers: list,
+    plants: list,
+    recent_counts: np.ndarray,
+    rng: np.random.Generator,
+) -> pd.DataFrame:
+    """Vectorised inventory levels for every (component, plant) location."""
+    n_components, n_plants = len(components_df), len(plants)
+    monthly_demand = np.maximum(recent_counts / 3, 1).ravel()  # component-major, plant-minor
+    
+    supplier_by_cat = {}
+    for cat in components_df["category"].unique():
+        supplier_by_cat[cat] = next((s for s in suppliers if cat in s["categories"]), suppliers[0])
+    supplier = [supplier_by_cat[c] for c in np.repeat(components_df["category"].to_numpy(), n_plants)]
+    
+    n = n_components * n_plants
+    bucket = rng.random(n)
+    weeks_of_stock = np.select(
+        [bucket < 0.25, bucket < 0.60],
+        [rng.uniform(0.3, 2.0, n), rng.uniform(2.0, 6.0, n)],
+        rng.uniform(6.0, 14.0, n),
+    )
+    component_id = np.repeat(components_df["component_id"].to_numpy(), n_plants)
+    plant = np.tile(np.array(plants, dtype=object), n_components)
+    if n_plants > 1:
+        component_id = np.char.add(np.char.add(component_id.astype(str), "-"), plant.astype(str))
+    
+    return pd.DataFrame({
+        "component_id": component_id,
+        "category": np.repeat(components_df["category"].to_numpy(), n_plants),
+        "variant": np.repeat(components_df["variant"].to_numpy(), n_plants),
+        "plant": plant,
+        "current_stock": (weeks_of_stock * monthly_demand / 4.33).astype(np.int64),
+        "monthly_demand_avg": np.round(monthly_demand, 1),
+        "lead_time_weeks": [s["base_lead_weeks"] for s in supplier],
+        "lead_time_std_weeks": [s["lead_time_std_weeks"] for s in supplier],
+        "unit_cost": np.repeat(components_df["unit_cost"].to_numpy(), n_plants),
+        "supplier_id": [s["supplier_id"] for s in supplier],
+        "supplier_name": [s["name"] for s in supplier],
+        "last_restock_date": (np.datetime64("2025-12-01") + rng.integers(0, 60, n)).astype(str),
+    })
+
+
+def generate_scaled(
+    scale: float = 1.0,
+    extra_variants: int = 0,
+    extra_categories: int = 0,
+    plants: int = 1,
+    workers: int = 1,
+    chunk_rows: int = 1_000_000,
+    seed: int = RANDOM_SEED,
+    output_dir: Path = None,
+    csv: bool = False,
+):
+    """Generate a scaled dataset, streaming orders to disk one chunk at a time.
+
+    Orders are written as ``orders/part-YYYY-MM-NNN.feather`` (plus ``.csv``
+    with ``csv=True``). Every chunk has its
+    own seed derived from ``(seed, month, part)``, so for a given set of
+    arguments the dataset is the same regardless of ``workers``.
+    """
+    output_dir = Path(output_dir or OUTPUT_DIR / "scale")
+    orders_dir = output_dir / "orders"
+    orders_dir.mkdir(parents=True, exist_ok=True)
+    for stale in itertools.chain(orders_dir.glob("part-*.feather"), orders_dir.glob("part-*.csv")):
+        stale.unlink()
+    
+    categories = scale_catalog(extra_variants, extra_categories, seed)
+    suppliers = scale_suppliers(categories)
+    plant_names = [f"PLT-{i + 1:02d}" for i in range(plants)]
+    plan = plan_monthly_orders(scale, seed)
+    n_recent_months = int(np.ceil(RECENT_DAYS / 28)) + 1
+    
+    tasks = []
+    for month_idx, month in enumerate(plan.itertuples()):
+        n_parts = max(1, int(np.ceil(month.n_orders / chunk_rows)))
+        bounds = np.linspace(0, month.n_orders, n_parts + 1).astype(np.int64)
+        for part in range(n_parts):
+            tasks.append({
+                "month_start": month.month_start,
+                "n_orders": int(bounds[part + 1] - bounds[part]),
+                "first_order": int(month.first_order + bounds[part]),
+                "seed_key": (seed, month_idx, part),
+                "categories": categories,
+                "plants": plant_names,
+                "track_recent": month_idx >= len(plan) - n_recent_months,
+                "path": orders_dir / f"part-{month.month_start:%Y-%m}-{part:03d}",
+                "csv": csv,
+            })
+    
+    print(f"Generating {plan['n_orders'].sum():,} orders in {len(tasks)} chunks ({workers} workers)...")
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_write_order_chunk, tasks))
+    else:
+        results = [_write_order_chunk(task) for task in tasks]
+    print(f"  → {sum(r['rows'] for r in results):,} orders written to {orders_dir}")
+    
+    # Trailing 90-day demand per (component, plant) from the day-level counts of the last months
+    tracked = [r for r in results if r["recent"] is not None]
+    last_date = plan["month_start"].iloc[-1] + pd.Timedelta(days=27)
+    cutoff = last_date - pd.Timedelta(days=RECENT_DAYS)
+    recent_counts = 0
+    for r in tracked:
+        day_dates = r["month_start"] + pd.to_timedelta(np.arange(28), unit="D")
+        recent_counts = recent_counts + r["recent"][:, :, day_dates >= cutoff].sum(axis=2)
+    
+    components_df = generate_components(categories)
+    write_table(components_df, output_dir / "components")
+    write_table(pd.DataFrame(suppliers), output_dir / "suppliers")
+    
+    inventory_df = generate_inventory_scaled(
+        components_df, suppliers, plant_names, recent_counts, np.random.default_rng([seed, 2]),
+    )
+    write_table(inventory_df, output_dir / "inventory_levels")
+    print(f"  → {len(components_df):,} components, {len(inventory_df):,} inventory locations")
+    print("✅ Scaled data generation complete!")
+    return plan
+
+
 def main():
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
     rng = np.random.default_rng(RANDOM_SEED)
     
     print("Generating orders...")
-    orders_df = generate_orders(rng)
-    orders_df.to_csv(OUTPUT_DIR / "orders.csv", index=False)
+    with span("generate_orders") as s:
+        orders_df = generate_orders(rng)
+        s.rows = len(orders_df)
+    with span("write_orders", rows=len(orders_df)):
+        write_table(orders_df, OUTPUT_DIR / "orders")
     print(f"  → {len(orders_df):,} orders generated")
     
     print("Generating components...")
     components_df = generate_components()
-    components_df.to_csv(OUTPUT_DIR / "components.csv", index=False)
+    write_table(components_df, OUTPUT_DIR / "components")
     print(f"  → {len(components_df)} components generated")
     
     print("Generating suppliers...")
     suppliers_df = generate_suppliers()
-    suppliers_df.to_csv(OUTPUT_DIR / "suppliers.csv", index=False)
+    write_table(suppliers_df, OUTPUT_DIR / "suppliers")
     print(f"  → {len(suppliers_df)} suppliers generated")
     
     print("Generating inventory levels...")
-    inventory_df = generate_inventory(components_df, orders_df, rng)
-    inventory_df.to_csv(OUTPUT_DIR / "inventory_levels.csv", index=False)
+    with span("generate_inventory", rows=len(components_df)):
+        inventory_df = generate_inventory(components_df, orders_df, rng)
+    write_table(inventory_df, OUTPUT_DIR / "inventory_levels")
     print(f"  → {len(inventory_df)} inventory records generated")
     
     print("✅ Data generation complete!")
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Generate synthetic Blue Bird data.")
+    parser.add_argument("--scale", type=float, help="orders multiplier; enables chunked scale mode")
+    parser.add_argument("--extra-variants", type=int, default=0, help="extra variants per category")
+    parser.add_argument("--extra-categories", type=int, default=0, help="extra option categories")
+    parser.add_argument("--plants", type=int, default=1, help="number of plants")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes for chunk generation")
+    parser.add_argument("--chunk-rows", type=int, default=1_000_000, help="maximum orders per chunk")
+    parser.add_argument("--seed", type=int, default=RANDOM_SEED)
+    parser.add_argument("--output-dir", type=Path, help="scale-mode output directory (default: generated/scale)")
+    parser.add_argument("--csv", action="store_true", help="also export scale-mode order chunks as CSV")
+    args = parser.parse_args()
+    
+    if args.scale is None:
+        main()
+    else:
+        generate_scaled(
+            scale=args.scale,
+            extra_variants=args.extra_variants,
+            extra_categories=args.extra_categories,
+            plants=args.plants,
+            workers=args.workers,
+            chunk_rows=args.chunk_rows,
+            seed=args.seed,
+            output_dir=args.output_dir,
+            csv=args.csv,
+        )
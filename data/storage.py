@@ -0,0 +1,131 @@
+"""
+Typed columnar storage for the generated datasets.
+
+Tables are stored as uncompressed Arrow IPC (Feather v2) files, which are read
+back through a memory map with categorical, timestamp and list columns
+intact. CSV is still written alongside as an export and is read as a fallback.
+``iter_table`` reads the same files one bounded batch at a time.
+"""
+import ast
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+from pyarrow import feather
+
+BATCH_ROWS = 1_000_000
+
+# Per-table column types. Orders store every descriptive column as categorical.
+SCHEMAS = {
+    "orders": {"dates": ["order_date"], "categorical": True, "strings": ["order_id"]},
+    "components": {},
+    "suppliers": {"lists": ["categories"]},
+    "inventory_levels": {"dates": ["last_restock_date"]},
+}
+
+
+def _typed(df: pd.DataFrame, schema: dict) -> pd.DataFrame:
+    """Cast a frame to the storage types of its schema."""
+    df = df.copy()
+    for col in schema.get("dates", []):
+        if col in df:
+            df[col] = pd.to_datetime(df[col])
+    if schema.get("categorical"):
+        skip = set(schema.get("dates", [])) | set(schema.get("strings", []))
+        for col in df.columns:
+            if col not in skip and not isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = df[col].astype("category")
+    return df
+
+
+def write_table(df: pd.DataFrame, path: Path, csv: bool = True, schema: str = None):
+    """Write ``path``.feather (typed) and optionally ``path``.csv (export).
+
+    ``path`` has no suffix; its name selects the schema unless ``schema`` is given.
+    """
+    path = Path(path)
+    typed = _typed(df, SCHEMAS.get(schema or path.name, {}))
+    feather.write_feather(typed, path.with_suffix(".feather"), compression="uncompressed")
+    if csv:
+        df.to_csv(path.with_suffix(".csv"), index=False)
+
+
+def _csv_typed(df: pd.DataFrame, schema: dict) -> pd.DataFrame:
+    for col in schema.get("lists", []):
+        if col in df:
+            df[col] = df[col].map(ast.literal_eval)
+    return _typed(df, schema)
+
+
+def _read_csv(path: Path, schema: dict, columns: list = None) -> pd.DataFrame:
+    """CSV fallback that restores the schema's types (and keeps "None" as a string)."""
+    df = pd.read_csv(path, usecols=columns, keep_default_na=False, na_values=[""])
+    return _csv_typed(df, schema)
+
+
+def _feather_files(path: Path) -> list:
+    """``path``.feather, or the ``part-*.feather`` chunks of directory ``path``/, if any."""
+    if path.with_suffix(".feather").exists():
+        return [path.with_suffix(".feather")]
+    if path.is_dir():
+        return sorted(path.glob("part-*.feather"))
+    return []
+
+
+def table_files(path: Path) -> list:
+    """The files ``read_table`` reads for ``path``: its Feather file or chunks, else its CSV, else none."""
+    path = Path(path)
+    files = _feather_files(path)
+    if not files and path.with_suffix(".csv").exists():
+        files = [path.with_suffix(".csv")]
+    return files
+
+
+def read_table(path: Path, columns: list = None, schema: str = None) -> pd.DataFrame:
+    """Read a table written by ``write_table``.
+
+    Looks for ``path``.feather, then a directory ``path``/ of ``part-*.feather``
+    chunks, then ``path``.csv.
+    """
+    path = Path(path)
+    table_schema = SCHEMAS.get(schema or path.name, {})
+    files = _feather_files(path)
+    if not files:
+        return _read_csv(path.with_suffix(".csv"), table_schema, columns)
+    table = pa.concat_tables(feather.read_table(p, columns=columns, memory_map=True) for p in files)
+    return table.to_pandas(split_blocks=True)
+
+
+def table_columns(path: Path) -> list:
+    """Column names of a table written by ``write_table``, without reading its rows."""
+    path = Path(path)
+    files = _feather_files(path)
+    if not files:
+        return list(pd.read_csv(path.with_suffix(".csv"), nrows=0).columns)
+    return pa.ipc.open_file(pa.memory_map(str(files[0]))).schema.names
+
+
+def iter_table(path: Path, columns: list = None, batch_rows: int = BATCH_ROWS, schema: str = None):
+    """Yield a table written by ``write_table`` as typed frames of at most ``batch_rows`` rows.
+
+    Feather files are memory-mapped and converted one record batch at a time
+    and CSV is parsed in chunks, so memory is bounded by the batch size
+    rather than the table size.
+    """
+    path = Path(path)
+    files = _feather_files(path)
+    if not files:
+        table_schema = SCHEMAS.get(schema or path.name, {})
+        chunks = pd.read_csv(path.with_suffix(".csv"), usecols=columns, keep_default_na=False, na_values=[""],
+                             chunksize=batch_rows)
+        for chunk in chunks:
+            yield _csv_typed(chunk, table_schema)
+        return
+    for file in files:
+        reader = pa.ipc.open_file(pa.memory_map(str(file)))
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            if columns is not None:
+                batch = batch.select(columns)
+            for start in range(0, batch.num_rows, batch_rows):
+                yield batch.slice(start, batch_rows).to_pandas(split_blocks=True)
@@ -0,0 +1,239 @@
+"""
+Rolling-origin backtest for the demand forecaster.
+
+For each cutoff month the model is trained on demand up to the cutoff and
+forecasts the following months recursively, exactly as in production. Every
+cutoff records accuracy (MAE/WMAPE per category and per variant) together with
+wall time, peak memory and throughput of the demand build, feature, train and
+predict phases. The report is written as sorted, indented JSON so two runs can
+be diffed, and ``--compare`` flags accuracy or speed regressions between them.
+
+Usage: python -m models.backtest --cutoffs 4 --workers 4 [--compare reports/backtest-base.json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data.storage import iter_table
+from models.demand_cube import stream_demand
+from models.forecaster import (
+    DATA_DIR, FEATURES, FORECAST_HORIZON, MODEL_PARAMS,
+    forecast_routed, prepare_features, sparse_rows,
+)
+from pipeline.metrics import peak_rss_mb
+
+REPORT_DIR = Path(__file__).parent.parent / "reports"
+PHASES = ["demand_build", "features", "train", "predict"]
+
+
+@contextmanager
+def _phase(timings: dict, name: str, rows: int = None):
+    """Record wall time, traced peak memory, process peak RSS and rows/sec for one phase.
+
+    Yields a dict whose ``rows`` may be set inside the phase when the count is not known up front.
+    """
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    phase = {"rows": rows}
+    yield phase
+    rows = phase["rows"]
+    seconds = time.perf_counter() - start
+    _, traced_peak = tracemalloc.get_traced_memory()
+    rss = peak_rss_mb()
+    timings[name] = {
+        "seconds": round(seconds, 4),
+        "rows": int(rows),
+        "rows_per_sec": round(rows / seconds, 1) if seconds > 0 else None,
+        "peak_traced_mb": round(traced_peak / 2**20, 2),
+        "peak_rss_mb": None if rss is None else round(rss, 1),
+    }
+
+
+def _accuracy(actual: pd.Series, pred: pd.Series) -> dict:
+    error = np.abs(actual - pred)
+    return {
+        "MAE": round(float(error.mean()), 3),
+        "WMAPE": round(float(error.sum() / actual.sum() * 100), 3) if actual.sum() > 0 else 0.0,
+    }
+
+
+def backtest_cutoffs(months: pd.DatetimeIndex, n_cutoffs: int, horizon: int = FORECAST_HORIZON, step: int = 1) -> list:
+    """The last ``n_cutoffs`` months (``step`` apart) that leave ``horizon`` months of actuals."""
+    months = pd.DatetimeIndex(sorted(months.unique()))
+    last = len(months) - 1 - horizon
+    cutoffs = [months[last - k * step] for k in range(n_cutoffs) if last - k * step >= 13]
+    return sorted(cutoffs)
+
+
+def run_cutoff(task: dict) -> dict:
+    """Worker: train at one cutoff, forecast ``horizon`` months and score them."""
+    from catboost import CatBoostRegressor
+
+    tracemalloc.start()
+    cutoff, horizon = pd.Timestamp(task["cutoff"]), task["horizon"]
+    timings = {}
+
+    with _phase(timings, "demand_build") as phase:
+        accumulator = stream_demand(Path(task["data_dir"]) / "orders")
+        demand_df = accumulator.cube().to_frame()
+        phase["rows"] = accumulator.rows
+
+    history = demand_df[demand_df["year_month"] <= cutoff]
+    actuals = demand_df[(demand_df["year_month"] > cutoff)
+                        & (demand_df["year_month"] <= cutoff + pd.DateOffset(months=horizon))]
+    with _phase(timings, "features", len(history)):
+        history = prepare_features(history)
+
+    params = {**MODEL_PARAMS, "iterations": task["iterations"], "thread_count": task["thread_count"]}
+    train = history[~sparse_rows(history)]
+    with _phase(timings, "train", len(train)):
+        model = CatBoostRegressor(**params, cat_features=[0, 1])
+        model.fit(train[FEATURES], train["demand"])
+
+    n_series = history[["category", "variant"]].drop_duplicates().shape[0]
+    with _phase(timings, "predict", n_series * horizon):
+        future_df = forecast_routed(model, history, FEATURES, horizon)
+    tracemalloc.stop()
+
+    scored = actuals.merge(
+        future_df[["category", "variant", "year_month", "predicted", "method"]],
+        on=["category", "variant", "year_month"], how="inner",
+    )
+    scored["variant_key"] = scored["category"] + " / " + scored["variant"].astype(str)
+    return {
+        "cutoff": cutoff.strftime("%Y-%m"),
+        "phases": timings,
+        "accuracy": {
+            "overall": _accuracy(scored["demand"], scored["predicted"]),
+            "categories": {cat: _accuracy(g["demand"], g["predicted"]) for cat, g in scored.groupby("category")},
+            "variants": {key: _accuracy(g["demand"], g["predicted"]) for key, g in scored.groupby("variant_key")},
+            "methods": {method: _accuracy(g["demand"], g["predicted"]) for method, g in scored.groupby("method")},
+        },
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=Path(__file__).parent, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(
+    n_cutoffs: int = 4,
+    horizon: int = FORECAST_HORIZON,
+    step: int = 1,
+    workers: int = 1,
+    iterations: int = MODEL_PARAMS["iterations"],
+    data_dir: Path = DATA_DIR,
+    output: Path = None,
+) -> dict:
+    """Backtest over rolling cutoffs in ``workers`` processes and write the JSON report."""
+    months = set()
+    for chunk in iter_table(Path(data_dir) / "orders", columns=["order_date"], schema="orders"):
+        months.update(chunk["order_date"].dt.to_period("M").dt.to_timestamp().unique())
+    cutoffs = backtest_cutoffs(pd.DatetimeIndex(sorted(months)), n_cutoffs, horizon, step)
+    thread_count = max(1, (os.cpu_count() or 1) // workers)
+    tasks = [{
+        "cutoff": str(c), "horizon": horizon, "iterations": iterations,
+        "thread_count": thread_count, "data_dir": str(data_dir),
+    } for c in cutoffs]
+
+    print(f"Backtesting {len(tasks)} cutoffs ({workers} workers × {thread_count} threads)...")
+    start = time.perf_counter()
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(run_cutoff, tasks))
+    else:
+        results = [run_cutoff(task) for task in tasks]
+    wall = time.perf_counter() - start
+
+    summary = {
+        "WMAPE_mean": round(float(np.mean([r["accuracy"]["overall"]["WMAPE"] for r in results])), 3),
+        "MAE_mean": round(float(np.mean([r["accuracy"]["overall"]["MAE"] for r in results])), 3),
+        "phase_seconds_mean": {
+            p: round(float(np.mean([r["phases"][p]["seconds"] for r in results])), 4) for p in PHASES
+        },
+        "wall_seconds": round(wall, 2),
+    }
+    report = {
+        "git_commit": _git_commit(),
+        "config": {"cutoffs": len(tasks), "horizon": horizon, "step": step, "workers": workers,
+                   "iterations": iterations, "thread_count": thread_count},
+        "summary": summary,
+        "cutoffs": results,
+    }
+
+    output = Path(output or REPORT_DIR / "backtest.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+    for r in results:
+        phases = " ".join(f"{p}={r['phases'][p]['seconds']:.2f}s" for p in PHASES)
+        print(f"  {r['cutoff']}: WMAPE={r['accuracy']['overall']['WMAPE']:.1f}% {phases}")
+    print(f"  → mean WMAPE {summary['WMAPE_mean']:.2f}%, wall {wall:.1f}s, report: {output}")
+    return report
+
+
+def compare(baseline: dict, candidate: dict, wmape_tolerance: float = 0.5, slowdown_tolerance: float = 0.25) -> list:
+    """Regressions of ``candidate`` against ``baseline``: WMAPE up by more than
+    ``wmape_tolerance`` points, or a phase slower by more than ``slowdown_tolerance``."""
+    regressions = []
+    old, new = baseline["summary"], candidate["summary"]
+    if new["WMAPE_mean"] - old["WMAPE_mean"] > wmape_tolerance:
+        regressions.append(f"mean WMAPE {old['WMAPE_mean']:.2f}% → {new['WMAPE_mean']:.2f}%")
+
+    old_cats = _mean_category_wmape(baseline)
+    for cat, wmape in _mean_category_wmape(candidate).items():
+        if cat in old_cats and wmape - old_cats[cat] > wmape_tolerance:
+            regressions.append(f"{cat} WMAPE {old_cats[cat]:.2f}% → {wmape:.2f}%")
+
+    for phase in PHASES:
+        before, after = old["phase_seconds_mean"][phase], new["phase_seconds_mean"][phase]
+        if before > 0 and after / before - 1 > slowdown_tolerance:
+            regressions.append(f"{phase} {before:.3f}s → {after:.3f}s (+{(after / before - 1) * 100:.0f}%)")
+    return regressions
+
+
+def _mean_category_wmape(report: dict) -> dict:
+    frame = pd.DataFrame([
+        {"category": cat, "WMAPE": m["WMAPE"]}
+        for r in report["cutoffs"] for cat, m in r["accuracy"]["categories"].items()
+    ])
+    return frame.groupby("category")["WMAPE"].mean().to_dict() if len(frame) else {}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rolling-origin backtest of the demand forecaster.")
+    parser.add_argument("--cutoffs", type=int, default=4)
+    parser.add_argument("--horizon", type=int, default=FORECAST_HORIZON)
+    parser.add_argument("--step", type=int, default=1, help="months between cutoffs")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--iterations", type=int, default=MODEL_PARAMS["iterations"])
+    parser.add_argument("--data-dir", type=Path, default=DATA_DIR)
+    parser.add_argument("--output", type=Path)
+    parser.add_argument("--compare", type=Path, help="baseline report to check for regressions")
+    args = parser.parse_args()
+
+    report = run(args.cutoffs, args.horizon, args.step, args.workers, args.iterations, args.data_dir, args.output)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), report)
+        for line in regressions:
+            print(f"  ⚠️ regression: {line}")
+        if regressions:
+            raise SystemExit(1)
+        print("  ✅ no regressions against", args.compare)
@@ -0,0 +1,198 @@
+"""
+Dense monthly demand cube (series × month) built from order-level data.
+"""
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data.storage import BATCH_ROWS, iter_table, table_columns
+
+NON_COMPONENT_COLUMNS = ["order_id", "order_date", "bus_model", "plant", "year_month"]
+
+
+@dataclass
+class DemandCube:
+    """Monthly order counts for every (category, variant) series.
+
+    Series are sorted by category then variant; months are contiguous month
+    starts, with explicit zeros for months in which a variant had no orders.
+    """
+    categories: np.ndarray
+    variants: np.ndarray
+    months: pd.DatetimeIndex
+    demand: np.ndarray
+
+    @property
+    def n_series(self) -> int:
+        return len(self.variants)
+
+    def to_frame(self) -> pd.DataFrame:
+        """Long (category, variant, year_month) frame, one row per cube cell."""
+        n_months = len(self.months)
+        return pd.DataFrame({
+            "year_month": np.tile(self.months.to_numpy(), self.n_series),
+            "variant": np.repeat(self.variants, n_months),
+            "demand": self.demand.ravel(),
+            "category": np.repeat(self.categories, n_months),
+            "year": np.tile(self.months.year.to_numpy(), self.n_series),
+            "month": np.tile(self.months.month.to_numpy(), self.n_series),
+            "quarter": np.tile(self.months.quarter.to_numpy(), self.n_series),
+        })
+
+
+def month_index(dates) -> np.ndarray:
+    """Months since 1970-01 for each date, as int64."""
+    values = pd.to_datetime(dates).to_numpy()
+    return values.astype("datetime64[M]").astype(np.int64)
+
+
+def component_columns(orders_df: pd.DataFrame) -> list:
+    """Component category columns of an orders frame, in sorted order."""
+    return sorted(c for c in orders_df.columns if c not in NON_COMPONENT_COLUMNS)
+
+
+def _variant_codes(values: pd.Series):
+    """Integer codes and sorted labels for one category column (-1 = missing)."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        labels = values.cat.categories
+        order = np.argsort(labels.to_numpy(dtype=object))
+        remap = np.empty(len(order) + 1, dtype=np.int64)
+        remap[order] = np.arange(len(order))
+        remap[-1] = -1
+        return remap[values.cat.codes.to_numpy()], labels[order]
+    return pd.factorize(values, sort=True)
+
+
+class DemandAccumulator:
+    """Monthly order counts per (category, variant), folded in one chunk of orders at a time.
+
+    Each category column is reduced to integer codes (categorical columns are
+    used as-is) and folded into its (variants × months) block with one
+    ``np.bincount`` per chunk. With ``recent_days`` it also keeps daily counts
+    for the trailing window ending at the latest order date, i.e. orders on or
+    after ``last date - recent_days``. Memory is the blocks plus one chunk,
+    whatever the number of orders, and chunks may arrive in any order. Orders
+    with a missing variant are not counted.
+    """
+
+    def __init__(self, recent_days: int = 0):
+        self.recent_days = recent_days
+        self.rows = 0
+        self._variants = {}  # category -> {variant: row in its blocks}
+        self._monthly = {}  # category -> (variants × months) counts from _first_month
+        self._daily = {}  # category -> (variants × window) counts ending at _last_day
+        self._first_month = self._last_month = self._last_day = None
+
+    @property
+    def _window(self) -> int:
+        return self.recent_days + 1 if self.recent_days else 0
+
+    def add(self, orders_df: pd.DataFrame):
+        """Fold one chunk of orders into the counts."""
+        if orders_df.empty:
+            return
+        months = month_index(orders_df["order_date"])
+        self._extend_months(int(months.min()), int(months.max()))
+        month_idx = months - self._first_month
+        if self._window:
+            days = pd.to_datetime(orders_df["order_date"]).to_numpy().astype("datetime64[D]").astype(np.int64)
+            self._advance_days(int(days.max()))
+            day_idx = days - (self._last_day - self._window + 1)
+            recent = day_idx >= 0
+
+        for col in component_columns(orders_df):
+            codes, labels = _variant_codes(orders_df[col])
+            rows = self._rows(col, labels)
+            valid = codes >= 0
+            series = rows[codes[valid]]
+            self._monthly[col] += _count(series, month_idx[valid], self._monthly[col].shape)
+            if self._window:
+                keep = recent[valid]
+                self._daily[col] += _count(series[keep], day_idx[valid][keep], self._daily[col].shape)
+        self.rows += len(orders_df)
+
+    def _rows(self, col: str, labels) -> np.ndarray:
+        """Block rows of ``labels`` in category ``col``, adding rows for unseen variants."""
+        known = self._variants.setdefault(col, {})
+        rows = np.array([known.setdefault(label, len(known)) for label in labels], dtype=np.int64)
+        n_months = self._last_month - self._first_month + 1
+        widths = [(self._monthly, n_months)] + ([(self._daily, self._window)] if self._window else [])
+        for blocks, width in widths:
+            block = blocks.get(col, np.zeros((0, width), dtype=np.int64))
+            if len(block) < len(known):
+                block = np.vstack([block, np.zeros((len(known) - len(block), width), dtype=np.int64)])
+            blocks[col] = block
+        return rows
+
+    def _extend_months(self, first: int, last: int):
+        if self._first_month is None:
+            self._first_month, self._last_month = first, last
+            return
+        before = max(self._first_month - first, 0)
+        after = max(last - self._last_month, 0)
+        if before or after:
+            for col, block in self._monthly.items():
+                self._monthly[col] = np.pad(block, ((0, 0), (before, after)))
+            self._first_month -= before
+            self._last_month += after
+
+    def _advance_days(self, last_day: int):
+        """Move the trailing window forward to end at ``last_day``, dropping days that fall out of it."""
+        if self._last_day is not None and last_day > self._last_day:
+            shift = min(last_day - self._last_day, self._window)
+            for col, block in self._daily.items():
+                self._daily[col] = np.pad(block[:, shift:], ((0, 0), (0, shift)))
+        if self._last_day is None or last_day > self._last_day:
+            self._last_day = last_day
+
+    def cube(self) -> DemandCube:
+        """The counts so far as a ``DemandCube``: categories and variants sorted, months contiguous."""
+        categories, variants, blocks = [], [], []
+        for col in sorted(self._monthly):
+            labels = sorted(self._variants[col])
+            categories.append(np.full(len(labels), col, dtype=object))
+            variants.append(np.asarray(labels, dtype=object))
+            blocks.append(self._monthly[col][[self._variants[col][label] for label in labels]])
+        n_months = self._last_month - self._first_month + 1
+        months = pd.date_range(
+            pd.Timestamp(np.datetime64(self._first_month, "M")), periods=n_months, freq="MS"
+        )
+        return DemandCube(
+            categories=np.concatenate(categories),
+            variants=np.concatenate(variants),
+            months=months,
+            demand=np.vstack(blocks).astype(np.int64),
+        )
+
+    def recent_counts(self) -> pd.Series:
+        """Orders per (category, variant) in the trailing ``recent_days`` window."""
+        index = [(col, variant) for col in self._daily for variant in self._variants[col]]
+        counts = [self._daily[col][row].sum() for col in self._daily for row in self._variants[col].values()]
+        return pd.Series(counts, index=pd.MultiIndex.from_tuples(index, names=["category", "variant"]), dtype=np.int64)
+
+
+def _count(rows: np.ndarray, cols: np.ndarray, shape: tuple) -> np.ndarray:
+    """(rows × cols) occurrence counts of the (row, col) pairs."""
+    cells = rows * shape[1] + cols
+    return np.bincount(cells, minlength=shape[0] * shape[1]).reshape(shape)
+
+
+def build_demand_cube(orders_df: pd.DataFrame) -> DemandCube:
+    """Count orders per (category, variant, month) into a dense cube."""
+    accumulator = DemandAccumulator()
+    accumulator.add(orders_df)
+    return accumulator.cube()
+
+
+def stream_demand(orders_path: Path, batch_rows: int = BATCH_ROWS, recent_days: int = 0) -> DemandAccumulator:
+    """Fold a stored orders table into a ``DemandAccumulator`` one batch at a time.
+
+    Only ``order_date`` and the component columns are read.
+    """
+    columns = ["order_date"] + [c for c in table_columns(orders_path) if c not in NON_COMPONENT_COLUMNS]
+    accumulator = DemandAccumulator(recent_days)
+    for chunk in iter_table(orders_path, columns=columns, batch_rows=batch_rows, schema="orders"):
+        accumulator.add(chunk)
+    return accumulator
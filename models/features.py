@@ -0,0 +1,103 @@
+"""
+Lag and rolling-window features on a dense (series × month) demand matrix.
+
+Training and recursive forecasting both call ``window_features`` on the
+``WINDOW`` months preceding each target month, so the two cannot drift apart.
+"""
+import numpy as np
+import pandas as pd
+
+from models.demand_cube import month_index
+
+LAGS = [1, 3, 6, 12]
+ROLLING_MEANS = [3, 6]
+WINDOW = max(LAGS)
+
+
+def window_features(windows: np.ndarray) -> dict:
+    """Lag and rolling features from the trailing ``WINDOW`` values (oldest first).
+
+    ``windows`` has shape (..., WINDOW) with NaN for months before a series'
+    history. Rolling statistics use whatever values are present
+    (``min_periods=1``); std is the sample std and is NaN below two values,
+    matching pandas ``rolling(...).std()``.
+    """
+    features = {f"lag_{lag}": windows[..., -lag] for lag in LAGS}
+    for width in ROLLING_MEANS:
+        recent = windows[..., -width:]
+        valid = ~np.isnan(recent)
+        count = valid.sum(axis=-1)
+        total = np.where(valid, recent, 0).sum(axis=-1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(count > 0, total / count, np.nan)
+            features[f"rolling_mean_{width}"] = mean
+            if width == 3:
+                dev = np.where(valid, recent - mean[..., None], 0)
+                var = (dev * dev).sum(axis=-1) / (count - 1)
+                features["rolling_std_3"] = np.where(count > 1, np.sqrt(var), np.nan)
+    return features
+
+
+def growth_features(current: np.ndarray, windows: np.ndarray) -> dict:
+    """Year-over-year growth of ``current`` against the same month a year earlier.
+
+    NaN where that month is missing or zero. Unlike the window features this
+    needs the target month's own demand, so it is descriptive only.
+    """
+    base = windows[..., -12]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        growth = np.where(base != 0, (current - base) / base, np.nan)
+    return {"yoy_growth": growth}
+
+
+def matrix_features(matrix: np.ndarray) -> dict:
+    """Features for every cell of a (series × month) matrix, each from the months before it."""
+    n_series = matrix.shape[0]
+    matrix = matrix.astype(float)
+    padded = np.concatenate([np.full((n_series, WINDOW), np.nan), matrix], axis=1)
+    windows = np.lib.stride_tricks.sliding_window_view(padded, WINDOW, axis=1)[:, :-1]
+    features = window_features(windows)
+    features.update(growth_features(matrix, windows))
+    return features
+
+
+def to_matrix(df: pd.DataFrame, value: str = "demand"):
+    """Scatter a long (category, variant, year_month) frame into a calendar-aligned matrix.
+
+    Returns (matrix, series_idx, month_idx, combos, first_month) where
+    ``series_idx``/``month_idx`` give each row's cell, ``combos`` lists
+    series in order of first appearance and months missing from ``df`` are NaN.
+    """
+    grouped = df.groupby(["category", "variant"], sort=False)
+    series_idx = grouped.ngroup().to_numpy()
+    months = month_index(df["year_month"])
+    first_month = months.min()
+    month_idx = months - first_month
+    combos = grouped.size().index.to_frame(index=False)
+
+    matrix = np.full((len(combos), int(month_idx.max()) + 1), np.nan)
+    matrix[series_idx, month_idx] = df[value].to_numpy(dtype=float)
+    return matrix, series_idx, month_idx, combos, first_month
+
+
+class FeatureState:
+    """Trailing window per series for recursive forecasting; each step is O(series)."""
+
+    def __init__(self, matrix: np.ndarray):
+        tail = np.asarray(matrix, dtype=float)[:, -WINDOW:]
+        if tail.shape[1] < WINDOW:
+            tail = np.concatenate([np.full((tail.shape[0], WINDOW - tail.shape[1]), np.nan), tail], axis=1)
+        self.tail = tail.copy()
+
+    def features(self) -> dict:
+        """Features for the month after the current window."""
+        return window_features(self.tail)
+
+    def growth(self, values: np.ndarray) -> dict:
+        """Growth features for ``values`` as the month after the current window."""
+        return growth_features(np.asarray(values, dtype=float), self.tail)
+
+    def append(self, values: np.ndarray):
+        """Advance one month, appending ``values`` as the newest observation."""
+        self.tail[:, :-1] = self.tail[:, 1:]
+        self.tail[:, -1] = values
@@ -3,51 +3,71 @@ CatBoost demand forecasting model for Blue Bird component variants.
 """
 import pandas as pd
 import numpy as np
-from catboost import CatBoostRegressor, Pool
-from sklearn.metrics import mean_absolute_error
 from pathlib import Path
 import json
+import shutil
 import warnings
 warnings.filterwarnings("ignore")
 
+from data.storage import read_table, write_table
+from models import intermittent
+from models.demand_cube import build_demand_cube, month_index, stream_demand
+from models.features import LAGS, FeatureState, matrix_features, to_matrix
+from models.hierarchy import TAKE_RATE_HALFLIFE, ModelMix, leaf_forecast, round_coherent, spread_std, stream_mix, take_rates
+from models.segments import SEGMENT_BY, SegmentedModel, default_thread_count, fit_segments
+from pipeline.metrics import span
+
 DATA_DIR = Path(__file__).parent.parent / "data" / "generated"
 OUTPUT_DIR = Path(__file__).parent.parent / "dashboard" / "public" / "data"
 
+MODEL_DIR = Path(__file__).parent / "artifacts"
+
+FORECAST_HORIZON = 6
+HOLDOUT_MONTHS = 6
+
+CAT_FEATURES = ["category", "variant"]
+NUM_FEATURES = ["month", "quarter", "lag_1", "lag_3", "lag_6", "lag_12",
+                "rolling_mean_3", "rolling_std_3", "rolling_mean_6",
+                "month_sin", "month_cos"]
+FEATURES = CAT_FEATURES + NUM_FEATURES
+
+# One multi-quantile fit yields every band; the median is the point forecast
+QUANTILES = (0.10, 0.50, 0.90, 0.95)
+QUANTILE_COLUMNS = [f"p{round(q * 100)}" for q in QUANTILES]
+POINT_QUANTILE = "p50"
+# Holdout calibration of the P10–P90 band (see calibration_factors)
+BAND_COVERAGE = 0.80
+COVERAGE_TOLERANCE = 0.10  # warn when raw holdout coverage is further than this from BAND_COVERAGE
+MIN_CALIBRATION_ROWS = 30
+MAX_CALIBRATION_FACTOR = 5.0
+
+MODEL_PARAMS = {
+    "loss_function": "MultiQuantile:alpha=" + ",".join(f"{q:g}" for q in QUANTILES),
+    "iterations": 500,
+    "learning_rate": 0.05,
+    "depth": 6,
+    "l2_leaf_reg": 3,
+    "random_seed": 42,
+    "verbose": 0,
+}
+WARM_START_ITERATIONS = 100
+# Columns of the saved forecast table read back by the downstream stages
+FORECAST_COLUMNS = ["category", "variant", "year_month", "predicted"] + QUANTILE_COLUMNS + ["method"]
+SERIES_KEYS = ["category", "variant", "year_month"]
+FORECAST_MODES = ("train", "forecast", "retrain")
+
 
 def build_monthly_demand(orders_df: pd.DataFrame) -> pd.DataFrame:
-    """Pivot orders into monthly demand per component variant."""
-    orders_df["order_date"] = pd.to_datetime(orders_df["order_date"])
-    orders_df["year_month"] = orders_df["order_date"].dt.to_period("M")
-    
-    component_cols = [c for c in orders_df.columns if c not in ["order_id", "order_date", "bus_model", "year_month"]]
-    
-    records = []
-    for col in component_cols:
-        monthly = orders_df.groupby(["year_month", col]).size().reset_index(name="demand")
-        monthly.rename(columns={col: "variant"}, inplace=True)
-        monthly["category"] = col
-        records.append(monthly)
-    
-    demand = pd.concat(records, ignore_index=True)
-    demand["year_month"] = demand["year_month"].dt.to_timestamp()
-    demand["year"] = demand["year_month"].dt.year
-    demand["month"] = demand["year_month"].dt.month
-    demand["quarter"] = demand["year_month"].dt.quarter
-    return demand.sort_values(["category", "variant", "year_month"]).reset_index(drop=True)
+    """Pivot orders into monthly demand per component variant, zero-filling empty months."""
+    return build_demand_cube(orders_df).to_frame()
 
 
 def add_features(df: pd.DataFrame) -> pd.DataFrame:
     """Add lag, rolling, and growth features."""
     df = df.copy()
-    group = df.groupby(["category", "variant"])["demand"]
-    
-    for lag in [1, 3, 6, 12]:
-        df[f"lag_{lag}"] = group.shift(lag)
-    
-    df["rolling_mean_3"] = group.transform(lambda x: x.shift(1).rolling(3, min_periods=1).mean())
-    df["rolling_std_3"] = group.transform(lambda x: x.shift(1).rolling(3, min_periods=1).std())
-    df["rolling_mean_6"] = group.transform(lambda x: x.shift(1).rolling(6, min_periods=1).mean())
-    df["yoy_growth"] = (df["demand"] - df["lag_12"]) / df["lag_12"].replace(0, np.nan)
+    matrix, series_idx, month_idx, _, _ = to_matrix(df)
+    for name, values in matrix_features(matrix).items():
+        df[name] = values[series_idx, month_idx]
     
     # Bus model mix features (from orders)
     df["month_sin"] = np.sin(2 * np.pi * df["month"] / 12)
@@ -56,146 +76,600 @@ def add_features(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def train_and_forecast(demand_df: pd.DataFrame):
-    """Train CatBoost model and generate forecasts."""
-    demand_df = add_features(demand_df)
-    demand_df = demand_df.dropna(subset=["lag_1"])  # Drop rows without lag features
-    
-    cat_features = ["category", "variant"]
-    num_features = ["month", "quarter", "lag_1", "lag_3", "lag_6", "lag_12",
-                    "rolling_mean_3", "rolling_std_3", "rolling_mean_6",
-                    "month_sin", "month_cos"]
-    features = cat_features + num_features
-    
-    # Fill NaN in numeric features
-    for col in num_features:
-        demand_df[col] = demand_df[col].fillna(0)
-    
-    # Train/test split: last 6 months for test
-    cutoff = demand_df["year_month"].max() - pd.DateOffset(months=6)
-    train = demand_df[demand_df["year_month"] <= cutoff]
-    test = demand_df[demand_df["year_month"] > cutoff]
-    
-    print(f"  Train: {len(train):,} rows | Test: {len(test):,} rows")
-    
-    model = CatBoostRegressor(
-        iterations=500,
-        learning_rate=0.05,
-        depth=6,
-        l2_leaf_reg=3,
-        random_seed=42,
-        verbose=0,
-        cat_features=[0, 1],
-    )
-    
-    model.fit(train[features], train["demand"])
-    
-    # Evaluate
-    test_pred = model.predict(test[features])
-    test = test.copy()
-    test["predicted"] = np.maximum(test_pred, 0)
-    
-    # Metrics by category
-    metrics = {}
-    for cat in test["category"].unique():
-        mask = test["category"] == cat
-        actual = test.loc[mask, "demand"]
-        pred = test.loc[mask, "predicted"]
-        mae = mean_absolute_error(actual, pred)
-        mape = np.mean(np.abs((actual - pred) / actual.replace(0, np.nan)).dropna()) * 100
-        wmape = np.sum(np.abs(actual - pred)) / np.sum(actual) * 100 if actual.sum() > 0 else 0
-        metrics[cat] = {"MAE": round(mae, 1), "MAPE": round(mape, 1), "WMAPE": round(wmape, 1)}
+def _future_calendar(date: pd.Timestamp) -> dict:
+    """Calendar features for a forecast month."""
+    return {
+        "year_month": date,
+        "year": date.year,
+        "month": date.month,
+        "quarter": (date.month - 1) // 3 + 1,
+        "month_sin": np.sin(2 * np.pi * date.month / 12),
+        "month_cos": np.cos(2 * np.pi * date.month / 12),
+    }
+
+
+def predict_quantiles(model, X: pd.DataFrame) -> pd.DataFrame:
+    """Non-negative, non-crossing quantile predictions, one column per QUANTILES entry.
+
+    A single-output model (e.g. one saved before quantile training) fills
+    every column with its point prediction.
+    """
+    pred = np.asarray(model.predict(X), dtype=float)
+    if pred.ndim == 1:
+        pred = np.repeat(pred[:, None], len(QUANTILES), axis=1)
+    pred = np.maximum.accumulate(np.maximum(pred, 0), axis=1)
+    return pd.DataFrame(pred, columns=QUANTILE_COLUMNS, index=X.index)
+
+
+def forecast_future(model, demand_df: pd.DataFrame, features: list, horizon: int = FORECAST_HORIZON) -> pd.DataFrame:
+    """Recursive multi-step forecast for every series with one predict call per step.
+
+    Per-series state is a ``FeatureState`` window over the demand matrix, so
+    each step costs O(series) and uses the same feature code as training.
+    """
+    matrix, _, _, combos, _ = to_matrix(demand_df)
+    state = FeatureState(matrix)
+    n_series = len(combos)
+    categories = combos["category"].to_numpy()
+    variants = combos["variant"].to_numpy()
+    last_date = demand_df["year_month"].max()
     
-    print("  Evaluation metrics (WMAPE by category):")
-    for cat, m in sorted(metrics.items(), key=lambda x: x[1]["WMAPE"]):
-        print(f"    {cat}: WMAPE={m['WMAPE']}%, MAE={m['MAE']}")
+    steps = []
+    with span("forecast_loop", rows=n_series * horizon):
+        for i in range(1, horizon + 1):
+            step = {"category": categories, "variant": variants}
+            step.update(_future_calendar(last_date + pd.DateOffset(months=i)))
+            step.update({name: np.nan_to_num(values) for name, values in state.features().items()})
+            
+            step_df = pd.DataFrame(step, index=pd.RangeIndex(n_series))
+            quantiles = predict_quantiles(model, step_df[features])
+            pred = np.rint(quantiles[POINT_QUANTILE].to_numpy()).astype(np.int64)
+            step_df["demand"] = pred
+            step_df["predicted"] = pred
+            step_df[QUANTILE_COLUMNS] = quantiles.to_numpy()
+            step_df = step_df.assign(**state.growth(pred))
+            steps.append(step_df)
+            state.append(pred)
     
-    # Generate future forecasts (next 6 months)
+    return pd.concat(steps, ignore_index=True)
+
+
+def _forecast_future_rowwise(model, demand_df: pd.DataFrame, features: list, horizon: int = FORECAST_HORIZON) -> pd.DataFrame:
+    """Reference forecast loop: one predict and one concat per (step, series)."""
     last_date = demand_df["year_month"].max()
     combos = demand_df[["category", "variant"]].drop_duplicates()
     
     future_records = []
-    # Use last known state per combo for rolling forecast
-    last_states = {}
-    for _, row in demand_df.sort_values("year_month").groupby(["category", "variant"]).last().iterrows():
-        last_states[row.name] = row
-    
     forecast_df = demand_df.copy()
     
-    for i in range(1, 7):
+    for i in range(1, horizon + 1):
         future_date = last_date + pd.DateOffset(months=i)
         for _, combo in combos.iterrows():
             cat, var = combo["category"], combo["variant"]
             hist = forecast_df[(forecast_df["category"] == cat) & (forecast_df["variant"] == var)].sort_values("year_month")
             
-            row = {
-                "category": cat,
-                "variant": var,
-                "year_month": future_date,
-                "year": future_date.year,
-                "month": future_date.month,
-                "quarter": (future_date.month - 1) // 3 + 1,
-                "month_sin": np.sin(2 * np.pi * future_date.month / 12),
-                "month_cos": np.cos(2 * np.pi * future_date.month / 12),
-            }
+            row = {"category": cat, "variant": var}
+            row.update(_future_calendar(future_date))
             
             demands = hist["demand"].tolist()
-            for lag in [1, 3, 6, 12]:
-                row[f"lag_{lag}"] = demands[-lag] if len(demands) >= lag else 0
+            for lag in LAGS:
+                row[f"lag_{lag}"] = float(demands[-lag]) if len(demands) >= lag else 0.0
             
             recent = demands[-3:] if len(demands) >= 3 else demands
             row["rolling_mean_3"] = np.mean(recent) if recent else 0
-            row["rolling_std_3"] = np.std(recent) if len(recent) > 1 else 0
+            row["rolling_std_3"] = np.std(recent, ddof=1) if len(recent) > 1 else 0
             recent6 = demands[-6:] if len(demands) >= 6 else demands
             row["rolling_mean_6"] = np.mean(recent6) if recent6 else 0
             
-            pred = max(0, model.predict(pd.DataFrame([row])[features])[0])
+            quantiles = predict_quantiles(model, pd.DataFrame([row])[features]).iloc[0]
+            pred = quantiles[POINT_QUANTILE]
             row["demand"] = round(pred)
             row["predicted"] = round(pred)
+            row.update(quantiles.to_dict())
             
             future_records.append(row)
             forecast_df = pd.concat([forecast_df, pd.DataFrame([row])], ignore_index=True)
     
-    future_df = pd.DataFrame(future_records)
+    return pd.DataFrame(future_records)
+
+
+def sparse_rows(demand_df: pd.DataFrame, through: pd.Timestamp = None) -> np.ndarray:
+    """Mask of rows whose series is intermittent or lumpy, classified on months up to ``through``."""
+    matrix, series_idx, _, _, first_month = to_matrix(demand_df)
+    if through is not None:
+        matrix = matrix[:, : int(month_index([through])[0] - first_month) + 1]
+    classes = intermittent.classify(matrix)["demand_class"]
+    return intermittent.is_sparse(classes)[series_idx]
+
+
+def statistical_forecast(demand_df: pd.DataFrame, horizon: int = FORECAST_HORIZON) -> pd.DataFrame:
+    """Flat Croston/SBA/TSB forecast of every series in ``demand_df``, laid out like ``forecast_future``."""
+    matrix, _, _, combos, _ = to_matrix(demand_df)
+    result = intermittent.forecast(matrix, QUANTILES)
+    pred = np.rint(result["rate"]).astype(np.int64)
+    last_date = demand_df["year_month"].max()
+    
+    steps = []
+    with span("statistical_forecast", rows=len(combos) * horizon):
+        for i in range(1, horizon + 1):
+            step_df = pd.DataFrame({
+                "category": combos["category"].to_numpy(),
+                "variant": combos["variant"].to_numpy(),
+                **_future_calendar(last_date + pd.DateOffset(months=i)),
+            }, index=pd.RangeIndex(len(combos)))
+            step_df["demand"] = pred
+            step_df["predicted"] = pred
+            step_df[QUANTILE_COLUMNS] = result["quantiles"]
+            step_df["method"] = result["method"]
+            steps.append(step_df)
+    return pd.concat(steps, ignore_index=True)
+
+
+def forecast_routed(model, demand_df: pd.DataFrame, features: list, horizon: int = FORECAST_HORIZON,
+                    route_sparse: bool = True, batched: bool = True) -> pd.DataFrame:
+    """Forecast every series: CatBoost for smooth and erratic demand, Croston/SBA/TSB for sparse series.
+
+    ``route_sparse=False`` sends every series through CatBoost.
+    """
+    sparse = sparse_rows(demand_df) if route_sparse else np.zeros(len(demand_df), dtype=bool)
+    frames = []
+    if (~sparse).any():
+        recursive = forecast_future if batched else _forecast_future_rowwise
+        frames.append(recursive(model, demand_df[~sparse], features, horizon).assign(method="catboost"))
+    if sparse.any():
+        frames.append(statistical_forecast(demand_df[sparse], horizon))
+    if len(frames) == 1:
+        return frames[0]
+    return pd.concat(frames, ignore_index=True).sort_values("year_month", kind="stable", ignore_index=True)
+
+
+def hierarchical_forecast(model, mix: ModelMix, horizon: int = FORECAST_HORIZON) -> pd.DataFrame:
+    """Variant forecasts from the bus-model volume forecast × take-rates, laid out like ``statistical_forecast``.
+
+    ``model`` is a volume model from ``fit_volume_model``. Integer forecasts
+    within a category add up to the category's rounded total.
+    """
+    volume_df = prepare_features(mix.volume_cube().to_frame())
+    volume = forecast_future(model, volume_df, FEATURES, horizon)
+    wide = lambda column: volume.pivot(index="variant", columns="year_month", values=column).reindex(mix.models).to_numpy()
+    
+    with span("leaf_forecast", rows=len(mix.variants) * horizon):
+        std = spread_std(wide("p10"), wide("p90"))
+        result = leaf_forecast(wide(POINT_QUANTILE), std, take_rates(mix), QUANTILES)
+        _, category_codes = np.unique(mix.categories.astype(str), return_inverse=True)
+        pred = round_coherent(result["mean"], category_codes)
+        last_date = mix.months[-1]
+        steps = []
+        for i in range(horizon):
+            step_df = pd.DataFrame({
+                "category": mix.categories,
+                "variant": mix.variants,
+                **_future_calendar(last_date + pd.DateOffset(months=i + 1)),
+            }, index=pd.RangeIndex(len(mix.variants)))
+            step_df["demand"] = pred[:, i]
+            step_df["predicted"] = pred[:, i]
+            step_df[QUANTILE_COLUMNS] = result["quantiles"][:, i]
+            step_df["method"] = "hierarchical"
+            steps.append(step_df)
+    return pd.concat(steps, ignore_index=True)
+
+
+def fit_volume_model(mix: ModelMix, through: pd.Timestamp, thread_count: int = None):
+    """CatBoost model of the bus-model volume series, trained on months up to ``through``."""
+    volume_df = prepare_features(mix.volume_cube().to_frame())
+    return fit_model(volume_df[volume_df["year_month"] <= through], FEATURES, thread_count=thread_count)
+
+
+def method_counts(future_df: pd.DataFrame) -> dict:
+    """Number of series forecast by each method."""
+    methods = future_df.drop_duplicates(["category", "variant"])["method"]
+    return {method: int(n) for method, n in methods.value_counts().items()}
+
+
+def prepare_features(demand_df: pd.DataFrame) -> pd.DataFrame:
+    """Feature frame for training and scoring: rows with a lag_1, numeric gaps zero-filled."""
+    with span("add_features", rows=len(demand_df)):
+        demand_df = add_features(demand_df)
+        demand_df = demand_df.dropna(subset=["lag_1"])  # Drop rows without lag features
+        
+        # Fill NaN in numeric features
+        for col in NUM_FEATURES:
+            demand_df[col] = demand_df[col].fillna(0)
+    return demand_df
+
+
+def holdout_cutoff(demand_df: pd.DataFrame) -> pd.Timestamp:
+    """Last month used for training; the months after it are the evaluation holdout."""
+    return demand_df["year_month"].max() - pd.DateOffset(months=HOLDOUT_MONTHS)
+
+
+def evaluate(model, test: pd.DataFrame, features: list = FEATURES, statistical: pd.DataFrame = None):
+    """Score the holdout: MAE/MAPE/WMAPE of the median and P10–P90 coverage by category.
+
+    Series in ``statistical`` (a ``statistical_forecast`` or
+    ``hierarchical_forecast`` from the training months) are scored on its
+    forecast instead of the model's.
+    """
+    test = test.copy()
+    test["method"] = "catboost"
+    sparse = np.zeros(len(test), dtype=bool)
+    if statistical is not None and len(statistical):
+        matched = test[SERIES_KEYS].merge(
+            statistical[SERIES_KEYS + ["predicted", "method"] + QUANTILE_COLUMNS], on=SERIES_KEYS, how="left",
+        )
+        sparse = matched["method"].notna().to_numpy()
+        test.loc[sparse, QUANTILE_COLUMNS] = matched.loc[sparse, QUANTILE_COLUMNS].to_numpy()
+        test.loc[sparse, "predicted"] = matched.loc[sparse, "predicted"].to_numpy(dtype=float)
+        test.loc[sparse, "method"] = matched.loc[sparse, "method"].to_numpy()
+    if (~sparse).any():
+        quantiles = predict_quantiles(model, test.loc[~sparse, features])
+        test.loc[~sparse, QUANTILE_COLUMNS] = quantiles.to_numpy()
+        test.loc[~sparse, "predicted"] = quantiles[POINT_QUANTILE].to_numpy()
+    
+    metrics = {}
+    for cat in test["category"].unique():
+        mask = test["category"] == cat
+        actual = test.loc[mask, "demand"]
+        pred = test.loc[mask, "predicted"]
+        mae = float(np.mean(np.abs(actual - pred)))
+        mape = np.mean(np.abs((actual - pred) / actual.replace(0, np.nan)).dropna()) * 100
+        wmape = np.sum(np.abs(actual - pred)) / np.sum(actual) * 100 if actual.sum() > 0 else 0
+        inside = (actual >= test.loc[mask, "p10"]) & (actual <= test.loc[mask, "p90"])
+        metrics[cat] = {"MAE": round(mae, 1), "MAPE": round(mape, 1), "WMAPE": round(wmape, 1),
+                        "P10_P90_coverage": round(inside.mean() * 100, 1)}
+    
+    print("  Evaluation metrics (WMAPE by category):")
+    for cat, m in sorted(metrics.items(), key=lambda x: x[1]["WMAPE"]):
+        print(f"    {cat}: WMAPE={m['WMAPE']}%, MAE={m['MAE']}")
+    return test, metrics
+
+
+def calibration_factors(test: pd.DataFrame) -> dict:
+    """Conformal factor per method that widens the P10–P90 band to its nominal holdout coverage.
+
+    Quantile loss on a short history gives bands that are too narrow (~62%
+    holdout coverage rather than 80%), and safety stock takes its σ from
+    that band.
+
+    Each holdout row scores how far its band must be stretched around P50 to
+    contain the actual; the factor is the finite-sample conformal quantile
+    of those scores at ``BAND_COVERAGE``. Methods with fewer than
+    ``MIN_CALIBRATION_ROWS`` holdout rows keep a factor of 1. Raw coverage
+    outside ``COVERAGE_TOLERANCE`` of nominal is reported as a warning.
+    """
+    factors = {}
+    for method, rows in test.groupby("method"):
+        actual = rows["demand"].to_numpy(dtype=float)
+        p10, p50, p90 = (rows[c].to_numpy(dtype=float) for c in ("p10", POINT_QUANTILE, "p90"))
+        # A zero-width side that misses scores inf, so it pushes the factor to its cap
+        with np.errstate(divide="ignore", invalid="ignore"):
+            below = np.where(actual < p50, (p50 - actual) / (p50 - p10), 0.0)
+            above = np.where(actual > p50, (actual - p50) / (p90 - p50), 0.0)
+        scores = np.sort(np.maximum(below, above))
+        rank = int(np.ceil((len(scores) + 1) * BAND_COVERAGE))
+        if len(scores) < MIN_CALIBRATION_ROWS or rank > len(scores):
+            factors[method] = 1.0
+            continue
+        factors[method] = round(float(min(scores[rank - 1], MAX_CALIBRATION_FACTOR)), 4)
+        coverage = np.mean((actual >= p10) & (actual <= p90))
+        if abs(coverage - BAND_COVERAGE) > COVERAGE_TOLERANCE:
+            print(f"  ⚠️ {method}: P10–P90 covers {coverage:.0%} of holdout months against {BAND_COVERAGE:.0%} nominal; "
+                  f"scaling its quantiles ×{factors[method]:.2f} around the median")
+    return factors
+
+
+def calibrate_quantiles(forecast_df: pd.DataFrame, factors: dict) -> pd.DataFrame:
+    """Scale each quantile's distance from P50 by its method's factor; P50 and ``predicted`` are unchanged."""
+    if not factors:
+        return forecast_df
+    factor = forecast_df["method"].map(factors).fillna(1.0).to_numpy(dtype=float)[:, None]
+    bands = [c for c in QUANTILE_COLUMNS if c != POINT_QUANTILE]
+    median = forecast_df[[POINT_QUANTILE]].to_numpy(dtype=float)
+    # Scaling by a positive factor and flooring at zero keep the quantiles non-crossing
+    return forecast_df.assign(**dict(zip(bands, np.maximum(
+        median + factor * (forecast_df[bands].to_numpy(dtype=float) - median), 0).T)))
+
+
+def fit_model(train: pd.DataFrame, features: list = FEATURES, segment_by: str = None, workers: int = 1,
+              thread_count: int = None):
+    """Fit the global model, or one model per ``segment_by`` segment in ``workers`` processes.
+
+    ``thread_count`` caps CatBoost threads per model; by default a global fit
+    uses every core and segment workers split them evenly.
+    """
+    with span("model_fit", rows=len(train), segment_by=segment_by, workers=workers):
+        if segment_by:
+            return fit_segments(train, features, segment_by, MODEL_PARAMS, DATA_DIR, workers, thread_count)
+        from catboost import CatBoostRegressor
+        model = CatBoostRegressor(**MODEL_PARAMS, thread_count=thread_count or -1, cat_features=[0, 1])
+        model.fit(train[features], train["demand"])
+        return model
+
+
+def train_and_forecast(demand_df: pd.DataFrame, batched: bool = True, route_sparse: bool = True,
+                       segment_by: str = None, workers: int = 1, thread_count: int = None):
+    """Train CatBoost model and generate forecasts.
+
+    ``batched=False`` falls back to the original one-row-at-a-time forecast
+    loop, kept as a reference for benchmarks. With ``route_sparse`` the model
+    trains only on series that are smooth or erratic up to the holdout cutoff;
+    the rest are forecast by ``statistical_forecast``. ``segment_by``,
+    ``workers`` and ``thread_count`` are passed to ``fit_model``.
+    """
+    demand_df = prepare_features(demand_df)
+    features = FEATURES
+    
+    # Train/test split: last 6 months for test
+    cutoff = holdout_cutoff(demand_df)
+    history = (demand_df["year_month"] <= cutoff).to_numpy()
+    sparse = sparse_rows(demand_df, cutoff) if route_sparse else np.zeros(len(demand_df), dtype=bool)
+    train = demand_df[history & ~sparse]
+    test = demand_df[~history]
+    holdout = statistical_forecast(demand_df[history & sparse], HOLDOUT_MONTHS) if sparse.any() else None
+    
+    print(f"  Train: {len(train):,} rows | Test: {len(test):,} rows")
+    if sparse.any():
+        n_sparse = demand_df.loc[sparse, ["category", "variant"]].drop_duplicates().shape[0]
+        print(f"  {n_sparse:,} intermittent/lumpy series left to Croston/SBA/TSB")
+    
+    model = fit_model(train, features, segment_by, workers, thread_count)
+    if segment_by:
+        print(f"  {len(model.models)} {segment_by} models, {workers} workers × {thread_count or default_thread_count(workers)} threads")
+    
+    # Evaluate
+    with span("evaluate", rows=len(test)):
+        test, metrics = evaluate(model, test, features, holdout)
+    
+    # Generate future forecasts (next 6 months)
+    future_df = forecast_routed(model, demand_df, features, route_sparse=route_sparse, batched=batched)
     
     return model, test, future_df, metrics, demand_df
 
 
-def run():
-    """Main entry point."""
-    print("Loading order data...")
-    orders_df = pd.read_csv(DATA_DIR / "orders.csv")
+def train_hierarchical(mix: ModelMix, thread_count: int = None):
+    """Hierarchical counterpart of ``train_and_forecast``: the volume model is trained up to the holdout
+    cutoff, scored through the variant forecasts it implies, then used for the future months."""
+    demand_df = prepare_features(mix.leaf_cube().to_frame())
+    cutoff = holdout_cutoff(demand_df)
+    test = demand_df[demand_df["year_month"] > cutoff]
+    print(f"  {len(mix.models)} bus-model volume series → {len(mix.variants):,} variants | Test: {len(test):,} rows")
     
-    print("Building monthly demand...")
-    demand_df = build_monthly_demand(orders_df)
-    print(f"  → {len(demand_df):,} demand records")
+    model = fit_volume_model(mix, cutoff, thread_count)
+    holdout = hierarchical_forecast(model, mix.through(cutoff), HOLDOUT_MONTHS)
+    with span("evaluate", rows=len(test)):
+        test, metrics = evaluate(None, test, FEATURES, holdout)
     
-    print("Training CatBoost model...")
-    model, test_df, future_df, metrics, full_demand = train_and_forecast(demand_df)
+    future_df = hierarchical_forecast(model, mix)
+    return model, test, future_df, metrics, demand_df
+
+
+def save_model(model, demand_df: pd.DataFrame, metrics: dict, trained_through: pd.Timestamp, model_dir: Path = MODEL_DIR,
+               methods: dict = None, hierarchy: dict = None, calibration: dict = None):
+    """Save the model with its feature schema, category vocabularies, holdout metrics and series per method.
+
+    ``hierarchy`` marks a bus-model volume model (see ``train_hierarchical``);
+    ``calibration`` holds the holdout band factors (see ``calibration_factors``).
+    """
+    model_dir = Path(model_dir)
+    model_dir.mkdir(parents=True, exist_ok=True)
+    # Exactly one of forecaster.cbm and segments/ holds the current model
+    if isinstance(model, SegmentedModel):
+        segments = model.save(model_dir)
+        (model_dir / "forecaster.cbm").unlink(missing_ok=True)
+    else:
+        segments = None
+        model.save_model(str(model_dir / "forecaster.cbm"))
+        shutil.rmtree(model_dir / "segments", ignore_errors=True)
+    vocabularies = demand_df.groupby("category")["variant"].unique()
+    schema = {
+        "features": FEATURES,
+        "cat_features": CAT_FEATURES,
+        "params": MODEL_PARAMS,
+        "tree_count": model.tree_count_,
+        "trained_through": trained_through.strftime("%Y-%m"),
+        "vocabularies": {cat: sorted(variants) for cat, variants in vocabularies.items()},
+        "metrics": metrics,
+        "methods": methods or {},
+        "segments": segments,
+        "hierarchy": hierarchy,
+        "calibration": calibration or {},
+    }
+    with open(model_dir / "schema.json", "w") as f:
+        json.dump(schema, f, indent=2)
+
+
+def saved_schema(model_dir: Path = MODEL_DIR) -> dict:
+    """The schema written by ``save_model`` (no CatBoost import)."""
+    path = Path(model_dir) / "schema.json"
+    if not path.exists():
+        raise FileNotFoundError(f"No saved forecaster in {model_dir}; run in train mode first")
+    with open(path) as f:
+        return json.load(f)
+
+
+def load_model(model_dir: Path = MODEL_DIR):
+    """Load a model saved by ``save_model``; returns (model, schema)."""
+    model_dir = Path(model_dir)
+    schema = saved_schema(model_dir)
+    if schema.get("segments"):
+        return SegmentedModel.load(model_dir, schema["segments"]), schema
+    from catboost import CatBoostRegressor
+    model = CatBoostRegressor()
+    model.load_model(str(model_dir / "forecaster.cbm"))
+    return model, schema
+
+
+def _check_vocabulary(demand_df: pd.DataFrame, schema: dict):
+    """Warn about series the saved model never saw."""
+    known = {(cat, var) for cat, variants in schema["vocabularies"].items() for var in variants}
+    combos = demand_df[["category", "variant"]].drop_duplicates().itertuples(index=False, name=None)
+    unseen = [combo for combo in combos if combo not in known]
+    if unseen:
+        print(f"  ⚠️ {len(unseen)} series not in the saved model's vocabulary, e.g. {unseen[0]}")
+
+
+def forecast_from_saved(demand_df: pd.DataFrame, model_dir: Path = MODEL_DIR):
+    """Inference only: score the next months with the saved model, no training."""
+    model, schema = load_model(model_dir)
+    demand_df = prepare_features(demand_df)
+    _check_vocabulary(demand_df, schema)
+    print(f"  Loaded model trained through {schema['trained_through']} ({schema['tree_count']} trees)")
+    future_df = forecast_routed(model, demand_df, schema["features"])
+    return model, future_df, schema["metrics"], demand_df
+
+
+def retrain_and_forecast(demand_df: pd.DataFrame, model_dir: Path = MODEL_DIR, iterations: int = WARM_START_ITERATIONS,
+                         workers: int = 1, thread_count: int = None):
+    """Warm-start the saved model on months that arrived after it was trained, then forecast.
+
+    A segmented model warm-starts each segment with new rows, in ``workers`` processes.
+    """
+    base_model, schema = load_model(model_dir)
+    demand_df = prepare_features(demand_df)
+    _check_vocabulary(demand_df, schema)
+    features = schema["features"]
     
-    # Export for dashboard
-    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    trained_through = pd.Timestamp(schema["trained_through"])
+    new = demand_df[(demand_df["year_month"] > trained_through).to_numpy() & ~sparse_rows(demand_df)]
+    if new.empty:
+        print(f"  No new months of CatBoost-routed series after {schema['trained_through']}; keeping the saved model")
+        model = base_model
+    else:
+        print(f"  Warm start: {len(new):,} new rows, {iterations} extra iterations on {base_model.tree_count_} trees")
+        params = {**schema["params"], "iterations": iterations}
+        if isinstance(base_model, SegmentedModel):
+            with span("model_fit", rows=len(new), segment_by=base_model.by, workers=workers):
+                model = fit_segments(new, features, base_model.by, params, DATA_DIR, workers, thread_count, base=base_model)
+        else:
+            from catboost import CatBoostRegressor
+            model = CatBoostRegressor(**params, thread_count=thread_count or -1, cat_features=[0, 1])
+            with span("model_fit", rows=len(new)):
+                model.fit(new[features], new["demand"], init_model=base_model)
     
+    future_df = forecast_routed(model, demand_df, features)
+    if not new.empty:
+        save_model(model, demand_df, schema["metrics"], new["year_month"].max(), model_dir, method_counts(future_df),
+                   calibration=schema.get("calibration"))
+    return model, future_df, schema["metrics"], demand_df
+
+
+def load_forecasts(model_dir: Path = MODEL_DIR) -> pd.DataFrame:
+    """The forecast saved by the last ``run``, with unrounded quantiles (no CatBoost import)."""
+    path = Path(model_dir) / "forecasts"
+    if not path.with_suffix(".feather").exists():
+        raise FileNotFoundError(f"No saved forecast in {model_dir}; run the forecast stage first")
+    return read_table(path)
+
+
+def dashboard_frames(full_demand: pd.DataFrame, future_df: pd.DataFrame):
+    """Historical demand and forecasts in the dashboard's export format."""
     # Historical demand
     hist_export = full_demand[["category", "variant", "year_month", "demand"]].copy()
     hist_export["year_month"] = hist_export["year_month"].dt.strftime("%Y-%m")
-    hist_export.to_json(OUTPUT_DIR / "historical_demand.json", orient="records")
     
-    # Forecasts with confidence intervals
+    # Forecasts with P10–P90 bands and the raw quantiles
     future_export = future_df[["category", "variant", "year_month", "predicted"]].copy()
     future_export["year_month"] = future_export["year_month"].dt.strftime("%Y-%m")
-    # Add simple confidence intervals
-    future_export["ci_lower"] = (future_export["predicted"] * 0.80).round(0)
-    future_export["ci_upper"] = (future_export["predicted"] * 1.25).round(0)
-    future_export.to_json(OUTPUT_DIR / "forecasts.json", orient="records")
+    future_export["ci_lower"] = future_df["p10"].round(0)
+    future_export["ci_upper"] = future_df["p90"].round(0)
+    future_export[QUANTILE_COLUMNS] = future_df[QUANTILE_COLUMNS].round(1)
+    if "method" in future_df:
+        future_export["method"] = future_df["method"]
+    return hist_export, future_export
+
+
+def run(mode: str = "train", model_dir: Path = MODEL_DIR, segment_by: str = None, workers: int = 1,
+        thread_count: int = None, hierarchical: bool = False):
+    """Main entry point.
+
+    ``mode`` is ``train`` (fit from scratch and save), ``forecast`` (reload the
+    saved model, inference only) or ``retrain`` (warm-start the saved model on
+    newly arrived months). In train mode ``segment_by`` fits one model per
+    category or supplier in ``workers`` processes of ``thread_count`` threads,
+    and ``hierarchical`` forecasts bus-model volumes × option take-rates; the
+    other modes follow whichever kind of model was saved. Every forecast is
+    widened by the calibration factors saved with the model before it is
+    written (``calibrate_quantiles``).
+    """
+    if mode not in FORECAST_MODES:
+        raise ValueError(f"mode must be one of {FORECAST_MODES}, got {mode!r}")
+    calibration = {}
+    if mode != "train":
+        schema = saved_schema(model_dir)
+        hierarchical = bool(schema.get("hierarchy"))
+        calibration = schema.get("calibration", {})  # fitted on the holdout when the model was trained
+    if hierarchical and segment_by:
+        raise ValueError("hierarchical mode forecasts bus-model volumes only; it cannot be combined with segment_by")
+    if hierarchical and mode == "retrain":
+        raise ValueError("the saved model is hierarchical; retrain it with mode='train' (it fits a handful of series)")
+    
+    print("Streaming orders into monthly demand...")
+    with span("build_monthly_demand") as s:
+        if hierarchical:
+            accumulator = stream_mix(DATA_DIR / "orders")
+            mix = accumulator.mix()
+            demand_df = mix.leaf_cube().to_frame()
+        else:
+            accumulator = stream_demand(DATA_DIR / "orders")
+            demand_df = accumulator.cube().to_frame()
+        s.rows = accumulator.rows
+    print(f"  → {len(demand_df):,} demand records")
     
-    # Metrics
-    with open(OUTPUT_DIR / "model_metrics.json", "w") as f:
-        json.dump(metrics, f, indent=2)
+    if hierarchical and mode == "train":
+        print("Training bus-model volume model...")
+        model, test_df, future_df, metrics, full_demand = train_hierarchical(mix, thread_count)
+        calibration = calibration_factors(test_df)
+        save_model(model, full_demand, metrics, holdout_cutoff(full_demand), model_dir, method_counts(future_df),
+                   hierarchy={"volume_series": list(mix.models), "take_rate_halflife": TAKE_RATE_HALFLIFE},
+                   calibration=calibration)
+    elif hierarchical:
+        print("Forecasting with saved bus-model volume model...")
+        model, schema = load_model(model_dir)
+        future_df = hierarchical_forecast(model, mix)
+        metrics, full_demand = schema["metrics"], prepare_features(demand_df)
+    elif mode == "train":
+        print("Training CatBoost model...")
+        model, test_df, future_df, metrics, full_demand = train_and_forecast(
+            demand_df, segment_by=segment_by, workers=workers, thread_count=thread_count,
+        )
+        calibration = calibration_factors(test_df)
+        save_model(model, full_demand, metrics, holdout_cutoff(full_demand), model_dir, method_counts(future_df),
+                   calibration=calibration)
+    elif mode == "forecast":
+        print("Forecasting with saved CatBoost model...")
+        model, future_df, metrics, full_demand = forecast_from_saved(demand_df, model_dir)
+    else:
+        print("Warm-start retraining CatBoost model...")
+        model, future_df, metrics, full_demand = retrain_and_forecast(
+            demand_df, model_dir, workers=workers, thread_count=thread_count,
+        )
+    print("  Series per method: " + ", ".join(f"{m}={n:,}" for m, n in method_counts(future_df).items()))
+    future_df = calibrate_quantiles(future_df, calibration)
+    with span("write_outputs", rows=len(full_demand) + len(future_df)):
+        # Unrounded forecast for stages run on their own (``run_pipeline.py safety-stock``)
+        write_table(future_df[FORECAST_COLUMNS], Path(model_dir) / "forecasts", csv=False)
+        
+        # Export for dashboard (history ships only in the per-category payloads of pipeline/export.py)
+        OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+        _, future_export = dashboard_frames(full_demand, future_df)
+        future_export.to_json(OUTPUT_DIR / "forecasts.json", orient="records")
+        
+        # Metrics
+        with open(OUTPUT_DIR / "model_metrics.json", "w") as f:
+            json.dump(metrics, f, indent=2)
     
     print("✅ Forecasting complete!")
     return future_df, full_demand, metrics
 
 
 if __name__ == "__main__":
-    run()
+    import argparse
+    parser = argparse.ArgumentParser(description="Train or score the demand forecaster.")
+    parser.add_argument("--mode", choices=FORECAST_MODES, default="train")
+    parser.add_argument("--segment-by", choices=SEGMENT_BY, help="train one model per segment (train mode)")
+    parser.add_argument("--workers", type=int, default=1, help="processes for per-segment training")
+    parser.add_argument("--thread-count", type=int, help="CatBoost threads per model (default: cores / workers)")
+    parser.add_argument("--hierarchical", action="store_true", help="forecast bus-model volumes × option take-rates (train mode)")
+    args = parser.parse_args()
+    run(args.mode, segment_by=args.segment_by, workers=args.workers, thread_count=args.thread_count,
+        hierarchical=args.hierarchical)
@@ -0,0 +1,155 @@
+"""
+Bus-model volumes and option take-rates for hierarchical forecasting.
+
+Every order is one bus of one ``bus_model`` with (at most) one variant per
+category, so a variant's monthly demand is the sum over bus models of the
+model's volume times its take-rate for that variant. ``ModelMix`` holds the
+monthly volume per bus model and the per-model variant counts; take-rates are
+exponentially weighted ratios of the two, and ``leaf_forecast`` multiplies
+forecast volumes by them in one ``einsum``. Within a category the variant
+forecasts therefore add up to the bus volume, and ``round_coherent`` keeps
+that true for the integer forecasts. The only series to forecast are the bus
+models, however many option variants there are.
+
+Leaf quantiles treat each model's volume as normal with the spread of its
+forecast quantiles and each bus's option choice as an independent draw at
+the take-rate (binomial thinning).
+"""
+from dataclasses import dataclass
+from pathlib import Path
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from data.storage import BATCH_ROWS, iter_table, table_columns
+from models.demand_cube import NON_COMPONENT_COLUMNS, DemandAccumulator, DemandCube
+
+VOLUME_CATEGORY = "Bus Model"  # category label of the volume series
+TAKE_RATE_HALFLIFE = 6  # months
+STANDARD_NORMAL = NormalDist()
+
+
+@dataclass
+class ModelMix:
+    """Monthly bus volume per model and variant counts per (model, series), on one month axis."""
+    models: np.ndarray
+    categories: np.ndarray
+    variants: np.ndarray
+    months: pd.DatetimeIndex
+    counts: np.ndarray  # (models × series × months)
+    volume: np.ndarray  # (models × months)
+
+    def leaf_cube(self) -> DemandCube:
+        """Variant demand summed over bus models."""
+        return DemandCube(self.categories, self.variants, self.months, self.counts.sum(axis=0))
+
+    def volume_cube(self) -> DemandCube:
+        """Bus volume per model, as series of the ``VOLUME_CATEGORY`` category."""
+        categories = np.full(len(self.models), VOLUME_CATEGORY, dtype=object)
+        return DemandCube(categories, self.models, self.months, self.volume)
+
+    def through(self, month: pd.Timestamp) -> "ModelMix":
+        """The mix restricted to months up to ``month``."""
+        keep = int((self.months <= month).sum())
+        return ModelMix(self.models, self.categories, self.variants, self.months[:keep],
+                        self.counts[..., :keep], self.volume[:, :keep])
+
+
+class MixAccumulator:
+    """Bus volume and per-model variant counts, folded in one chunk of orders at a time.
+
+    One ``DemandAccumulator`` per bus model plus one over the model column
+    itself for the volumes. Orders without a bus model are not counted.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self._volume = DemandAccumulator()
+        self._by_model = {}
+
+    def add(self, orders_df: pd.DataFrame):
+        if orders_df.empty:
+            return
+        self._volume.add(pd.DataFrame({"order_date": orders_df["order_date"], VOLUME_CATEGORY: orders_df["bus_model"]}))
+        for model, chunk in orders_df.groupby("bus_model", observed=True, sort=False):
+            self._by_model.setdefault(str(model), DemandAccumulator()).add(chunk.drop(columns="bus_model"))
+        self.rows += len(orders_df)
+
+    def mix(self) -> ModelMix:
+        volume = self._volume.cube()
+        models = np.asarray(volume.variants, dtype=object)
+        cubes = [self._by_model[m].cube() for m in models]
+        series = sorted({key for cube in cubes for key in zip(cube.categories, cube.variants)})
+        row_of = {key: i for i, key in enumerate(series)}
+        counts = np.zeros((len(models), len(series), len(volume.months)), dtype=np.int64)
+        for m, cube in enumerate(cubes):
+            rows = [row_of[key] for key in zip(cube.categories, cube.variants)]
+            start = volume.months.get_loc(cube.months[0])
+            counts[m, rows, start:start + len(cube.months)] = cube.demand
+        return ModelMix(
+            models=models,
+            categories=np.array([c for c, _ in series], dtype=object),
+            variants=np.array([v for _, v in series], dtype=object),
+            months=volume.months,
+            counts=counts,
+            volume=volume.demand,
+        )
+
+
+def stream_mix(orders_path: Path, batch_rows: int = BATCH_ROWS) -> MixAccumulator:
+    """Fold a stored orders table into a ``MixAccumulator`` one batch at a time."""
+    columns = ["order_date", "bus_model"] + [c for c in table_columns(orders_path) if c not in NON_COMPONENT_COLUMNS]
+    accumulator = MixAccumulator()
+    for chunk in iter_table(orders_path, columns=columns, batch_rows=batch_rows, schema="orders"):
+        accumulator.add(chunk)
+    return accumulator
+
+
+def take_rates(mix: ModelMix, halflife: float = TAKE_RATE_HALFLIFE) -> np.ndarray:
+    """(models × series) share of each model's buses taking each variant, recent months weighted up."""
+    n_months = len(mix.months)
+    weights = 0.5 ** ((n_months - 1 - np.arange(n_months)) / halflife)
+    taken = mix.counts @ weights
+    built = mix.volume @ weights
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(built[:, None] > 0, taken / built[:, None], 0.0)
+
+
+def spread_std(p10: np.ndarray, p90: np.ndarray) -> np.ndarray:
+    """Normal-equivalent std of a forecast from its P10–P90 spread."""
+    return np.maximum(p90 - p10, 0) / (2 * STANDARD_NORMAL.inv_cdf(0.90))
+
+
+def leaf_forecast(volume_mean: np.ndarray, volume_std: np.ndarray, rates: np.ndarray, quantiles) -> dict:
+    """Mean and quantiles of every variant's demand from (models × horizon) volume forecasts.
+
+    Returns ``mean`` of shape (series × horizon) and ``quantiles`` of shape
+    (series × horizon × len(quantiles)).
+    """
+    mean = np.einsum("mh,ms->sh", volume_mean, rates)
+    var = np.einsum("mh,ms->sh", volume_std**2, rates**2) + np.einsum("mh,ms->sh", volume_mean, rates * (1 - rates))
+    z = np.array([STANDARD_NORMAL.inv_cdf(q) for q in quantiles])
+    values = np.maximum(mean[..., None] + z * np.sqrt(var)[..., None], 0.0)
+    return {"mean": mean, "quantiles": np.maximum.accumulate(values, axis=-1)}
+
+
+def round_coherent(values: np.ndarray, groups: np.ndarray) -> np.ndarray:
+    """Round (series × columns) ``values`` to integers whose per-group column sums equal the rounded group totals.
+
+    Largest-remainder rounding: each series gets its floor, and the units the
+    floors leave short go to the largest fractional parts in the group.
+    ``groups`` are integer group codes per series.
+    """
+    floor = np.floor(values)
+    remainder = values - floor
+    n_groups = int(groups.max()) + 1 if len(groups) else 0
+    result = floor.astype(np.int64)
+    for h in range(values.shape[1]):
+        totals = np.bincount(groups, weights=values[:, h], minlength=n_groups)
+        short = np.rint(totals).astype(np.int64) - np.bincount(groups, weights=floor[:, h], minlength=n_groups).astype(np.int64)
+        order = np.lexsort((-remainder[:, h], groups))
+        start = np.searchsorted(groups[order], np.arange(n_groups))
+        rank = np.arange(len(order)) - start[groups[order]]
+        result[order, h] += rank < short[groups[order]]
+    return result
@@ -0,0 +1,157 @@
+"""
+Demand classification and intermittent-demand estimators for sparse series.
+
+Series are classified by their average inter-demand interval (ADI) and the
+squared coefficient of variation of their non-zero demand sizes (CV²), with
+the Syntetos–Boylan cut-offs: smooth, erratic, intermittent or lumpy.
+Intermittent and lumpy series skip CatBoost and are forecast with Croston,
+SBA (Syntetos–Boylan approximation) or TSB (Teunter–Syntetos–Babai). All
+three run over the same (series × month) matrix at once, looping over months
+and vectorized over series; each series keeps the method with the lowest
+in-sample one-step MAE.
+
+Quantiles come from treating a month's demand as zero with probability
+1 - rate / size, otherwise a draw from the series' non-zero sizes rescaled to
+the smoothed size.
+"""
+import numpy as np
+
+ADI_CUTOFF = 1.32
+CV2_CUTOFF = 0.49
+DEMAND_CLASSES = ("smooth", "erratic", "intermittent", "lumpy")
+SPARSE_CLASSES = ("intermittent", "lumpy")
+METHODS = ("croston", "sba", "tsb")
+ALPHA = 0.1  # smoothing of demand sizes and intervals
+BETA = 0.1  # smoothing of the TSB demand probability
+
+
+def classify(matrix: np.ndarray) -> dict:
+    """ADI, CV² and demand class of every row of a (series × month) matrix.
+
+    NaN cells (months before a series' history) are ignored. A series with
+    no demand at all has an infinite ADI and is classed intermittent.
+    """
+    matrix = np.asarray(matrix, dtype=float)
+    observed = ~np.isnan(matrix)
+    nonzero = observed & (np.nan_to_num(matrix) > 0)
+    n_observed = observed.sum(axis=1)
+    n_nonzero = nonzero.sum(axis=1)
+
+    sizes = np.where(nonzero, matrix, 0.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        adi = np.where(n_nonzero > 0, n_observed / n_nonzero, np.inf)
+        mean = sizes.sum(axis=1) / n_nonzero
+        var = (np.where(nonzero, matrix - mean[:, None], 0.0) ** 2).sum(axis=1) / n_nonzero
+        cv2 = np.where(n_nonzero > 1, var / mean**2, 0.0)
+
+    sparse = adi >= ADI_CUTOFF
+    variable = cv2 >= CV2_CUTOFF
+    classes = np.select(
+        [~sparse & ~variable, ~sparse & variable, sparse & ~variable],
+        DEMAND_CLASSES[:3], default=DEMAND_CLASSES[3],
+    )
+    return {"demand_class": classes, "adi": adi, "cv2": cv2}
+
+
+def is_sparse(classes: np.ndarray) -> np.ndarray:
+    """Mask of the classes routed to the statistical estimators."""
+    return np.isin(classes, SPARSE_CLASSES)
+
+
+def fit(matrix: np.ndarray, alpha: float = ALPHA, beta: float = BETA) -> dict:
+    """Croston, SBA and TSB over every row of ``matrix``.
+
+    Returns each method's final demand rate and in-sample one-step MAE, plus
+    the smoothed size and the series' sorted non-zero sizes for quantiles.
+    Levels start from the whole-history averages, so series with few demands
+    are not dominated by their first one.
+    """
+    matrix = np.asarray(matrix, dtype=float)
+    n_series, n_months = matrix.shape
+    observed = ~np.isnan(matrix)
+    nonzero = observed & (np.nan_to_num(matrix) > 0)
+    n_observed = observed.sum(axis=1)
+    n_nonzero = nonzero.sum(axis=1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        size = np.where(nonzero, matrix, 0.0).sum(axis=1) / n_nonzero
+        interval = n_observed / n_nonzero
+        probability = np.where(n_observed > 0, n_nonzero / n_observed, np.nan)
+    since = np.ones(n_series)  # months since the last demand, counting the current one
+
+    abs_error = {m: np.zeros(n_series) for m in METHODS}
+    n_scored = np.zeros(n_series)
+    with np.errstate(invalid="ignore"):  # series without demand keep NaN levels
+        for t in range(n_months):
+            y = matrix[:, t]
+            seen = observed[:, t]
+            demand = nonzero[:, t]
+
+            rates = _rates(size, interval, probability, alpha)
+            scored = seen & ~np.isnan(rates["croston"])
+            for m in METHODS:
+                abs_error[m] += np.where(scored, np.abs(rates[m] - np.nan_to_num(y)), 0.0)
+            n_scored += scored
+
+            size = np.where(demand, size + alpha * (np.nan_to_num(y) - size), size)
+            interval = np.where(demand, interval + alpha * (since - interval), interval)
+            probability = np.where(seen, probability + beta * (demand - probability), probability)
+            since = np.where(demand, 1.0, np.where(seen, since + 1.0, since))
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mae = {m: np.where(n_scored > 0, abs_error[m] / n_scored, np.inf) for m in METHODS}
+    return {
+        "rates": {m: np.nan_to_num(r) for m, r in _rates(size, interval, probability, alpha).items()},
+        "mae": mae,
+        "size": np.nan_to_num(size),
+        "sizes": np.sort(np.where(nonzero, matrix, np.nan), axis=1),  # NaN sorts last
+        "n_nonzero": n_nonzero,
+    }
+
+
+def _rates(size, interval, probability, alpha: float) -> dict:
+    with np.errstate(invalid="ignore", divide="ignore"):
+        croston = size / interval
+    return {"croston": croston, "sba": (1 - alpha / 2) * croston, "tsb": probability * size}
+
+
+def forecast(matrix: np.ndarray, quantiles, alpha: float = ALPHA, beta: float = BETA) -> dict:
+    """Per-series method, flat demand rate and ``quantiles`` of monthly demand.
+
+    The returned quantiles have shape (n_series, len(quantiles)) and are
+    non-decreasing along each row.
+    """
+    fitted = fit(matrix, alpha, beta)
+    errors = np.column_stack([fitted["mae"][m] for m in METHODS])
+    choice = np.argmin(errors, axis=1)
+    rates = np.column_stack([fitted["rates"][m] for m in METHODS])
+    rate = rates[np.arange(len(choice)), choice]
+    return {
+        "method": np.asarray(METHODS)[choice],
+        "rate": rate,
+        "quantiles": _quantiles(rate, fitted, np.asarray(quantiles, dtype=float)),
+    }
+
+
+def _quantiles(rate: np.ndarray, fitted: dict, levels: np.ndarray) -> np.ndarray:
+    """Quantiles of a zero-inflated draw from each series' rescaled non-zero sizes."""
+    size, sizes, n_nonzero = fitted["size"], fitted["sizes"], fitted["n_nonzero"]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        p_demand = np.clip(np.where(size > 0, rate / size, 0.0), 0.0, 1.0)
+        mean_size = np.nanmean(np.where(n_nonzero[:, None] > 0, sizes, 0.0), axis=1)
+        scale = np.where(mean_size > 0, size / mean_size, 0.0)
+
+    # Quantile of the size distribution at (q - P(zero)) / P(demand), linear between order statistics
+    within = np.clip((levels[None, :] - (1 - p_demand[:, None])) / np.where(p_demand > 0, p_demand, 1.0)[:, None], 0, 1)
+    last = np.maximum(n_nonzero - 1, 0)[:, None]
+    position = within * last
+    lower = np.floor(position).astype(np.int64)
+    upper = np.minimum(lower + 1, last)
+    filled = np.nan_to_num(sizes)
+    low_value = np.take_along_axis(filled, lower, axis=1)
+    high_value = np.take_along_axis(filled, upper, axis=1)
+    values = (low_value + (position - lower) * (high_value - low_value)) * scale[:, None]
+
+    zero = levels[None, :] <= (1 - p_demand[:, None])
+    values = np.where(zero | (n_nonzero[:, None] == 0), 0.0, values)
+    return np.maximum.accumulate(np.maximum(values, 0.0), axis=1)
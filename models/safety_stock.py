@@ -3,133 +3,236 @@ Safety stock calculator and reorder point recommender.
 """
 import pandas as pd
 import numpy as np
-from scipy import stats
 from pathlib import Path
-import json
+from statistics import NormalDist
+
+from data.storage import read_table
+from pipeline.metrics import span
 
 DATA_DIR = Path(__file__).parent.parent / "data" / "generated"
 OUTPUT_DIR = Path(__file__).parent.parent / "dashboard" / "public" / "data"
+STANDARD_NORMAL = NormalDist()
 
 
-def calculate_safety_stock(
-    avg_demand_monthly: float,
-    demand_std_monthly: float,
-    avg_lead_time_weeks: float,
-    lead_time_std_weeks: float,
-    service_level: float = 0.95,
-) -> dict:
-    """Calculate safety stock, reorder point, and EOQ."""
-    z = stats.norm.ppf(service_level)
-    
+def _round_to(values, ndigits: int) -> np.ndarray:
+    """Built-in ``round`` semantics, vectorised for ``ndigits >= 0``.
+
+    ``np.round`` scales by 10**ndigits first, which can turn a value just
+    below a decimal tie (0.15 is 0.1499…) into an exact .5 and round it the
+    other way. Away from a tie the scaled rint picks the same integer as
+    ``round`` and k / 10**ndigits is the same correctly rounded double, so
+    only near-ties fall back to ``round`` itself.
+    """
+    values = np.asarray(values, dtype=float)
+    flat = values.ravel()
+    scale = 10.0 ** ndigits
+    scaled = flat * scale
+    result = np.rint(scaled) / scale
+    with np.errstate(invalid="ignore"):  # inf - inf for infinite values, which rint already kept
+        near_tie = np.abs(np.abs(scaled - np.trunc(scaled)) - 0.5) < 1e-6
+    if near_tie.any():
+        result[near_tie] = [round(v, ndigits) for v in flat[near_tie].tolist()]
+    return result.reshape(values.shape)
+
+
+def z_score(service_level) -> np.ndarray:
+    """Standard normal quantile of each service level (``statistics`` rather than SciPy, for import time).
+
+    The quantile is computed once per distinct level and broadcast back.
+    """
+    levels, inverse = np.unique(np.asarray(service_level, dtype=float), return_inverse=True)
+    z = np.array([STANDARD_NORMAL.inv_cdf(p) for p in levels.tolist()])
+    return z[inverse].reshape(np.shape(service_level))
+
+
+def lead_time_demand_std(avg_demand_monthly, demand_std_monthly, avg_lead_time_weeks, lead_time_std_weeks) -> np.ndarray:
+    """Std of demand over the replenishment lead time, in units (safety stock per unit of z)."""
     # Convert monthly demand to weekly
-    avg_demand_weekly = avg_demand_monthly / 4.33
-    demand_std_weekly = demand_std_monthly / np.sqrt(4.33)
-    
-    # Safety stock formula
-    ss = z * np.sqrt(
+    avg_demand_weekly = np.asarray(avg_demand_monthly, dtype=float) / 4.33
+    demand_std_weekly = np.asarray(demand_std_monthly, dtype=float) / np.sqrt(4.33)
+    avg_lead_time_weeks = np.asarray(avg_lead_time_weeks, dtype=float)
+    lead_time_std_weeks = np.asarray(lead_time_std_weeks, dtype=float)
+    return np.sqrt(
         avg_lead_time_weeks * demand_std_weekly**2 +
         avg_demand_weekly**2 * lead_time_std_weeks**2
     )
+
+
+def calculate_safety_stock(
+    avg_demand_monthly,
+    demand_std_monthly,
+    avg_lead_time_weeks,
+    lead_time_std_weeks,
+    service_level=0.95,
+) -> dict:
+    """Calculate safety stock, reorder point, and EOQ.
+
+    Accepts scalars or equal-length NumPy arrays / Series; array inputs return
+    arrays under the same keys.
+    """
+    z = z_score(service_level)
+    avg_demand_weekly = np.asarray(avg_demand_monthly, dtype=float) / 4.33
+    avg_lead_time_weeks = np.asarray(avg_lead_time_weeks, dtype=float)
+    
+    # Safety stock formula
+    ss = z * lead_time_demand_std(avg_demand_monthly, demand_std_monthly, avg_lead_time_weeks, lead_time_std_weeks)
     
     # Reorder point
     rop = avg_demand_weekly * avg_lead_time_weeks + ss
     
-    # EOQ (Economic Order Quantity) — assume ordering cost = $50, holding cost = 20% of unit cost/year
+    if np.ndim(ss) == 0:
+        return {
+            "safety_stock": round(float(ss)),
+            "reorder_point": round(float(rop)),
+            "z_score": round(float(z), 2),
+            "weekly_demand": round(float(avg_demand_weekly), 1),
+        }
     return {
-        "safety_stock": round(ss),
-        "reorder_point": round(rop),
-        "z_score": round(z, 2),
-        "weekly_demand": round(avg_demand_weekly, 1),
+        "safety_stock": np.rint(ss).astype(np.int64),
+        "reorder_point": np.rint(rop).astype(np.int64),
+        "z_score": _round_to(np.broadcast_to(z, ss.shape), 2),
+        "weekly_demand": _round_to(np.broadcast_to(avg_demand_weekly, ss.shape), 1),
     }
 
 
-def run(forecast_df: pd.DataFrame = None, service_level: float = 0.95):
-    """Calculate safety stock for all components."""
-    print("Loading inventory data...")
-    inventory_df = pd.read_csv(DATA_DIR / "inventory_levels.csv")
+def economic_order_quantity(avg_demand_monthly, unit_cost) -> np.ndarray:
+    """EOQ — ordering cost = $50, holding cost = 20% of unit cost/year.
+
+    Zero-cost components order one month of demand.
+    """
+    unit_cost = np.asarray(unit_cost, dtype=float)
+    avg_demand_monthly = np.asarray(avg_demand_monthly, dtype=float)
+    ordering_cost = 50
+    annual_demand = avg_demand_monthly * 12
+    with np.errstate(divide="ignore", invalid="ignore"):
+        eoq_costed = np.maximum(np.rint(np.sqrt(2 * annual_demand * ordering_cost / (unit_cost * 0.20))), 1)
+    return np.where(unit_cost > 0, eoq_costed, np.rint(avg_demand_monthly)).astype(np.int64)
+
+
+def stock_status(current, safety_stock, reorder_point):
+    """Status ("critical"/"warning"/"ok") and stockout risk score for each component."""
+    current = np.asarray(current)
+    rop_floor = np.maximum(reorder_point, 1)
+    critical = current <= safety_stock * 0.5
+    warning = ~critical & (current <= reorder_point)
+    status = np.select([critical, warning], ["critical", "warning"], "ok")
+    risk = np.select(
+        [critical, warning],
+        [np.minimum(0.95, 1 - (current / rop_floor)), np.minimum(0.7, 1 - (current / rop_floor))],
+        np.maximum(0.0, 0.1 - (current - reorder_point) / rop_floor * 0.1),
+    )
+    return status, risk
+
+
+def stock_position(current, safety_stock, reorder_point, eoq, weekly_demand) -> dict:
+    """Everything that moves with ``current_stock``: status, risk, weeks of cover and order quantity."""
+    current = np.asarray(current)
+    status, risk = stock_status(current, safety_stock, reorder_point)
+    return {
+        "weeks_of_cover": _round_to(current / np.maximum(weekly_demand, 0.1), 1),
+        "status": status,
+        "stockout_risk": _round_to(risk, 3),
+        "recommended_order_qty": np.where(current < reorder_point, np.maximum(0, reorder_point - current + eoq), 0),
+    }
+
+
+def forecast_std_from_quantiles(forecast_df: pd.DataFrame) -> pd.DataFrame:
+    """Per-series monthly forecast mean and demand std.
+
+    With P10/P90 columns the std is the normal-equivalent spread
+    (P90 − P10) / (2·z₀.₉), root-mean-squared over the horizon; otherwise it
+    falls back to the spread of the point forecasts.
+    """
+    if {"p10", "p90"}.issubset(forecast_df.columns):
+        z90 = STANDARD_NORMAL.inv_cdf(0.90)
+        sigma_sq = ((forecast_df["p90"] - forecast_df["p10"]) / (2 * z90)) ** 2
+        frame = forecast_df[["category", "variant", "predicted"]].assign(sigma_sq=sigma_sq)
+        forecast_agg = frame.groupby(["category", "variant"]).agg(
+            forecast_monthly_mean=("predicted", "mean"), sigma_sq=("sigma_sq", "mean"),
+        ).reset_index()
+        forecast_agg["forecast_monthly_std"] = np.sqrt(forecast_agg.pop("sigma_sq"))
+        return forecast_agg
+    forecast_agg = forecast_df.groupby(["category", "variant"])["predicted"].agg(["mean", "std"]).reset_index()
+    forecast_agg.columns = ["category", "variant", "forecast_monthly_mean", "forecast_monthly_std"]
+    return forecast_agg
+
+
+def demand_inputs(inventory_df: pd.DataFrame, forecast_df: pd.DataFrame = None):
+    """Monthly demand mean and std per inventory row, from the forecast where it has the series."""
+    avg_demand = inventory_df["monthly_demand_avg"].to_numpy(dtype=float)
     
-    # If we have forecasts, use them to adjust demand expectations
+    # Use forecast if available
+    forecast_mean = avg_demand
+    forecast_std = avg_demand * 0.3  # default
     if forecast_df is not None:
-        forecast_agg = forecast_df.groupby(["category", "variant"])["predicted"].agg(["mean", "std"]).reset_index()
-        forecast_agg.columns = ["category", "variant", "forecast_monthly_mean", "forecast_monthly_std"]
+        forecast_agg = forecast_std_from_quantiles(forecast_df)
+        matched = inventory_df[["category", "variant"]].merge(forecast_agg, on=["category", "variant"], how="left")
+        # Missing keys never match, as with the original row-wise equality test
+        has_forecast = (
+            matched["forecast_monthly_mean"].notna() & inventory_df["variant"].notna() & inventory_df["category"].notna()
+        ).to_numpy()
+        agg_std = matched["forecast_monthly_std"].to_numpy(dtype=float)
+        forecast_mean = np.where(has_forecast, matched["forecast_monthly_mean"].to_numpy(dtype=float), forecast_mean)
+        forecast_std = np.where(has_forecast, np.where(1 > agg_std, 1, agg_std), forecast_std)
+    return forecast_mean, forecast_std
+
+
+def safety_stock_table(inventory_df: pd.DataFrame, forecast_df: pd.DataFrame = None, service_level=0.95) -> pd.DataFrame:
+    """Safety stock, reorder point, EOQ and status for every inventory row.
+
+    ``service_level`` is one level for all rows or one per row (see ``service_levels``).
+    """
+    forecast_mean, forecast_std = demand_inputs(inventory_df, forecast_df)
+    
+    result = calculate_safety_stock(
+        avg_demand_monthly=forecast_mean,
+        demand_std_monthly=forecast_std,
+        avg_lead_time_weeks=inventory_df["lead_time_weeks"],
+        lead_time_std_weeks=inventory_df["lead_time_std_weeks"],
+        service_level=service_level,
+    )
     
-    records = []
-    for _, row in inventory_df.iterrows():
-        avg_demand = row["monthly_demand_avg"]
-        
-        # Use forecast if available
-        forecast_mean = avg_demand
-        forecast_std = avg_demand * 0.3  # default
-        if forecast_df is not None:
-            match = forecast_agg[
-                (forecast_agg["category"] == row["category"]) &
-                (forecast_agg["variant"] == row["variant"])
-            ]
-            if len(match) > 0:
-                forecast_mean = match.iloc[0]["forecast_monthly_mean"]
-                forecast_std = max(match.iloc[0]["forecast_monthly_std"], 1)
-        
-        result = calculate_safety_stock(
-            avg_demand_monthly=forecast_mean,
-            demand_std_monthly=forecast_std,
-            avg_lead_time_weeks=row["lead_time_weeks"],
-            lead_time_std_weeks=row["lead_time_std_weeks"],
-            service_level=service_level,
-        )
-        
-        # EOQ
-        if row["unit_cost"] > 0:
-            ordering_cost = 50
-            holding_cost = row["unit_cost"] * 0.20 / 52  # weekly
-            annual_demand = forecast_mean * 12
-            eoq = np.sqrt(2 * annual_demand * ordering_cost / (row["unit_cost"] * 0.20))
-            eoq = max(round(eoq), 1)
-        else:
-            eoq = round(forecast_mean)
-        
-        # Status
-        current = row["current_stock"]
-        rop = result["reorder_point"]
-        ss = result["safety_stock"]
-        
-        if current <= ss * 0.5:
-            status = "critical"
-            risk = min(0.95, 1 - (current / max(rop, 1)))
-        elif current <= rop:
-            status = "warning"
-            risk = min(0.7, 1 - (current / max(rop, 1)))
-        else:
-            status = "ok"
-            risk = max(0.0, 0.1 - (current - rop) / max(rop, 1) * 0.1)
-        
-        weeks_of_cover = current / max(result["weekly_demand"], 0.1)
-        
-        records.append({
-            "component_id": row["component_id"],
-            "category": row["category"],
-            "variant": row["variant"],
-            "current_stock": current,
-            "safety_stock": ss,
-            "reorder_point": rop,
-            "eoq": eoq,
-            "weekly_demand": result["weekly_demand"],
-            "lead_time_weeks": row["lead_time_weeks"],
-            "lead_time_std_weeks": row["lead_time_std_weeks"],
-            "weeks_of_cover": round(weeks_of_cover, 1),
-            "unit_cost": row["unit_cost"],
-            "supplier_id": row["supplier_id"],
-            "supplier_name": row["supplier_name"],
-            "status": status,
-            "stockout_risk": round(risk, 3),
-            "service_level": service_level,
-            "recommended_order_qty": max(0, rop - current + eoq) if current < rop else 0,
-        })
+    eoq = economic_order_quantity(forecast_mean, inventory_df["unit_cost"].to_numpy(dtype=float))
     
-    result_df = pd.DataFrame(records)
+    # Status
+    current = inventory_df["current_stock"].to_numpy()
+    rop = result["reorder_point"]
+    ss = result["safety_stock"]
+    position = stock_position(current, ss, rop, eoq, result["weekly_demand"])
+    
+    return pd.DataFrame({
+        "component_id": inventory_df["component_id"],
+        "category": inventory_df["category"],
+        "variant": inventory_df["variant"],
+        "current_stock": current,
+        "safety_stock": ss,
+        "reorder_point": rop,
+        "eoq": eoq,
+        "weekly_demand": result["weekly_demand"],
+        "lead_time_weeks": inventory_df["lead_time_weeks"],
+        "lead_time_std_weeks": inventory_df["lead_time_std_weeks"],
+        "weeks_of_cover": position["weeks_of_cover"],
+        "unit_cost": inventory_df["unit_cost"],
+        "supplier_id": inventory_df["supplier_id"],
+        "supplier_name": inventory_df["supplier_name"],
+        "status": position["status"],
+        "stockout_risk": position["stockout_risk"],
+        "service_level": service_level,
+        "recommended_order_qty": position["recommended_order_qty"],
+    })
+
+
+def run(forecast_df: pd.DataFrame = None, service_level=0.95):
+    """Calculate safety stock for all components."""
+    print("Loading inventory data...")
+    inventory_df = read_table(DATA_DIR / "inventory_levels")
+    with span("safety_stock_table", rows=len(inventory_df)):
+        result_df = safety_stock_table(inventory_df, forecast_df, service_level)
     
     # Export
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-    result_df.to_json(OUTPUT_DIR / "safety_stock.json", orient="records")
+    with span("write_json", rows=len(result_df)):
+        result_df.to_json(OUTPUT_DIR / "safety_stock.json", orient="records")
     
     critical = len(result_df[result_df["status"] == "critical"])
     warning = len(result_df[result_df["status"] == "warning"])
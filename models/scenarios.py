@@ -0,0 +1,177 @@
+"""
+What-if scenario cube for the dashboard simulator.
+
+Every combination of demand change × lead-time shift × service level is
+evaluated for every component with the same formulas as ``safety_stock.run``
+(safety stock, reorder point, EOQ, status), broadcasting over a
+(lead-time shift, service level, component) block per demand change. The
+result is exported as flat, column-oriented integer slices, so the dashboard
+only looks values up. Safety stock and cycle stock (reorder point − safety
+stock) are delta-encoded along the demand-change axis, which neighbouring
+scenarios make small and repetitive.
+
+The cube grows by ~11 KB of JSON per component, so it is partitioned like the
+demand series: ``scenarios/manifest.json`` carries the axes and the
+per-scenario portfolio totals, and each category's components go to a
+content-hashed ``scenarios/<slug>.<hash>.json`` the simulator fetches when
+that category is shown.
+"""
+import json
+
+import numpy as np
+import pandas as pd
+
+from data.storage import read_table
+from pipeline.export import write_partitions
+from pipeline.metrics import span
+from models.safety_stock import (
+    DATA_DIR, OUTPUT_DIR, calculate_safety_stock, demand_inputs, economic_order_quantity, stock_status,
+)
+
+# Grid matching the simulator's controls
+DEMAND_CHANGES = np.arange(-50, 101, 5)  # percent
+LEAD_TIME_SHIFTS = np.arange(-4, 9)  # weeks
+SERVICE_LEVELS = np.array([0.90, 0.95, 0.97, 0.99])
+MIN_LEAD_TIME_WEEKS = 0.5
+STATUSES = ["critical", "warning", "ok"]
+SCENARIO_DIR = "scenarios"
+
+
+def scenario_grid(
+    inventory_df: pd.DataFrame,
+    forecast_mean: np.ndarray,
+    forecast_std: np.ndarray,
+    demand_changes=DEMAND_CHANGES,
+    lead_time_shifts=LEAD_TIME_SHIFTS,
+    service_levels=SERVICE_LEVELS,
+) -> dict:
+    """Evaluate the full scenario grid for every component.
+
+    Demand changes scale the monthly mean and std together (constant CV);
+    lead-time shifts move the mean lead time, floored at half a week. Each
+    entry of ``service_levels`` is one level for every component or one per
+    component. Arrays are shaped (demand change, lead-time shift, service
+    level, component), except ``eoq`` which only depends on demand:
+    (demand change, component).
+    """
+    lead = np.maximum(
+        inventory_df["lead_time_weeks"].to_numpy(dtype=float) + np.asarray(lead_time_shifts)[:, None],
+        MIN_LEAD_TIME_WEEKS,
+    )[:, None, :]
+    lead_std = inventory_df["lead_time_std_weeks"].to_numpy(dtype=float)
+    levels = np.asarray(service_levels, dtype=float).reshape(len(service_levels), -1)[None]
+    unit_cost = inventory_df["unit_cost"].to_numpy(dtype=float)
+    current = inventory_df["current_stock"].to_numpy()
+
+    shape = (len(demand_changes), len(lead_time_shifts), len(service_levels), len(inventory_df))
+    grid = {name: np.empty(shape, dtype=np.int64) for name in ("safety_stock", "reorder_point", "order_qty")}
+    grid["status"] = np.empty(shape, dtype=object)
+    grid["eoq"] = np.empty((len(demand_changes), len(inventory_df)), dtype=np.int64)
+
+    # One broadcast block per demand change keeps memory at shifts × levels × components
+    for d, change in enumerate(demand_changes):
+        multiplier = 1 + change / 100
+        result = calculate_safety_stock(
+            avg_demand_monthly=forecast_mean * multiplier,
+            demand_std_monthly=forecast_std * multiplier,
+            avg_lead_time_weeks=lead,
+            lead_time_std_weeks=lead_std,
+            service_level=levels,
+        )
+        eoq = economic_order_quantity(forecast_mean * multiplier, unit_cost)
+        ss, rop = result["safety_stock"], result["reorder_point"]
+        grid["safety_stock"][d] = ss
+        grid["reorder_point"][d] = rop
+        grid["order_qty"][d] = np.where(current < rop, np.maximum(0, rop - current + eoq), 0)
+        grid["status"][d] = stock_status(current, ss, rop)[0]
+        grid["eoq"][d] = eoq
+    return grid
+
+
+def scenario_totals(grid: dict, unit_cost: np.ndarray) -> dict:
+    """Status counts and total order cost for each scenario (component axis summed out)."""
+    totals = {status: (grid["status"] == status).sum(axis=-1) for status in STATUSES}
+    totals["order_cost"] = np.rint((grid["order_qty"] * unit_cost).sum(axis=-1)).astype(np.int64)
+    return totals
+
+
+def _delta(values: np.ndarray) -> list:
+    """Flattened differences along the first (demand-change) axis."""
+    return np.diff(values, axis=0, prepend=0).ravel().tolist()
+
+
+def category_slice(grid: dict, columns: np.ndarray, component_ids: list) -> dict:
+    """One category's components from the grid, flattened in C order over the cube layout."""
+    return {
+        "component_id": component_ids,
+        "safety_stock": _delta(grid["safety_stock"][..., columns]),
+        "cycle_stock": _delta(grid["reorder_point"][..., columns] - grid["safety_stock"][..., columns]),
+        "status": [STATUSES.index(s) for s in grid["status"][..., columns].ravel()],
+        "eoq": grid["eoq"][:, columns].ravel().tolist(),
+    }
+
+
+def baseline_levels(service_level, n_components: int):
+    """Service-level axis plus the index of the level ``safety_stock.run`` used.
+
+    A single level joins the fixed grid. Per-component levels (from
+    ``service_levels``) become an extra ``"planned"`` entry, so the baseline
+    scenario reproduces safety_stock.json.
+    """
+    if np.ndim(service_level) == 0:
+        service_levels = np.union1d(SERVICE_LEVELS, [service_level])
+        axis = [round(float(s), 4) for s in service_levels]
+        return service_levels, axis, int(np.searchsorted(service_levels, service_level))
+    planned = np.broadcast_to(np.asarray(service_level, dtype=float), (n_components,))
+    service_levels = [np.full(n_components, s) for s in SERVICE_LEVELS] + [planned]
+    return service_levels, [round(float(s), 4) for s in SERVICE_LEVELS] + ["planned"], len(SERVICE_LEVELS)
+
+
+def run(forecast_df: pd.DataFrame = None, service_level=0.95) -> dict:
+    """Compute the scenario cube and export it as per-category slices under scenarios/.
+
+    ``service_level`` is the level safety stock was planned at: one for all
+    components or one per component row.
+    """
+    inventory_df = read_table(DATA_DIR / "inventory_levels")
+    forecast_mean, forecast_std = demand_inputs(inventory_df, forecast_df)
+    service_levels, level_axis, baseline = baseline_levels(service_level, len(inventory_df))
+    with span("scenario_grid") as s:
+        grid = scenario_grid(inventory_df, forecast_mean, forecast_std, service_levels=service_levels)
+        totals = scenario_totals(grid, inventory_df["unit_cost"].to_numpy(dtype=float))
+        s.rows = grid["status"].size
+
+    with span("write_json"):
+        component_ids = inventory_df["component_id"].to_numpy()
+        slices = {
+            category: category_slice(grid, columns, component_ids[columns].tolist())
+            for category, columns in sorted(inventory_df.groupby("category").indices.items())
+        }
+        entries = write_partitions(OUTPUT_DIR / SCENARIO_DIR, slices)
+        # Axes and portfolio totals up front; a category's component values only when it is shown
+        manifest = {
+            "version": 1,
+            "layout": ["demand_change", "lead_time_shift", "service_level", "component"],
+            "axes": {
+                "demand_change": DEMAND_CHANGES.tolist(),
+                "lead_time_shift": LEAD_TIME_SHIFTS.tolist(),
+                "service_level": level_axis,
+            },
+            "baseline": {"service_level": baseline},
+            "statuses": STATUSES,
+            "encoding": "delta over demand_change",
+            "totals": {name: values.ravel().tolist() for name, values in totals.items()},
+            "categories": {category: {**entries[category], "components": len(slices[category]["component_id"])}
+                           for category in slices},
+        }
+        (OUTPUT_DIR / SCENARIO_DIR / "manifest.json").write_text(json.dumps(manifest, separators=(",", ":")))
+
+    n_scenarios = grid["status"][..., 0].size
+    largest = max(entry["bytes"] for entry in entries.values())
+    print(f"  → {n_scenarios:,} scenarios × {len(inventory_df)} components in {len(entries)} category slices, "
+          f"largest {largest / 1024:.0f} KB")
+    return manifest
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,144 @@
+"""
+Per-segment forecasters trained in a process pool.
+
+One global CatBoost model fits on a handful of threads however many cores the
+box has. ``fit_segments`` instead splits the training rows by category or by
+supplier (a supplier segment is the union of the categories it supplies) and
+fits one model per segment in ``workers`` processes, each limited to
+``thread_count`` CatBoost threads, largest segment first. ``SegmentedModel``
+routes every row to its segment's model by category and otherwise behaves
+like a fitted ``CatBoostRegressor`` (``predict``, ``tree_count_``), so
+evaluation and the recursive forecast are unchanged. Categories without a
+model of their own (new, or with no CatBoost-routed rows) use the largest
+segment's model.
+"""
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data.storage import read_table
+
+SEGMENT_BY = ("category", "supplier")
+UNASSIGNED = "unassigned"
+
+
+def segment_map(categories, by: str, data_dir: Path) -> dict:
+    """Segment of each category: itself, or the supplier listing it in the suppliers table."""
+    if by not in SEGMENT_BY:
+        raise ValueError(f"segment_by must be one of {SEGMENT_BY}, got {by!r}")
+    categories = [str(c) for c in pd.unique(np.asarray(categories, dtype=object))]
+    if by == "category":
+        return {c: c for c in categories}
+    suppliers = read_table(Path(data_dir) / "suppliers").explode("categories")
+    supplier_of = dict(zip(suppliers["categories"], suppliers["supplier_id"]))
+    return {c: supplier_of.get(c, UNASSIGNED) for c in categories}
+
+
+def default_thread_count(workers: int) -> int:
+    """Split the machine's cores evenly between ``workers`` processes."""
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+def _fit(task: dict):
+    """Worker: fit one segment's model (optionally warm-started) and return it."""
+    from catboost import CatBoostRegressor
+
+    model = CatBoostRegressor(**task["params"], cat_features=[0, 1])
+    model.fit(task["X"], task["y"], init_model=task["init_model"])
+    return task["segment"], model
+
+
+class SegmentedModel:
+    """One CatBoost model per segment, dispatched by each row's category."""
+
+    def __init__(self, by: str, segment_of: dict, models: dict, rows: dict):
+        self.by = by
+        self.models = models
+        self.rows = rows  # training rows per segment
+        self.fallback = max(models, key=lambda s: rows.get(s, 0))
+        self.segment_of = {c: s for c, s in segment_of.items() if s in models}
+
+    @property
+    def tree_count_(self) -> int:
+        return sum(model.tree_count_ for model in self.models.values())
+
+    def segments(self, categories) -> np.ndarray:
+        """Segment whose model scores each of ``categories``."""
+        unique, inverse = np.unique(np.asarray(categories).astype(str), return_inverse=True)
+        return np.array([self.segment_of.get(c, self.fallback) for c in unique], dtype=object)[inverse]
+
+    def predict(self, X: pd.DataFrame) -> np.ndarray:
+        labels = self.segments(X["category"])
+        pred = None
+        for segment in pd.unique(labels):
+            rows = np.flatnonzero(labels == segment)
+            values = np.asarray(self.models[segment].predict(X.iloc[rows]), dtype=float)
+            if pred is None:
+                pred = np.empty((len(X),) + values.shape[1:])
+            pred[rows] = values
+        return pred if pred is not None else np.empty((0,))
+
+    def save(self, model_dir: Path) -> dict:
+        """Write one ``segments/NN.cbm`` per segment; returns the schema entry that ``load`` reads."""
+        directory = Path(model_dir) / "segments"
+        if directory.exists():
+            shutil.rmtree(directory)
+        directory.mkdir(parents=True)
+        files = {}
+        for i, (segment, model) in enumerate(sorted(self.models.items())):
+            files[segment] = f"segments/{i:02d}.cbm"
+            model.save_model(str(Path(model_dir) / files[segment]))
+        return {"by": self.by, "segment_of": self.segment_of, "files": files, "rows": self.rows}
+
+    @classmethod
+    def load(cls, model_dir: Path, entry: dict) -> "SegmentedModel":
+        from catboost import CatBoostRegressor
+
+        models = {}
+        for segment, name in entry["files"].items():
+            models[segment] = CatBoostRegressor()
+            models[segment].load_model(str(Path(model_dir) / name))
+        return cls(entry["by"], entry["segment_of"], models, entry["rows"])
+
+
+def fit_segments(
+    train: pd.DataFrame,
+    features: list,
+    by: str,
+    params: dict,
+    data_dir: Path,
+    workers: int = 1,
+    thread_count: int = None,
+    base: SegmentedModel = None,
+) -> SegmentedModel:
+    """Fit a model per segment of ``train`` in ``workers`` processes of ``thread_count`` threads each.
+
+    With ``base`` every segment warm-starts from its saved model, and segments
+    without rows in ``train`` keep the base model unchanged.
+    """
+    thread_count = thread_count or default_thread_count(workers)
+    segment_of = {**(base.segment_of if base else {}), **segment_map(train["category"], by, data_dir)}
+    labels = train["category"].astype(str).map(segment_of)
+    tasks = [{
+        "segment": segment,
+        "X": rows[features],
+        "y": rows["demand"],
+        "params": {**params, "thread_count": thread_count},
+        "init_model": base.models.get(segment) if base else None,
+    } for segment, rows in train.groupby(labels, sort=True)]
+    tasks.sort(key=lambda t: len(t["y"]), reverse=True)  # longest first keeps the pool busy
+
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            fitted = dict(pool.map(_fit, tasks))
+    else:
+        fitted = dict(map(_fit, tasks))
+
+    rows = {t["segment"]: len(t["y"]) for t in tasks}
+    if base:
+        fitted, rows = {**base.models, **fitted}, {**base.rows, **rows}
+    return SegmentedModel(by, segment_of, fitted, rows)
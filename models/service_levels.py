@@ -0,0 +1,239 @@
+"""
+Per-component service levels that minimise safety-stock value for a portfolio fill rate.
+
+``safety_stock.run`` gives every component the same cycle service level, so a
+$10 floor mat carries as many standard deviations of cover as a $4,200
+wheelchair lift. Here each component gets its own level z_i to minimise the
+capital held in safety stock, Σ cᵢ·σᵢ·zᵢ, subject to an aggregate fill rate
+(units short per year over units demanded, ≥ a target) or a budget on that
+capital. σᵢ is the lead-time demand std. With order quantity Qᵢ (the EOQ) and
+annual demand Dᵢ there are Dᵢ/Qᵢ replenishment cycles a year. Each cycle is
+short by σᵢ·G(zᵢ) units, where G is the standard normal loss function.
+
+G is convex, so the problem is convex and separable. The Lagrangian
+Σ cᵢσᵢzᵢ + λ·Σ (Dᵢ/Qᵢ)σᵢG(zᵢ) has a closed-form minimiser per component:
+
+    service levelᵢ = Φ(zᵢ) = 1 − cᵢ·Qᵢ / (λ·Dᵢ)    (clipped to the allowed range)
+
+σ cancels. Expensive, slow-moving components with large orders get low
+levels, and cheap, fast movers get high ones. ``optimal_levels`` bisects on
+log λ until the target holds. Each step is one vectorised pass over all
+components. Sweeping λ traces the efficient frontier of fill rate against
+safety-stock value.
+"""
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy.special import ndtr, ndtri
+
+from data.storage import read_table
+from models.safety_stock import (
+    DATA_DIR, OUTPUT_DIR, demand_inputs, economic_order_quantity, lead_time_demand_std,
+)
+from pipeline.metrics import span
+
+MIN_SERVICE_LEVEL = 0.50  # no negative safety stock
+MAX_SERVICE_LEVEL = 0.999
+FLAT_SERVICE_LEVELS = (0.90, 0.95, 0.97, 0.99)  # uniform policies shown against the frontier
+FRONTIER_POINTS = 40
+BISECTION_STEPS = 100
+
+
+def policy_inputs(inventory_df: pd.DataFrame, forecast_df: pd.DataFrame = None) -> dict:
+    """Per-component arrays the optimiser needs, from the same demand inputs as ``safety_stock_table``."""
+    forecast_mean, forecast_std = demand_inputs(inventory_df, forecast_df)
+    unit_cost = inventory_df["unit_cost"].to_numpy(dtype=float)
+    return {
+        "sigma": lead_time_demand_std(forecast_mean, forecast_std, inventory_df["lead_time_weeks"],
+                                      inventory_df["lead_time_std_weeks"]),
+        "annual_demand": np.maximum(forecast_mean, 0) * 12,
+        "order_qty": np.maximum(economic_order_quantity(forecast_mean, unit_cost), 1).astype(float),
+        "unit_cost": unit_cost,
+    }
+
+
+def normal_loss(z: np.ndarray) -> np.ndarray:
+    """Standard normal loss function G(z) = E[(X − z)⁺]: expected units short per unit of σ."""
+    return np.exp(-0.5 * z**2) / np.sqrt(2 * np.pi) - z * ndtr(-z)
+
+
+def evaluate(inputs: dict, service_level) -> dict:
+    """Aggregate fill rate and safety-stock value of a (scalar or per-component) service-level policy."""
+    z = ndtri(np.broadcast_to(np.asarray(service_level, dtype=float), inputs["sigma"].shape))
+    safety_stock = z * inputs["sigma"]
+    short = inputs["annual_demand"] / inputs["order_qty"] * inputs["sigma"] * normal_loss(z)
+    demand = inputs["annual_demand"].sum()
+    return {
+        "fill_rate": 1 - short.sum() / demand if demand > 0 else 1.0,
+        "value": float((inputs["unit_cost"] * safety_stock).sum()),
+        "short": short,
+        "safety_stock": safety_stock,
+    }
+
+
+def _levels(inputs: dict, lam: float, bounds: tuple) -> np.ndarray:
+    """Lagrangian minimiser for multiplier ``lam``: 1 − c·Q / (λ·D), clipped to ``bounds``."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        tail = inputs["unit_cost"] * inputs["order_qty"] / (lam * inputs["annual_demand"])
+    return np.clip(1 - np.nan_to_num(tail, nan=1.0, posinf=1.0), *bounds)
+
+
+def _multiplier_range(inputs: dict, bounds: tuple) -> tuple:
+    """λ below which every level sits at the lower bound and above which every level sits at the upper."""
+    demand = inputs["annual_demand"]
+    ratio = inputs["unit_cost"] * inputs["order_qty"] / np.where(demand > 0, demand, np.nan)
+    ratio = ratio[np.isfinite(ratio) & (ratio > 0)]
+    if not len(ratio):
+        return 1.0, 1.0
+    return ratio.min() / (1 - bounds[0]), ratio.max() / (1 - bounds[1])
+
+
+def optimal_levels(
+    inputs: dict,
+    fill_rate: float = None,
+    budget: float = None,
+    bounds: tuple = (MIN_SERVICE_LEVEL, MAX_SERVICE_LEVEL),
+) -> np.ndarray:
+    """Per-component service levels meeting ``fill_rate`` at least value, or the best fill rate within ``budget``.
+
+    Exactly one of ``fill_rate`` and ``budget`` (dollars of safety stock) is
+    given. A fill rate the upper bound cannot reach raises ValueError; a
+    target already met at the lower bound, or a budget below its cost,
+    leaves every component at the lower bound.
+    """
+    if (fill_rate is None) == (budget is None):
+        raise ValueError("give exactly one of fill_rate and budget")
+    lo, hi = np.log(_multiplier_range(inputs, bounds))
+
+    def feasible(log_lam: float) -> bool:
+        result = evaluate(inputs, _levels(inputs, np.exp(log_lam), bounds))
+        return result["fill_rate"] >= fill_rate if budget is None else result["value"] <= budget
+
+    if budget is None:
+        if not feasible(hi):
+            best = evaluate(inputs, _levels(inputs, np.exp(hi), bounds))["fill_rate"]
+            raise ValueError(f"fill rate {fill_rate} is above the {best:.4f} reachable at a {bounds[1]} service level")
+        if feasible(lo):
+            return _levels(inputs, np.exp(lo), bounds)
+    else:
+        if feasible(hi):
+            return _levels(inputs, np.exp(hi), bounds)
+        if not feasible(lo):
+            return _levels(inputs, np.exp(lo), bounds)
+
+    # Fill rate and value both rise with λ: keep the side that meets the target
+    for _ in range(BISECTION_STEPS):
+        mid = (lo + hi) / 2
+        if feasible(mid) == (budget is None):
+            hi = mid
+        else:
+            lo = mid
+    return _levels(inputs, np.exp(hi if budget is None else lo), bounds)
+
+
+def efficient_frontier(inputs: dict, points: int = FRONTIER_POINTS,
+                       bounds: tuple = (MIN_SERVICE_LEVEL, MAX_SERVICE_LEVEL)) -> pd.DataFrame:
+    """Fill rate against safety-stock value for optimal policies, from all-lower- to all-upper-bound levels."""
+    rows = []
+    for lam in np.geomspace(*_multiplier_range(inputs, bounds), points):
+        levels = _levels(inputs, lam, bounds)
+        result = evaluate(inputs, levels)
+        rows.append({"fill_rate": result["fill_rate"], "safety_stock_value": result["value"],
+                     "mean_service_level": float(levels.mean())})
+    return pd.DataFrame(rows)
+
+
+def optimize_service_levels(
+    inventory_df: pd.DataFrame,
+    forecast_df: pd.DataFrame = None,
+    fill_rate: float = None,
+    budget: float = None,
+    baseline_service_level: float = 0.95,
+    min_service_level: float = None,
+) -> dict:
+    """Optimal per-component service levels, the frontier and the flat policies to compare against.
+
+    Without a ``fill_rate`` or ``budget`` the target is the fill rate the flat
+    ``baseline_service_level`` achieves, so the saving is pure capital.
+    ``min_service_level`` floors every component's level (default ``MIN_SERVICE_LEVEL``).
+    """
+    inputs = policy_inputs(inventory_df, forecast_df)
+    bounds = (MIN_SERVICE_LEVEL if min_service_level is None else min_service_level, MAX_SERVICE_LEVEL)
+    baseline = evaluate(inputs, baseline_service_level)
+    if fill_rate is None and budget is None:
+        fill_rate = baseline["fill_rate"]
+    levels = optimal_levels(inputs, fill_rate, budget, bounds)
+    result = evaluate(inputs, levels)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        component_fill = 1 - inputs["sigma"] * normal_loss(ndtri(levels)) / inputs["order_qty"]
+    components = pd.DataFrame({
+        "component_id": inventory_df["component_id"],
+        "category": inventory_df["category"],
+        "variant": inventory_df["variant"],
+        "unit_cost": inventory_df["unit_cost"],
+        "service_level": levels,
+        "fill_rate": np.clip(component_fill, 0, 1),
+        "safety_stock": result["safety_stock"],
+        "safety_stock_value": inputs["unit_cost"] * result["safety_stock"],
+    })
+    flat = pd.DataFrame([{"service_level": level, "fill_rate": r["fill_rate"], "safety_stock_value": r["value"]}
+                         for level in FLAT_SERVICE_LEVELS for r in [evaluate(inputs, level)]])
+    summary = {
+        "target": {"fill_rate": fill_rate} if budget is None else {"budget": budget},
+        "fill_rate": round(result["fill_rate"], 5),
+        "safety_stock_value": round(result["value"], 2),
+        "mean_service_level": round(float(levels.mean()), 4),
+        "baseline_service_level": baseline_service_level,
+        "baseline_fill_rate": round(baseline["fill_rate"], 5),
+        "baseline_safety_stock_value": round(baseline["value"], 2),
+        "value_saving_pct": round((1 - result["value"] / baseline["value"]) * 100, 2) if baseline["value"] > 0 else 0.0,
+        "components": len(components),
+    }
+    return {"summary": summary, "components": components, "frontier": efficient_frontier(inputs, bounds=bounds), "flat": flat}
+
+
+def run(forecast_df: pd.DataFrame = None, fill_rate: float = None, budget: float = None,
+        baseline_service_level: float = 0.95, min_service_level: float = None) -> np.ndarray:
+    """Optimise service levels, export service_levels.json and return one level per inventory row."""
+    print("Optimising per-component service levels...")
+    inventory_df = read_table(DATA_DIR / "inventory_levels")
+    with span("optimize_service_levels", rows=len(inventory_df)):
+        result = optimize_service_levels(inventory_df, forecast_df, fill_rate, budget, baseline_service_level,
+                                         min_service_level)
+    summary = result["summary"]
+
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    with open(OUTPUT_DIR / "service_levels.json", "w") as f:
+        json.dump({
+            "summary": summary,
+            "frontier": result["frontier"].round(5).to_dict("records"),
+            "flat": result["flat"].round(5).to_dict("records"),
+            "components": result["components"].round(4).to_dict("records"),
+        }, f, indent=2, default=str)
+
+    print(f"  → fill rate {summary['fill_rate']:.2%} with ${summary['safety_stock_value'] / 1e3:,.0f}k of safety stock "
+          f"(flat {baseline_service_level:.0%}: {summary['baseline_fill_rate']:.2%}, "
+          f"${summary['baseline_safety_stock_value'] / 1e3:,.0f}k; {summary['value_saving_pct']:.1f}% saved)")
+    return result["components"]["service_level"].to_numpy()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-component service levels for a portfolio fill rate or budget.")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--fill-rate", type=float, help="aggregate fill-rate target (default: that of the flat level)")
+    target.add_argument("--budget", type=float, help="dollars of safety stock to spend")
+    parser.add_argument("--service-level", type=float, default=0.95, help="flat level to compare against")
+    parser.add_argument("--min-service-level", type=float, help=f"floor for every component (default {MIN_SERVICE_LEVEL})")
+    args = parser.parse_args()
+
+    from models.forecaster import load_forecasts
+
+    try:
+        forecast_df = load_forecasts(Path(__file__).parent / "artifacts")
+    except FileNotFoundError:
+        forecast_df = None
+    run(forecast_df, args.fill_rate, args.budget, args.service_level, args.min_service_level)
@@ -0,0 +1,149 @@
+"""
+Content-addressed artifact cache for pipeline stages.
+
+A stage declares its parameters, input files, source files and upstream
+stages. Their contents are hashed into a key; if an entry for that key exists
+the stage's pickled result is loaded and its output files are restored instead
+of running the stage again. Each stage keeps its ``keep`` most recently used
+entries; older keys (superseded parameters, code or inputs) are deleted
+whenever the stage stores or reuses an entry.
+"""
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import time
+from pathlib import Path
+
+from pipeline.metrics import span
+
+ROOT = Path(__file__).parent.parent
+CACHE_DIR = ROOT / ".cache" / "pipeline"
+KEEP_PER_STAGE = 3
+
+
+def _expand(paths) -> list:
+    """Files named by ``paths``, expanding directories recursively, in a stable order."""
+    files = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            files.extend(sorted(p for p in path.rglob("*") if p.is_file()))
+        else:
+            files.append(path)
+    return files
+
+
+class ArtifactCache:
+    """On-disk stage cache keyed by a SHA-256 of everything a stage depends on."""
+
+    def __init__(self, root: Path = CACHE_DIR, enabled: bool = True, keep: int = KEEP_PER_STAGE):
+        self.root = Path(root)
+        self.enabled = enabled
+        self.keep = keep
+        self.keys = {}
+        self.status = []
+        self._index_path = self.root / "file_hashes.json"
+        self._index = {}
+        if self._index_path.exists():
+            self._index = json.loads(self._index_path.read_text())
+
+    def file_digest(self, path: Path) -> str:
+        """SHA-256 of a file, memoised on (size, mtime) so unchanged inputs are not re-read."""
+        path = Path(path)
+        if not path.exists():
+            return "missing"
+        stat = path.stat()
+        memo_key = str(path.resolve())
+        signature = [stat.st_size, stat.st_mtime_ns]
+        cached = self._index.get(memo_key)
+        if cached and cached[0] == signature:
+            return cached[1]
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        self._index[memo_key] = [signature, digest.hexdigest()]
+        return digest.hexdigest()
+
+    def key(self, name: str, params: dict = None, inputs=(), code=(), upstream=()) -> str:
+        """Content hash of a stage's parameters, input files, source files and upstream keys."""
+        digest = hashlib.sha256(name.encode())
+        digest.update(json.dumps(params or {}, sort_keys=True, default=str).encode())
+        for path in _expand(inputs) + _expand(code):
+            digest.update(str(path.relative_to(ROOT) if path.is_relative_to(ROOT) else path).encode())
+            digest.update(self.file_digest(path).encode())
+        for stage in upstream:
+            digest.update(self.keys[stage].encode())
+        return digest.hexdigest()
+
+    def run(self, name: str, func, params: dict = None, inputs=(), code=(), upstream=(), outputs=()):
+        """Return ``func()``'s result for this stage, from cache when its key is unchanged."""
+        with span(name) as stage:
+            result, status = self._run(name, func, params, inputs, code, upstream, outputs)
+            stage.note(cache=status)
+        return result
+
+    def _run(self, name: str, func, params, inputs, code, upstream, outputs):
+        start = time.perf_counter()
+        key = self.key(name, params, inputs, code, upstream)
+        self.keys[name] = key
+        entry = self.root / name / key
+
+        if self.enabled and (entry / "result.pkl").exists():
+            manifest = json.loads((entry / "manifest.json").read_text())
+            # Directory outputs hold exactly the entry's files: drop any another run left behind
+            restored = {target for target, _ in manifest["outputs"]}
+            for path in _expand(p for p in map(Path, outputs) if p.is_dir()):
+                if str(path.relative_to(ROOT)) not in restored:
+                    path.unlink()
+            for i, (target, digest) in enumerate(manifest["outputs"]):
+                target = ROOT / target
+                if self.file_digest(target) != digest:
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    shutil.copyfile(entry / "files" / str(i), target)
+            with open(entry / "result.pkl", "rb") as f:
+                result = pickle.load(f)
+            os.utime(entry)  # mark as recently used
+            self._evict(entry)
+            self._record(name, "reused", key, start)
+            return result, "reused"
+
+        result = func()
+        if self.enabled:
+            self._store(entry, result, outputs)
+            self._evict(entry)
+        self._record(name, "recomputed", key, start)
+        return result, "recomputed"
+
+    def _store(self, entry: Path, result, outputs):
+        """Write a stage's result and copies of its output files under ``entry``."""
+        if entry.exists():
+            shutil.rmtree(entry)
+        (entry / "files").mkdir(parents=True)
+        manifest = {"outputs": []}
+        for i, path in enumerate(_expand(outputs)):
+            shutil.copyfile(path, entry / "files" / str(i))
+            manifest["outputs"].append([str(path.relative_to(ROOT)), self.file_digest(path)])
+        with open(entry / "result.pkl", "wb") as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        (entry / "manifest.json").write_text(json.dumps(manifest, indent=2))
+
+    def _evict(self, entry: Path):
+        """Delete all but the ``keep`` most recently used entries of ``entry``'s stage (``entry`` always stays)."""
+        entries = sorted((p for p in entry.parent.iterdir() if p.is_dir()),
+                         key=lambda p: (p == entry, p.stat().st_mtime_ns), reverse=True)
+        for stale in entries[max(self.keep, 1):]:
+            shutil.rmtree(stale, ignore_errors=True)
+
+    def _record(self, name: str, status: str, key: str, start: float):
+        self.status.append({"stage": name, "status": status, "key": key[:12], "seconds": time.perf_counter() - start})
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._index_path.write_text(json.dumps(self._index))
+
+    def report(self) -> str:
+        """One line per stage run so far: reused or recomputed, key prefix and time."""
+        lines = [f"   {'stage':<14} {'status':<11} {'key':<13} {'time':>8}"]
+        for s in self.status:
+            lines.append(f"   {s['stage']:<14} {s['status']:<11} {s['key']:<13} {s['seconds']:>7.2f}s")
+        return "\n".join(lines)
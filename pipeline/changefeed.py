@@ -0,0 +1,148 @@
+"""
+Keyed changefeed of a record set that is republished every run.
+
+Each ``publish`` diffs the new records against the previous state, keyed by
+one field, and appends only the differences to the feed file as numbered
+entries: ``added`` (new key), ``changed`` (same key, different record) and
+``resolved`` (key no longer present, no record); ``update`` diffs only the
+records it is given, for a writer that knows what it touched. When the feed has grown past
+``compact_ratio`` of the record count it is folded into ``snapshot.json`` and
+a new, empty feed ``feed.<snapshot_seq>.jsonl`` is started, so writes stay
+proportional to the number of changes while a new client never has to replay
+a long history. ``manifest.json`` is replaced last and names the current feed:
+
+    {"seq": 1234, "snapshot_seq": 1180, "records": 61, "feed": "feed.1180.jsonl"}
+
+A client holding sequence ``n`` reads the manifest; if ``n < snapshot_seq`` it
+reloads ``snapshot.json`` ({"seq": ..., "records": [...]}) and continues from
+its ``seq``, then applies the entries of the named feed numbered above its
+cursor. Feed files are never truncated: compaction writes the snapshot, then
+the manifest, and only then deletes feeds older than the one the previous
+manifest named, so a client that read the manifest just before a compaction
+still finds its feed complete. Records are compared by their compact JSON
+encoding, the same form the files hold.
+"""
+import json
+import os
+from pathlib import Path
+
+from pipeline.metrics import span
+
+COMPACT_RATIO = 0.5
+
+
+def _encode(record: dict) -> str:
+    return json.dumps(record, separators=(",", ":"), default=str)
+
+
+def _feed_name(snapshot_seq: int) -> str:
+    return f"feed.{snapshot_seq}.jsonl"
+
+
+def _replace(path: Path, text: str):
+    """Write ``text`` to ``path`` atomically, so readers never see a partial file."""
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(text)
+    os.replace(tmp, path)
+
+
+class ChangeFeed:
+    """Snapshot plus append-only feed of the records published to ``directory``."""
+
+    def __init__(self, directory: Path, key: str = "component_id", compact_ratio: float = COMPACT_RATIO):
+        self.directory = Path(directory)
+        self.key = key
+        self.compact_ratio = compact_ratio
+        self.seq = 0
+        self.snapshot_seq = 0
+        self.feed_name = _feed_name(0)
+        self.state = {}  # key -> encoded record
+        self._load()
+
+    @property
+    def feed_length(self) -> int:
+        return self.seq - self.snapshot_seq
+
+    def _load(self):
+        manifest = self.directory / "manifest.json"
+        if not manifest.exists():
+            return
+        self.feed_name = json.loads(manifest.read_text()).get("feed", "feed.jsonl")
+        snapshot = json.loads((self.directory / "snapshot.json").read_text())
+        self.seq = self.snapshot_seq = snapshot["seq"]
+        self.state = {r[self.key]: _encode(r) for r in snapshot["records"]}
+        feed = self.directory / self.feed_name
+        lines = feed.read_text().splitlines() if feed.exists() else []
+        for entry in map(json.loads, lines):
+            if entry["seq"] <= self.seq:
+                continue
+            if entry["op"] == "resolved":
+                self.state.pop(entry["key"], None)
+            else:
+                self.state[entry["key"]] = _encode(entry["record"])
+            self.seq = entry["seq"]
+
+    def publish(self, records: list) -> dict:
+        """Append the differences from the previous state; returns counts per operation."""
+        encoded = {r[self.key]: _encode(r) for r in records}
+        entries = self._diff(encoded)
+        entries.extend(("resolved", key, None) for key in sorted(self.state.keys() - encoded.keys(), key=str))
+        self.state = encoded
+        return self._append(entries)
+
+    def update(self, records: list) -> dict:
+        """Append changes to ``records`` only; keys not given keep their state and nothing is resolved.
+
+        Costs O(len(records)) apart from an occasional compaction, for writers
+        that know which records they touched.
+        """
+        encoded = {r[self.key]: _encode(r) for r in records}
+        entries = self._diff(encoded)
+        self.state.update(encoded)
+        return self._append(entries)
+
+    def _diff(self, encoded: dict) -> list:
+        entries = []
+        for key, body in encoded.items():
+            previous = self.state.get(key)
+            if previous != body:
+                entries.append(("added" if previous is None else "changed", key, body))
+        return entries
+
+    def _append(self, entries: list) -> dict:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with span("append_feed", rows=len(entries)), open(self.directory / self.feed_name, "a") as f:
+            for op, key, body in entries:
+                self.seq += 1
+                entry = {"seq": self.seq, "op": op, "key": key}
+                if body is not None:
+                    entry["record"] = json.loads(body)
+                f.write(_encode(entry) + "\n")
+
+        compacted = not (self.directory / "snapshot.json").exists() or self.feed_length > self.compact_ratio * len(self.state)
+        if compacted:
+            self.compact()
+        else:
+            self._write_manifest()
+        counts = {op: sum(1 for e in entries if e[0] == op) for op in ("added", "changed", "resolved")}
+        return {**counts, "seq": self.seq, "compacted": compacted}
+
+    def compact(self):
+        """Fold the feed into a snapshot at the current sequence and start a new feed."""
+        previous = self.feed_name
+        with span("compact_snapshot", rows=len(self.state)):
+            _replace(self.directory / "snapshot.json",
+                     f'{{"seq":{self.seq},"records":[{",".join(self.state.values())}]}}')
+            self.snapshot_seq = self.seq
+            self.feed_name = _feed_name(self.seq)
+            (self.directory / self.feed_name).touch()
+            self._write_manifest()
+        # Readers of the previous manifest may still be reading its feed; anything older is unreferenced
+        for path in self.directory.glob("feed*.jsonl"):
+            if path.name not in (self.feed_name, previous):
+                path.unlink()
+
+    def _write_manifest(self):
+        _replace(self.directory / "manifest.json", json.dumps(
+            {"seq": self.seq, "snapshot_seq": self.snapshot_seq, "records": len(self.state), "feed": self.feed_name},
+            indent=2))
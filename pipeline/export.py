@@ -0,0 +1,137 @@
+"""
+Partitioned, column-oriented dashboard export of demand history and forecasts.
+
+Each category becomes one payload listing its variants once and every
+measure as a (variant × month) array against a shared month axis, so no key
+is repeated per row. Payloads are named by a hash of their content
+(``series/<slug>.<hash>.json``) and written alongside ``.gz`` (and ``.br``
+when the ``brotli`` package is installed) copies for a static server to
+negotiate, e.g. nginx ``gzip_static``/``brotli_static``. ``series/manifest.json``
+maps each category to its file, so the dashboard loads the manifest up front
+and fetches a category only when a page shows it.
+"""
+import gzip
+import hashlib
+import json
+import re
+from pathlib import Path
+
+import pandas as pd
+
+from pipeline.metrics import span
+
+try:
+    import brotli
+except ImportError:  # optional: gzip copies are always written
+    brotli = None
+
+ROOT = Path(__file__).parent.parent
+OUTPUT_DIR = ROOT / "dashboard" / "public" / "data"
+SERIES_DIR = "series"
+FORECAST_MEASURES = ["predicted", "ci_lower", "ci_upper", "p10", "p50", "p90", "p95"]
+
+
+def _slug(category: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", str(category).lower()).strip("-") or "category"
+
+
+def _matrix(frame: pd.DataFrame, value: str, variants: list, months: list) -> list:
+    """(variant × month) nested list of ``value``, None where a cell is missing."""
+    wide = frame.pivot(index="variant", columns="year_month", values=value).reindex(index=variants, columns=months)
+    wide = wide.astype(object).where(wide.notna(), None)
+    return [[int(v) if isinstance(v, float) and v.is_integer() else v for v in row] for row in wide.to_numpy().tolist()]
+
+
+def category_payload(category: str, history: pd.DataFrame, forecast: pd.DataFrame) -> dict:
+    """Column-oriented history and forecast arrays for one category's variants."""
+    variants = sorted(set(history["variant"].astype(str)) | set(forecast["variant"].astype(str)))
+    history = history.assign(variant=history["variant"].astype(str))
+    forecast = forecast.assign(variant=forecast["variant"].astype(str))
+    history_months = sorted(history["year_month"].unique())
+    forecast_months = sorted(forecast["year_month"].unique())
+    measures = [m for m in FORECAST_MEASURES if m in forecast.columns]
+    payload = {
+        "category": category,
+        "variants": variants,
+        "history": {"months": history_months, "demand": _matrix(history, "demand", variants, history_months)},
+        "forecast": {"months": forecast_months,
+                     **{m: _matrix(forecast, m, variants, forecast_months) for m in measures}},
+    }
+    if "method" in forecast.columns:
+        # One forecasting method per variant, aligned with "variants"
+        methods = forecast.drop_duplicates("variant").set_index("variant")["method"]
+        payload["forecast"]["method"] = [methods.get(v) for v in variants]
+    return payload
+
+
+def _write(directory: Path, name: str, payload: dict) -> dict:
+    """Write ``payload`` as content-hashed JSON plus compressed copies; returns its manifest entry."""
+    body = json.dumps(payload, separators=(",", ":"), sort_keys=True).encode()
+    digest = hashlib.sha256(body).hexdigest()[:12]
+    path = directory / f"{name}.{digest}.json"
+    entry = {"file": f"{directory.name}/{path.name}", "bytes": len(body)}
+    if not path.exists():
+        path.write_bytes(body)
+    gz = path.with_name(path.name + ".gz")
+    if not gz.exists():
+        # mtime=0 keeps the compressed bytes identical across runs
+        gz.write_bytes(gzip.compress(body, compresslevel=9, mtime=0))
+    entry["gzip_bytes"] = gz.stat().st_size
+    if brotli is not None:
+        br = path.with_name(path.name + ".br")
+        if not br.exists():
+            br.write_bytes(brotli.compress(body, quality=11))
+        entry["brotli_bytes"] = br.stat().st_size
+    return entry
+
+
+def write_partitions(directory: Path, payloads: dict) -> dict:
+    """Write one content-hashed payload per key into ``directory``; returns manifest entries by key.
+
+    Files no longer referenced (other than ``manifest.json``) are removed, so
+    a directory holds exactly one generation of payloads.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    entries = {key: _write(directory, _slug(key), payload) for key, payload in payloads.items()}
+    current = {Path(entry["file"]).name for entry in entries.values()}
+    for path in directory.glob("*.json*"):
+        if path.name != "manifest.json" and path.name.split(".json")[0] + ".json" not in current:
+            path.unlink()
+    return entries
+
+
+def export_series(hist_export: pd.DataFrame, future_export: pd.DataFrame, output_dir: Path = OUTPUT_DIR) -> dict:
+    """Write one payload per category and the manifest; stale payloads are removed.
+
+    Takes the frames ``forecaster.dashboard_frames`` produces (``year_month``
+    as "YYYY-MM" strings).
+    """
+    directory = Path(output_dir) / SERIES_DIR
+    forecasts_by_category = dict(tuple(future_export.groupby("category", sort=False)))
+    empty = future_export.iloc[:0]
+
+    with span("write_payloads", rows=len(hist_export) + len(future_export)):
+        payloads = {
+            category: category_payload(category, history, forecasts_by_category.get(category, empty))
+            for category, history in hist_export.groupby("category", sort=True)
+        }
+        entries = write_partitions(directory, payloads)
+    categories = {category: {**entries[category], "variants": payloads[category]["variants"]} for category in payloads}
+
+    manifest = {"version": 1, "categories": categories}
+    (directory / "manifest.json").write_text(json.dumps(manifest, indent=2, sort_keys=True))
+
+    total = sum(e["bytes"] for e in categories.values())
+    total_gz = sum(e["gzip_bytes"] for e in categories.values())
+    print(f"  → {len(categories)} category payloads, {total / 1024:.0f} KB JSON, {total_gz / 1024:.0f} KB gzipped")
+    return manifest
+
+
+if __name__ == "__main__":
+    # Re-export from the stored orders and the forecast saved by the last forecast run
+    from models.demand_cube import stream_demand
+    from models.forecaster import DATA_DIR, MODEL_DIR, dashboard_frames, load_forecasts
+
+    demand = stream_demand(DATA_DIR / "orders").cube().to_frame()
+    export_series(*dashboard_frames(demand, load_forecasts(MODEL_DIR)))
@@ -0,0 +1,189 @@
+"""
+Per-run instrumentation for the pipeline.
+
+Stages wrap their phases in ``span(name, rows=...)``. While a ``RunMetrics``
+is active each span records wall and CPU time, the process peak RSS and how
+much the phase raised it, rows and rows/sec, and (with ``trace_memory``) the
+traced peak allocation. Spans nest, so ``forecast/train/model_fit`` shows up
+under its stage. The run is written as JSON to ``reports/metrics/`` and
+appended to ``history.jsonl`` there so stage times can be tracked across runs.
+Without an active run a span costs a single check.
+
+``profile=True`` runs cProfile over the whole run and saves the stats next to
+the metrics file.
+"""
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # POSIX only: peak RSS is reported as unavailable (None) elsewhere
+    resource = None
+
+ROOT = Path(__file__).parent.parent
+METRICS_DIR = ROOT / "reports" / "metrics"
+
+_active = None
+
+
+def peak_rss_mb() -> float:
+    """Process peak RSS in MB (``ru_maxrss`` is KB on Linux, bytes on macOS), or None without ``resource``."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+class Span:
+    """One timed phase; ``rows`` may be set after entering, once the count is known."""
+
+    def __init__(self, path: str, rows: int = None, **fields):
+        self.path = path
+        self.rows = rows
+        self.fields = fields
+        self.traced_peak = 0
+
+    def note(self, **fields):
+        """Attach extra fields (e.g. cache status) to this span's record."""
+        self.fields.update(fields)
+
+
+class RunMetrics:
+    """Collects span records for one pipeline run and writes them out."""
+
+    def __init__(self, command: str, out_dir: Path = METRICS_DIR, trace_memory: bool = False,
+                 profile: bool = False):
+        self.command = command
+        self.out_dir = Path(out_dir)
+        self.trace_memory = trace_memory
+        self.profile = profile
+        # Microseconds and the PID keep runs started in the same second (e.g. in parallel) apart
+        self.run_id = f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S.%fZ')}-{os.getpid()}"
+        self.spans = []
+        self._stack = []
+        self._profiler = None
+
+    def __enter__(self):
+        global _active
+        _active = self
+        self._start = time.perf_counter()
+        self._cpu_start = time.process_time()
+        if self.trace_memory:
+            tracemalloc.start()
+        if self.profile:
+            import cProfile
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        return self
+
+    def __exit__(self, *exc):
+        global _active
+        if self._profiler is not None:
+            self._profiler.disable()
+        self.wall = time.perf_counter() - self._start
+        self.cpu = time.process_time() - self._cpu_start
+        self.top_allocations = []
+        if self.trace_memory:
+            snapshot = tracemalloc.take_snapshot()
+            self.top_allocations = [
+                {"where": str(stat.traceback), "mb": round(stat.size / 2**20, 2)}
+                for stat in snapshot.statistics("lineno")[:10]
+            ]
+            tracemalloc.stop()
+        _active = None
+        return False
+
+    @contextmanager
+    def span(self, name: str, rows: int = None, **fields):
+        parent = self._stack[-1] if self._stack else None
+        current = Span(f"{parent.path}/{name}" if parent else name, rows, **fields)
+        if self.trace_memory:
+            if parent:
+                parent.traced_peak = max(parent.traced_peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        rss_before = peak_rss_mb()
+        start, cpu_start = time.perf_counter(), time.process_time()
+        self._stack.append(current)
+        slot = len(self.spans)
+        self.spans.append(None)  # keep records in start order, parents before children
+        try:
+            yield current
+        finally:
+            self._stack.pop()
+            seconds = time.perf_counter() - start
+            rss = peak_rss_mb()
+            record = {
+                "stage": current.path,
+                "seconds": round(seconds, 4),
+                "cpu_seconds": round(time.process_time() - cpu_start, 4),
+                "peak_rss_mb": None if rss is None else round(rss, 1),
+                "rss_growth_mb": None if rss is None else round(rss - rss_before, 1),
+            }
+            if current.rows is not None:
+                record["rows"] = int(current.rows)
+                record["rows_per_sec"] = round(current.rows / seconds, 1) if seconds > 0 else None
+            if self.trace_memory:
+                current.traced_peak = max(current.traced_peak, tracemalloc.get_traced_memory()[1])
+                record["peak_traced_mb"] = round(current.traced_peak / 2**20, 2)
+                if parent:
+                    parent.traced_peak = max(parent.traced_peak, current.traced_peak)
+            record.update(current.fields)
+            self.spans[slot] = record
+
+    def write(self) -> Path:
+        """Write this run's metrics file, append it to the history and save any profile."""
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        rss = peak_rss_mb()
+        report = {
+            "run_id": self.run_id,
+            "command": self.command,
+            "seconds": round(self.wall, 3),
+            "cpu_seconds": round(self.cpu, 3),
+            "peak_rss_mb": None if rss is None else round(rss, 1),
+            "stages": self.spans,
+        }
+        if self.top_allocations:
+            report["top_allocations"] = self.top_allocations
+        if self._profiler is not None:
+            profile_path = self.out_dir / f"{self.run_id}.prof"
+            self._profiler.dump_stats(profile_path)
+            report["profile"] = str(profile_path.relative_to(ROOT) if profile_path.is_relative_to(ROOT) else profile_path)
+        path = self.out_dir / f"{self.run_id}.json"
+        path.write_text(json.dumps(report, indent=2))
+        with open(self.out_dir / "history.jsonl", "a") as f:
+            f.write(json.dumps(report) + "\n")
+        return path
+
+    def report(self) -> str:
+        """One line per top-level stage: time, CPU, peak RSS and throughput."""
+        lines = [f"   {'stage':<14} {'time':>8} {'cpu':>8} {'peak RSS':>10} {'rows/s':>11}"]
+        for s in self.spans:
+            if "/" in s["stage"]:
+                continue
+            rate = f"{s['rows_per_sec']:>11,.0f}" if s.get("rows_per_sec") else f"{'':>11}"
+            rss = f"{s['peak_rss_mb']:>7.0f} MB" if s["peak_rss_mb"] is not None else f"{'n/a':>10}"
+            lines.append(f"   {s['stage']:<14} {s['seconds']:>7.2f}s {s['cpu_seconds']:>7.2f}s {rss} {rate}")
+        return "\n".join(lines)
+
+    def print_profile(self, limit: int = 20):
+        """Top functions of the cProfile run by cumulative time."""
+        if self._profiler is None:
+            return
+        import pstats
+        pstats.Stats(self._profiler).sort_stats("cumulative").print_stats(limit)
+
+
+@contextmanager
+def span(name: str, rows: int = None, **fields):
+    """Time the enclosed phase under the active run (no-op when none is active)."""
+    if _active is None:
+        yield Span(name, rows, **fields)
+        return
+    with _active.span(name, rows, **fields) as current:
+        yield current
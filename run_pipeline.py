@@ -2,50 +2,323 @@
 """
 Blue Bird Corporation — Inventory Optimisation Demo Pipeline
 Runs: data generation → forecasting → safety stock → recommendations → dashboard JSON
+
+    python run_pipeline.py [all] [--stages forecast safety-stock ...]
+    python run_pipeline.py generate
+    python run_pipeline.py forecast [--forecast-mode retrain]
+    python run_pipeline.py safety-stock [--service-level 0.97 | --fill-rate-target 0.98]
+    python run_pipeline.py recommend [--order-budget 5e6]
+
+Stage modules are imported only when their stage runs, so e.g. a cron-driven
+``safety-stock`` never imports CatBoost. A stage run on its own reads what its
+upstream stage last saved (the forecast table, safety_stock.json).
+
+Every run writes per-stage timings, peak RSS and throughput to
+reports/metrics/ (``--profile`` adds cProfile stats, ``--trace-memory``
+tracemalloc peaks).
 """
+import argparse
 import sys
 from pathlib import Path
 
 # Add project root to path
 sys.path.insert(0, str(Path(__file__).parent))
 
-def main():
-    print("=" * 60)
-    print("🚌 Blue Bird Corporation — Inventory Optimisation Pipeline")
-    print("=" * 60)
-    
-    # Step 1: Generate synthetic data
-    print("\n📊 Step 1: Generating synthetic data...")
+ROOT = Path(__file__).parent
+DATA_DIR = ROOT / "data" / "generated"
+OUTPUT_DIR = ROOT / "dashboard" / "public" / "data"
+MODEL_DIR = ROOT / "models" / "artifacts"
+DATA_TABLES = ["orders", "components", "suppliers", "inventory_levels"]
+MODEL_FILES = [MODEL_DIR / "forecaster.cbm", MODEL_DIR / "schema.json"]
+SEGMENT_FILES = [MODEL_DIR / "segments", MODEL_DIR / "schema.json"]
+FORECAST_TABLE = MODEL_DIR / "forecasts.feather"
+STAGES = ["generate", "forecast", "safety-stock", "recommend"]
+
+
+def _generate():
     from data.generate_data import main as generate_data
     generate_data()
-    
-    # Step 2: Train demand forecasting model
-    print("\n📈 Step 2: Training demand forecasting model...")
+
+
+def _forecast(args):
     from models.forecaster import run as run_forecaster
-    forecast_df, demand_df, metrics = run_forecaster()
-    
-    # Step 3: Calculate safety stock
-    print("\n🛡️ Step 3: Calculating safety stock...")
+    return run_forecaster(args.forecast_mode, segment_by=args.segment_by, workers=args.train_workers,
+                          thread_count=args.thread_count, hierarchical=args.hierarchical)
+
+
+def _export_series(demand_df, forecast_df):
+    from models.forecaster import dashboard_frames
+    from pipeline.export import export_series
+    return export_series(*dashboard_frames(demand_df, forecast_df))
+
+
+def _saved_model_is_segmented() -> bool:
+    """Whether the saved schema points at per-segment models rather than forecaster.cbm."""
+    import json
+    schema = MODEL_DIR / "schema.json"
+    return schema.exists() and bool(json.loads(schema.read_text()).get("segments"))
+
+
+def _saved_forecast():
+    from models.forecaster import load_forecasts
+    from pipeline.metrics import span
+    with span("load_forecast") as s:
+        forecast_df = load_forecasts(MODEL_DIR)
+        s.rows = len(forecast_df)
+    return forecast_df
+
+
+def _saved_safety_stock():
+    import pandas as pd
+    from pipeline.metrics import span
+    with span("load_safety_stock") as s:
+        safety_stock_df = pd.read_json(OUTPUT_DIR / "safety_stock.json", dtype={"variant": str}, precise_float=True)
+        s.rows = len(safety_stock_df)
+    return safety_stock_df
+
+
+def _safety_stock(forecast_df, args):
     from models.safety_stock import run as run_safety_stock
-    safety_stock_df = run_safety_stock(forecast_df)
-    
-    # Step 4: Generate AI recommendations
-    print("\n🤖 Step 4: Generating AI recommendations...")
+    service_level = args.service_level
+    if args.fill_rate_target is not None or args.safety_stock_budget is not None:
+        from models.service_levels import run as run_service_levels
+        service_level = run_service_levels(forecast_df, args.fill_rate_target, args.safety_stock_budget,
+                                           args.service_level, args.min_service_level)
+    return run_safety_stock(forecast_df, service_level=service_level)
+
+
+def _scenarios(forecast_df, service_level):
+    from models.scenarios import run as run_scenarios
+    return run_scenarios(forecast_df, service_level=service_level)
+
+
+def _simulate(safety_stock_df, forecast_df, n_paths, workers):
+    from models.simulation import run as run_simulation
+    return run_simulation(safety_stock_df, forecast_df, n_paths, workers)
+
+
+def _optimize_orders(safety_stock_df, budget):
+    from agent.optimizer import run as run_optimizer
+    return run_optimizer(safety_stock_df, budget)
+
+
+def _recommend(safety_stock_df, forecast_df):
     from agent.recommender import run as run_recommender
-    recs = run_recommender(safety_stock_df, forecast_df)
-    
+    return run_recommender(safety_stock_df, forecast_df)
+
+
+def _publish_changes(recs):
+    from agent.recommender import publish_changes
+    return publish_changes(recs)
+
+
+def _dependency(results: dict, stage: str, saved: list) -> dict:
+    """Cache-key dependency on ``stage``: its key if it ran in this process, else the files it saved."""
+    if stage in results:
+        return {"upstream": [stage]}
+    return {"inputs": saved}
+
+
+def _merge(*deps: dict) -> dict:
+    merged = {"inputs": [], "upstream": []}
+    for dep in deps:
+        for field, values in dep.items():
+            merged[field] += list(values)
+    return merged
+
+
+def run_generate(args, cache, results: dict):
+    print("\n📊 Step 1: Generating synthetic data...")
+    results["generate"] = cache.run(
+        "generate", _generate,
+        code=[ROOT / "data" / "generate_data.py", ROOT / "data" / "storage.py"],
+        outputs=[DATA_DIR / f"{t}{ext}" for t in DATA_TABLES for ext in (".feather", ".csv")],
+    )
+
+
+def run_forecast(args, cache, results: dict):
+    print("\n📈 Step 2: Training demand forecasting model...")
+    uses_saved_model = args.forecast_mode != "train"
+    segmented = _saved_model_is_segmented() if uses_saved_model else bool(args.segment_by)
+    model_files = SEGMENT_FILES if segmented else MODEL_FILES
+    forecast_df, demand_df, metrics = results["forecast"] = cache.run(
+        "forecast", lambda: _forecast(args),
+        # Worker and thread counts change wall time, not the model
+        params={"mode": args.forecast_mode, "segment_by": args.segment_by, "hierarchical": args.hierarchical},
+        inputs=[DATA_DIR / "orders.feather"] + (model_files if uses_saved_model else [])
+        + ([DATA_DIR / "suppliers.feather"] if args.segment_by == "supplier" else []),
+        code=[ROOT / "models" / "forecaster.py", ROOT / "models" / "intermittent.py", ROOT / "models" / "demand_cube.py",
+              ROOT / "models" / "segments.py", ROOT / "models" / "hierarchy.py", ROOT / "data" / "storage.py"],
+        outputs=[OUTPUT_DIR / f for f in ("forecasts.json", "model_metrics.json")]
+        + [FORECAST_TABLE] + (model_files if args.forecast_mode != "forecast" else []),
+    )
+
+    cache.run(
+        "export", lambda: _export_series(demand_df, forecast_df),
+        code=[ROOT / "pipeline" / "export.py", ROOT / "models" / "forecaster.py"],
+        upstream=["forecast"],
+        outputs=[OUTPUT_DIR / "series"],
+    )
+
+
+def run_safety_stock(args, cache, results: dict):
+    print("\n🛡️ Step 3: Calculating safety stock...")
+    forecast_dep = _dependency(results, "forecast", [FORECAST_TABLE])
+    forecast_df = results["forecast"][0] if "forecast" in results else _saved_forecast()
+    optimized = args.fill_rate_target is not None or args.safety_stock_budget is not None
+    safety_stock_df = results["safety_stock"] = cache.run(
+        "safety_stock", lambda: _safety_stock(forecast_df, args),
+        params={"service_level": args.service_level, "fill_rate_target": args.fill_rate_target,
+                "budget": args.safety_stock_budget, "min_service_level": args.min_service_level if optimized else None},
+        code=[ROOT / "models" / "safety_stock.py", ROOT / "models" / "service_levels.py", ROOT / "data" / "storage.py"],
+        outputs=[OUTPUT_DIR / "safety_stock.json"] + ([OUTPUT_DIR / "service_levels.json"] if optimized else []),
+        **_merge({"inputs": [DATA_DIR / "inventory_levels.feather"]}, forecast_dep),
+    )
+
+    # The scenario baseline uses the levels safety stock was actually planned at
+    service_level = safety_stock_df["service_level"].tolist() if optimized else args.service_level
+    cache.run(
+        "scenarios", lambda: _scenarios(forecast_df, service_level),
+        params={"service_level": service_level},
+        code=[ROOT / "models" / "scenarios.py", ROOT / "models" / "safety_stock.py"],
+        outputs=[OUTPUT_DIR / "scenarios"],
+        **_merge({"inputs": [DATA_DIR / "inventory_levels.feather"]}, forecast_dep),
+    )
+
+    if args.simulate_paths > 0:
+        print("\n🎲 Step 3b: Simulating stockouts...")
+        cache.run(
+            "simulate", lambda: _simulate(safety_stock_df, forecast_df, args.simulate_paths, args.workers),
+            params={"paths": args.simulate_paths},
+            code=[ROOT / "models" / "simulation.py", ROOT / "models" / "safety_stock.py"],
+            outputs=[OUTPUT_DIR / "stockout_simulation.json"],
+            **_merge({"inputs": [DATA_DIR / "inventory_levels.feather"], "upstream": ["safety_stock"]}, forecast_dep),
+        )
+
+
+def run_recommend(args, cache, results: dict):
+    print("\n🤖 Step 4: Generating AI recommendations...")
+    forecast_dep = _dependency(results, "forecast", [FORECAST_TABLE])
+    safety_stock_dep = _dependency(results, "safety_stock", [OUTPUT_DIR / "safety_stock.json"])
+    forecast_df = results["forecast"][0] if "forecast" in results else _saved_forecast()
+    safety_stock_df = results["safety_stock"] if "safety_stock" in results else _saved_safety_stock()
+    results["recommend"] = cache.run(
+        "recommend", lambda: _recommend(safety_stock_df, forecast_df),
+        code=[ROOT / "agent" / "recommender.py"],
+        outputs=[OUTPUT_DIR / "recommendations.json", OUTPUT_DIR / "kpis.json"],
+        **_merge(forecast_dep, safety_stock_dep),
+    )
+    # Outside the cache: a reused result may still differ from what the feed last published
+    _publish_changes(results["recommend"])
+
+    if args.order_budget > 0:
+        print("\n🧮 Step 5: Optimising replenishment orders...")
+        cache.run(
+            "optimize", lambda: _optimize_orders(safety_stock_df, args.order_budget),
+            params={"budget": args.order_budget},
+            code=[ROOT / "agent" / "optimizer.py", ROOT / "models" / "safety_stock.py"],
+            outputs=[OUTPUT_DIR / "replenishment_plan.json"],
+            **safety_stock_dep,
+        )
+
+
+RUNNERS = {"generate": run_generate, "forecast": run_forecast, "safety-stock": run_safety_stock,
+           "recommend": run_recommend}
+
+
+def _parser() -> argparse.ArgumentParser:
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--no-cache", action="store_true", help="recompute every stage and skip the artifact cache")
+    common.add_argument("--profile", action="store_true", help="run under cProfile and save the stats with the metrics")
+    common.add_argument("--trace-memory", action="store_true",
+                        help="record tracemalloc peak allocations per stage (slows the run)")
+
+    forecast = argparse.ArgumentParser(add_help=False)
+    forecast.add_argument("--forecast-mode", choices=("train", "forecast", "retrain"), default="train",
+                          help="train from scratch, score with the saved model, or warm-start it on new months")
+    forecast.add_argument("--segment-by", choices=("category", "supplier"),
+                          help="train one model per category or supplier instead of one global model")
+    forecast.add_argument("--train-workers", type=int, default=1, help="processes for per-segment training")
+    forecast.add_argument("--thread-count", type=int,
+                          help="CatBoost threads per model (default: all cores, split between train workers)")
+    forecast.add_argument("--hierarchical", action="store_true",
+                          help="forecast bus-model volumes and derive variants from option take-rates")
+
+    safety_stock = argparse.ArgumentParser(add_help=False)
+    safety_stock.add_argument("--service-level", type=float, default=0.95, help="target cycle service level")
+    target = safety_stock.add_mutually_exclusive_group()
+    target.add_argument("--fill-rate-target", type=float,
+                        help="per-component service levels meeting this aggregate fill rate at the least safety-stock value")
+    target.add_argument("--safety-stock-budget", type=float,
+                        help="per-component service levels with the best fill rate for this many dollars of safety stock")
+    safety_stock.add_argument("--min-service-level", type=float,
+                              help="floor on the per-component service levels (default: models.service_levels.MIN_SERVICE_LEVEL)")
+    safety_stock.add_argument("--simulate-paths", type=int, default=0,
+                              help="Monte Carlo paths per component for the stockout simulation (0 = skip)")
+    safety_stock.add_argument("--workers", type=int, default=1, help="processes for the stockout simulation")
+
+    recommend = argparse.ArgumentParser(add_help=False)
+    recommend.add_argument("--order-budget", type=float, default=0,
+                           help="also plan replenishment orders within this budget in dollars (0 = skip)")
+
+    parser = argparse.ArgumentParser(description="Run the Blue Bird inventory optimisation pipeline.")
+    commands = parser.add_subparsers(dest="command", metavar="command")
+    everything = commands.add_parser("all", parents=[common, forecast, safety_stock, recommend],
+                                     help="run the pipeline end to end (default)")
+    everything.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES, help="stages to run, in order")
+    commands.add_parser("generate", parents=[common], help="generate the synthetic data")
+    commands.add_parser("forecast", parents=[common, forecast], help="forecast demand and export it")
+    commands.add_parser("safety-stock", parents=[common, safety_stock],
+                        help="safety stock and what-if scenarios from the saved forecast")
+    commands.add_parser("recommend", parents=[common, recommend],
+                        help="recommendations (and an order plan) from the saved safety stock")
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or argv[0].startswith("-") and argv[0] not in ("-h", "--help"):
+        argv = ["all", *argv]  # bare options run everything, as before subcommands
+    args = _parser().parse_args(argv)
+    stages = args.stages if args.command == "all" else [args.command]
+
+    from pipeline.cache import ArtifactCache
+    from pipeline.metrics import RunMetrics
+    cache = ArtifactCache(enabled=not args.no_cache)
+
+    print("=" * 60)
+    print("🚌 Blue Bird Corporation — Inventory Optimisation Pipeline")
+    print("=" * 60)
+
+    results = {}
+    with RunMetrics(" ".join(argv), trace_memory=args.trace_memory, profile=args.profile) as metrics:
+        for stage in STAGES:
+            if stage in stages:
+                RUNNERS[stage](args, cache, results)
+
     print("\n" + "=" * 60)
     print("✅ Pipeline complete! Dashboard data exported to dashboard/public/data/")
     print("=" * 60)
-    
+
     # Summary
-    critical = sum(1 for r in recs if r["status"] == "critical")
-    warning = sum(1 for r in recs if r["status"] == "warning")
-    print(f"\n📋 Summary:")
-    print(f"   Components analysed: {len(recs)}")
-    print(f"   🔴 Critical: {critical}")
-    print(f"   🟡 Warning: {warning}")
-    print(f"   🟢 OK: {len(recs) - critical - warning}")
+    recs = results.get("recommend")
+    if recs is not None:
+        critical = sum(1 for r in recs if r["status"] == "critical")
+        warning = sum(1 for r in recs if r["status"] == "warning")
+        print(f"\n📋 Summary:")
+        print(f"   Components analysed: {len(recs)}")
+        print(f"   🔴 Critical: {critical}")
+        print(f"   🟡 Warning: {warning}")
+        print(f"   🟢 OK: {len(recs) - critical - warning}")
+
+    print("\n🗂️ Stage cache:")
+    print(cache.report())
+
+    metrics_path = metrics.write()
+    print(f"\n⏱️ Stage metrics ({metrics_path.relative_to(ROOT)}):")
+    print(metrics.report())
+    if args.profile:
+        metrics.print_profile()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,372 @@
+"""
+Local forecast and inventory service.
+
+Loads the saved forecaster, the monthly demand history (built once from the
+order table) and the inventory table at start-up and answers per-component
+queries over HTTP with the standard library only:
+
+    GET /health
+    GET /forecast?component_id=CMP-0001[&horizon=6]
+    GET /safety-stock?component_id=CMP-0001[&service_level=0.95]
+    GET /recommendation?component_id=CMP-0001[&service_level=0.95]
+    GET /what-if?component_id=CMP-0001[&demand_change=20][&lead_time_shift=2][&service_level=0.95]
+
+Answers are computed with the pipeline's own functions and kept, encoded, in
+an LRU cache keyed by endpoint and parameters. Each request compares the
+names, sizes and mtimes of the files the order and inventory tables resolve
+to (a Feather file, its ``part-*.feather`` chunks or the CSV fallback) and of
+the saved model with those loaded; when any has changed (e.g. after a
+pipeline run) the state is reloaded and the cache cleared, so the service
+never needs a restart to see new data.
+
+Usage: python -m service.server [--port 8000] [--cache-size 4096]
+"""
+import argparse
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from agent.recommender import generate_recommendations
+from data.storage import read_table, table_files
+from models.forecaster import (
+    DATA_DIR, FORECAST_HORIZON, MODEL_DIR, QUANTILE_COLUMNS,
+    forecast_routed, hierarchical_forecast, load_model, prepare_features,
+)
+from models.demand_cube import stream_demand
+from models.hierarchy import stream_mix
+from models.safety_stock import demand_inputs, safety_stock_table
+from models.scenarios import scenario_grid
+
+CACHE_SIZE = 4096
+MAX_HORIZON = 24
+HISTORY_MONTHS = 12
+
+
+class UnknownComponent(KeyError):
+    """No inventory row has the requested component_id."""
+
+
+class LRUCache:
+    """Thread-safe least-recently-used mapping with hit/miss counters."""
+
+    def __init__(self, maxsize: int = CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        """Cached value for ``key``, calling ``compute()`` outside the lock on a miss."""
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+        value = compute()
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses,
+                    "hit_rate": round(self.hits / total, 4) if total else None}
+
+
+@dataclass
+class ServiceState:
+    """Everything loaded from one version of the artifacts."""
+    version: tuple
+    loaded_at: str
+    model: object
+    schema: dict
+    demand_df: pd.DataFrame
+    inventory_df: pd.DataFrame
+    rows: dict  # component_id → inventory row position
+    mix: object = None  # bus-model mix, when the saved model is hierarchical
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return str(value)
+    raise TypeError(f"not JSON serializable: {type(value).__name__}")
+
+
+def _encode(payload) -> bytes:
+    return json.dumps(payload, default=_json_default).encode()
+
+
+def _param(params: dict, name: str, cast, default=None):
+    values = params.get(name)
+    if not values:
+        if default is None:
+            raise ValueError(f"missing parameter {name!r}")
+        return default
+    try:
+        return cast(values[0])
+    except ValueError:
+        raise ValueError(f"invalid {name!r}: {values[0]!r}") from None
+
+
+def _service_level(params: dict) -> float:
+    level = _param(params, "service_level", float, 0.95)
+    if not 0.5 <= level < 1:
+        raise ValueError("service_level must be in [0.5, 1)")
+    return round(level, 4)
+
+
+class InventoryService:
+    """Hot model and data plus an LRU result cache, reloaded when artifacts change."""
+
+    def __init__(self, data_dir: Path = DATA_DIR, model_dir: Path = MODEL_DIR, cache_size: int = CACHE_SIZE):
+        self.data_dir = Path(data_dir)
+        self.model_dir = Path(model_dir)
+        self.cache = LRUCache(cache_size)
+        self.reloads = 0
+        self._reload_lock = threading.Lock()
+        self._state = None
+        self.routes = {
+            "/forecast": self.forecast,
+            "/safety-stock": self.safety_stock,
+            "/recommendation": self.recommendation,
+            "/what-if": self.what_if,
+        }
+
+    @property
+    def artifacts(self) -> list:
+        """Every file a load reads: the tables as ``read_table`` resolves them, then the saved model."""
+        return [
+            *table_files(self.data_dir / "orders"),
+            *table_files(self.data_dir / "inventory_levels"),
+            self.model_dir / "schema.json",
+            self.model_dir / "forecaster.cbm",
+            *sorted((self.model_dir / "segments").glob("*.cbm")),
+        ]
+
+    def _version(self) -> tuple:
+        # Paths are part of the version, so an added or removed part file counts as a change
+        version = []
+        for path in self.artifacts:
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                version.append((str(path), None))
+            else:
+                version.append((str(path), stat.st_size, stat.st_mtime_ns))
+        return tuple(version)
+
+    def _load(self, version: tuple) -> ServiceState:
+        model, schema = load_model(self.model_dir)
+        mix = stream_mix(self.data_dir / "orders").mix() if schema.get("hierarchy") else None
+        cube = mix.leaf_cube() if mix is not None else stream_demand(self.data_dir / "orders").cube()
+        demand_df = prepare_features(cube.to_frame())
+        inventory_df = read_table(self.data_dir / "inventory_levels")
+        return ServiceState(
+            version=version,
+            loaded_at=time.strftime("%Y-%m-%dT%H:%M:%S"),
+            model=model,
+            schema=schema,
+            demand_df=demand_df,
+            inventory_df=inventory_df,
+            rows={cid: i for i, cid in enumerate(inventory_df["component_id"])},
+            mix=mix,
+        )
+
+    def state(self) -> ServiceState:
+        """Current state, reloading first if any artifact changed since it was loaded."""
+        version = self._version()
+        state = self._state
+        if state is not None and state.version == version:
+            return state
+        with self._reload_lock:
+            if self._state is None or self._state.version != version:
+                self._state = self._load(version)
+                self.reloads += 1
+                # Keys carry the version, so clearing only frees memory
+                self.cache.clear()
+            return self._state
+
+    def handle(self, path: str, params: dict) -> bytes:
+        """Encoded JSON answer for one request; raises LookupError for unknown routes or components."""
+        if path == "/health":
+            return _encode(self.health(self.state()))
+        route = self.routes.get(path)
+        if route is None:
+            raise LookupError(f"no route {path!r}")
+        state = self.state()
+        key = (state.version, path, tuple(sorted((k, tuple(v)) for k, v in params.items())))
+        return self.cache.get_or_compute(key, lambda: _encode(route(state, params)))
+
+    # Shared intermediate results, cached alongside the responses
+
+    def _forecast_frame(self, state: ServiceState, horizon: int) -> pd.DataFrame:
+        return self.cache.get_or_compute(
+            (state.version, "forecast_frame", horizon),
+            lambda: (hierarchical_forecast(state.model, state.mix, horizon) if state.mix is not None
+                     else forecast_routed(state.model, state.demand_df, state.schema["features"], horizon)),
+        )
+
+    def _demand_inputs(self, state: ServiceState):
+        return self.cache.get_or_compute(
+            (state.version, "demand_inputs"),
+            lambda: demand_inputs(state.inventory_df, self._forecast_frame(state, FORECAST_HORIZON)),
+        )
+
+    def _safety_stock_table(self, state: ServiceState, service_level: float) -> pd.DataFrame:
+        return self.cache.get_or_compute(
+            (state.version, "safety_stock_table", service_level),
+            lambda: safety_stock_table(state.inventory_df, self._forecast_frame(state, FORECAST_HORIZON), service_level),
+        )
+
+    def _row(self, state: ServiceState, params: dict) -> int:
+        component_id = _param(params, "component_id", str)
+        if component_id not in state.rows:
+            raise UnknownComponent(component_id)
+        return state.rows[component_id]
+
+    # Endpoints
+
+    def health(self, state: ServiceState) -> dict:
+        return {
+            "status": "ok",
+            "components": len(state.rows),
+            "trained_through": state.schema["trained_through"],
+            "loaded_at": state.loaded_at,
+            "reloads": self.reloads,
+            "cache": self.cache.stats(),
+        }
+
+    def forecast(self, state: ServiceState, params: dict) -> dict:
+        row = state.inventory_df.iloc[self._row(state, params)]
+        horizon = _param(params, "horizon", int, FORECAST_HORIZON)
+        if not 1 <= horizon <= MAX_HORIZON:
+            raise ValueError(f"horizon must be between 1 and {MAX_HORIZON}")
+        frame = self._forecast_frame(state, horizon)
+        series = frame[(frame["category"] == row["category"]) & (frame["variant"] == row["variant"])]
+        history = state.demand_df[(state.demand_df["category"] == row["category"])
+                                  & (state.demand_df["variant"] == row["variant"])].tail(HISTORY_MONTHS)
+        return {
+            "component_id": row["component_id"],
+            "category": row["category"],
+            "variant": row["variant"],
+            "method": series["method"].iat[0] if len(series) else None,
+            "history": [{"year_month": m.strftime("%Y-%m"), "demand": d}
+                        for m, d in zip(history["year_month"], history["demand"].tolist())],
+            "forecast": [
+                {"year_month": m.strftime("%Y-%m"), "predicted": p, **dict(zip(QUANTILE_COLUMNS, np.round(q, 1).tolist()))}
+                for m, p, q in zip(series["year_month"], series["predicted"].tolist(), series[QUANTILE_COLUMNS].to_numpy())
+            ],
+        }
+
+    def safety_stock(self, state: ServiceState, params: dict) -> dict:
+        i = self._row(state, params)
+        return self._safety_stock_table(state, _service_level(params)).iloc[i].to_dict()
+
+    def recommendation(self, state: ServiceState, params: dict) -> dict:
+        i = self._row(state, params)
+        table = self._safety_stock_table(state, _service_level(params)).iloc[[i]]
+        frame = self._forecast_frame(state, FORECAST_HORIZON)
+        series = frame[(frame["category"] == table["category"].iat[0]) & (frame["variant"] == table["variant"].iat[0])]
+        return generate_recommendations(table, series)[0]
+
+    def what_if(self, state: ServiceState, params: dict) -> dict:
+        i = self._row(state, params)
+        demand_change = _param(params, "demand_change", float, 0.0)
+        lead_time_shift = _param(params, "lead_time_shift", float, 0.0)
+        service_level = _service_level(params)
+        if demand_change <= -100:
+            raise ValueError("demand_change must be above -100 (percent)")
+        mean, std = self._demand_inputs(state)
+        grid = scenario_grid(state.inventory_df.iloc[[i]], mean[i:i + 1], std[i:i + 1],
+                             [demand_change], [lead_time_shift], [service_level])
+        return {
+            "component_id": state.inventory_df["component_id"].iat[i],
+            "demand_change": demand_change,
+            "lead_time_shift": lead_time_shift,
+            "service_level": service_level,
+            "safety_stock": grid["safety_stock"].item(),
+            "reorder_point": grid["reorder_point"].item(),
+            "order_qty": grid["order_qty"].item(),
+            "eoq": grid["eoq"].item(),
+            "status": grid["status"].item(),
+        }
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so clients can reuse connections
+    disable_nagle_algorithm = True  # headers and body are separate writes; don't wait for the ACK
+    quiet = True
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        try:
+            body, status = self.server.service.handle(url.path, parse_qs(url.query)), 200
+        except UnknownComponent as e:
+            body, status = _encode({"error": f"unknown component_id {e.args[0]!r}"}), 404
+        except LookupError as e:
+            body, status = _encode({"error": str(e)}), 404
+        except ValueError as e:
+            body, status = _encode({"error": str(e)}), 400
+        except Exception as e:
+            self.log_error("%s failed: %r", self.path, e)
+            body, status = _encode({"error": "internal error"}), 500
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+
+def make_server(host: str = "127.0.0.1", port: int = 8000, service: InventoryService = None) -> ThreadingHTTPServer:
+    """HTTP server bound to (host, port); port 0 picks a free one."""
+    server = ThreadingHTTPServer((host, port), RequestHandler)
+    server.daemon_threads = True
+    server.service = service or InventoryService()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve forecasts, safety stock, recommendations and what-ifs.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--cache-size", type=int, default=CACHE_SIZE)
+    parser.add_argument("--log-requests", action="store_true")
+    args = parser.parse_args()
+
+    RequestHandler.quiet = not args.log_requests
+    server = make_server(args.host, args.port, InventoryService(cache_size=args.cache_size))
+    start = time.perf_counter()
+    health = server.service.health(server.service.state())
+    print(f"Loaded {health['components']} components, model trained through {health['trained_through']} "
+          f"({time.perf_counter() - start:.1f}s)")
+    print(f"Serving on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()